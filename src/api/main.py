@@ -1,34 +1,92 @@
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Header
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
 import sys
 import os
 import traceback
+import hmac
 import asyncio
 from functools import lru_cache
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set
+import json
 import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-from src.retrieval.final_retrieval import finalretrieval
-from src.config import get_chroma_client
+from src.retrieval.final_retrieval import finalretrieval, start_filter_extraction
+from src.retrieval.retriever2 import embed_query, load_compressed_index
+from src.config import get_chroma_client, HOT_ANSWERS_PATH, SEMANTIC_CACHE_ENABLED, COMPRESSED_INDEX_ENABLED, DEFAULT_BATCH, ADMIN_TOKEN, PROFILE_SLOW_MS, SEARCH_DEFAULT_LIMIT, INDEX_POINTER_CHECK_SECONDS
+from src.utils.query_log import query_logger, normalize_query, build_record
+from src.utils.log import get_logger, request_id_var, new_request_id, bind_context, logging_stats
+from src.utils.profiler import profiler, profile_var, annotate
+from src.api.semantic_cache import semantic_cache, query_signature
+from src.llm.circuit_breaker import breaker_states, OPEN
+from src.llm.gemini_client import gemini
+from src.retrieval.stats import collection_stats, load_collection_stats
+from src.retrieval.vocabulary import vocabulary
+from src.retrieval.facets import column_store, detect_aggregation, format_aggregation, AGGREGATE_OPS
+from src.retrieval.search import lexical_index, search
+from src.retrieval.speculation import speculation_stats
+from src.retrieval.partitions import (
+    get_partition, collection_name, list_batches, resolve_batches, is_default, UnknownBatchError, BuildInProgressError,
+    active_collection, refresh_generations, load_partition_counts, partition_counts
+)
+from src.embedding.live_update import upsert_company, delete_company, apply_journal, journal, CompanyNotFoundError
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
+logger = get_logger(__name__)
 
 # Cache for storing query results
 query_cache: Dict[str, Dict[str, Any]] = {}
 
+# Reverse index: document ID → cache keys whose answer was built from it.
+# Answers that retrieved nothing are filed under VOLATILE_KEY, since any change
+# to the collection can alter them. Aggregate answers are never cached.
+cache_keys_by_id: Dict[str, Set[str]] = {}
+VOLATILE_KEY = "*"
+
+def _indexed_ids(entry: Dict[str, Any]) -> List[str]:
+    ids = list(entry.get("result_ids") or [])
+    if not ids:
+        ids.append(VOLATILE_KEY)
+    return ids
+
+def cache_answer(key: str, entry: Dict[str, Any]):
+    """Store an answer in the exact cache and the reverse index"""
+    drop_cached(key)
+    query_cache[key] = entry
+    for doc_id in _indexed_ids(entry):
+        cache_keys_by_id.setdefault(doc_id, set()).add(key)
+
+def drop_cached(key: str):
+    entry = query_cache.pop(key, None)
+    if entry is None:
+        return
+    for doc_id in _indexed_ids(entry):
+        keys = cache_keys_by_id.get(doc_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del cache_keys_by_id[doc_id]
+
+def invalidate_documents(ids: List[str]) -> Dict[str, int]:
+    """Drop only the cached answers that used one of these documents (plus volatile answers)"""
+    keys = set()
+    for doc_id in list(ids) + [VOLATILE_KEY]:
+        keys.update(cache_keys_by_id.get(doc_id, ()))
+    for key in keys:
+        drop_cached(key)
+    semantic = semantic_cache.invalidate_ids(ids) if SEMANTIC_CACHE_ENABLED else 0
+    return {"exact": len(keys), "semantic": semantic}
+
 # Initialize ChromaDB client at module level
 def get_db():
-    from src.config import get_chroma_client
     try:
-        client = get_chroma_client()
-        return client.get_or_create_collection(name="companies")
+        return get_partition(DEFAULT_BATCH, create=True)
     except Exception as e:
-        print(f"Error connecting to ChromaDB: {e}")
+        logger.error("Error connecting to ChromaDB: %s", e)
         raise
 
 # Add CORS middleware
@@ -41,6 +99,49 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """
+    Sample the stacks of a request (registered before correlation_id, so it runs inside it
+    and sees the request ID). Requests flagged with X-Profile and the admin token are always
+    kept; with PROFILE_SLOW_MS set, every request is sampled and kept only if it was slow.
+    """
+    flagged = request.headers.get("x-profile", "").lower() in ("1", "true") \
+        and is_admin_token(request.headers.get("x-admin-token"))
+    if not (flagged or PROFILE_SLOW_MS > 0) or request.url.path.startswith("/admin/profiles"):
+        return await call_next(request)
+
+    profile = profiler.start(request_id_var.get(), request.method, request.url.path,
+                             "flagged" if flagged else "slow")
+    token = profile_var.set(profile)
+    status = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        profile_var.reset(token)
+        elapsed_ms = (time.time() - profile.started) * 1000
+        keep = flagged or elapsed_ms >= PROFILE_SLOW_MS
+        profiler.finish(profile, status, keep)
+        if keep:
+            logger.info("Request profile captured", extra={
+                "path": profile.path, "duration_ms": profile.duration_ms, "samples": profile.samples
+            })
+
+
+@app.middleware("http")
+async def correlation_id(request: Request, call_next):
+    """Tag every log record written while serving a request with its ID (X-Request-ID)"""
+    token = request_id_var.set(request.headers.get("x-request-id") or new_request_id())
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id_var.get()
+        return response
+    finally:
+        request_id_var.reset(token)
+
+
 # Configure host and port
 HOST = "0.0.0.0"
 PORT = int(os.getenv("PORT", "8000"))
@@ -48,6 +149,80 @@ PORT = int(os.getenv("PORT", "8000"))
 # Global variable for ChromaDB client
 _chroma_client = None
 
+def load_hot_answers(path: str = HOT_ANSWERS_PATH) -> int:
+    """
+    Load precomputed answers for frequent queries into the cache as pinned entries.
+    Answers computed from another generation are skipped: their result_ids no
+    longer exist, so invalidation could never reach them.
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error("Error loading hot answers: %s", e)
+        return 0
+    # Files written before generations were recorded belong to the original collection
+    generation = data.get("collection") or collection_name(DEFAULT_BATCH)
+    if generation != active_collection(DEFAULT_BATCH):
+        logger.info("Precomputed answers are from another generation, not loaded", extra={
+            "collection": generation, "active": active_collection(DEFAULT_BATCH)
+        })
+        return 0
+    entries = data.get("answers", [])
+    now = time.time()
+    entries = [e for e in entries if not e.get("aggregate")]  # Written by older versions
+    for entry in entries:
+        cache_answer(normalize_query(entry["query"]), {
+            "result": entry["result"],
+            "result_ids": entry.get("result_ids", []),
+            "last_accessed": now,
+            "pinned": True
+        })
+    return len(entries)
+
+def reload_indexes():
+    """Rebuild the default batch's in-memory state from its active collection (after a generation switch)."""
+    collection = get_partition(DEFAULT_BATCH, create=True)
+    journal.skip_to_end()  # The new generation is loaded as it is now
+    collection_stats.rebuild(collection)
+    collection_stats.save()
+    vocabulary.build(collection_stats.value_counts)
+    column_store.load(collection)
+    lexical_index.load(collection)
+    if COMPRESSED_INDEX_ENABLED:
+        load_compressed_index()
+    # Every cached answer, pinned ones included, came from the previous generation
+    for key in list(query_cache):
+        drop_cached(key)
+    semantic_cache.clear()
+    load_hot_answers()
+    logger.info("Indexes reloaded", extra={"collection": collection.name, "documents": collection_stats.total})
+
+async def watch_generations():
+    """
+    Switch to a promoted or rolled-back index generation without a restart, and
+    apply admin changes made through other workers.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(INDEX_POINTER_CHECK_SECONDS)
+        try:
+            changed = await loop.run_in_executor(None, refresh_generations)
+            if DEFAULT_BATCH in changed:
+                await loop.run_in_executor(None, reload_indexes)
+        except Exception:
+            logger.exception("Switching index generation failed")
+        try:
+            ids = await loop.run_in_executor(None, apply_journal)
+            if ids:
+                invalidate_documents(ids)
+        except Exception:
+            logger.exception("Applying admin changes from other workers failed")
+
+_generation_watcher: Optional[asyncio.Task] = None
+
 # Add startup event to initialize ChromaDB
 @app.on_event("startup")
 async def startup_event():
@@ -57,18 +232,44 @@ async def startup_event():
         global _chroma_client
         _chroma_client = get_chroma_client()
         
-        # Test collection access
-        collection = _chroma_client.get_or_create_collection(name="companies")
+        # Test collection access (the default batch's partition)
+        collection = get_partition(DEFAULT_BATCH, create=True)
+        # The indexes are loaded from the collection below, which has every earlier admin change
+        journal.skip_to_end()
         doc_count = collection.count()
         
-        print(f"✅ ChromaDB initialized successfully:")
-        print(f"   - Collection: companies")
-        print(f"   - Documents: {doc_count}")
+        logger.info("✅ ChromaDB initialized", extra={
+            "collection": collection.name, "documents": doc_count, "batches": list_batches()
+        })
+
+        # Precompute collection statistics once so /status and the query planner stay cheap
+        load_collection_stats(collection)
+        load_partition_counts()
+        logger.info("Collection statistics loaded", extra={
+            "documents": collection_stats.total, "fields": len(collection_stats.field_counts)
+        })
+        vocabulary.build(collection_stats.value_counts)
+        logger.info("Vocabulary built", extra=vocabulary.summary())
+        column_store.load(collection)
+        lexical_index.load(collection)
+        logger.info("Search indexes loaded", extra={
+            "rows": len(column_store), "terms": len(lexical_index.postings)
+        })
+        if COMPRESSED_INDEX_ENABLED:
+            load_compressed_index()
+
+        # Warm the cache with precomputed answers and start the query log writer
+        hot_count = load_hot_answers()
+        if hot_count:
+            logger.info("Preloaded answers", extra={"count": hot_count})
+        query_logger.start()
+
+        # Follow the generation pointer so promotions and rollbacks apply without a restart
+        global _generation_watcher
+        _generation_watcher = asyncio.create_task(watch_generations())
         
     except Exception as e:
-        print(f"❌ Error during startup:")
-        print(f"   - Error: {str(e)}")
-        print(f"   - Details: {traceback.format_exc()}")
+        logger.exception("❌ Error during startup")
         # Don't raise the error - let the application start
         # but log it for monitoring
 
@@ -77,38 +278,67 @@ async def shutdown_event():
     """Clean up resources on shutdown"""
     global _chroma_client
     _chroma_client = None
-    print("✅ Server shutdown completed")
+    if _generation_watcher is not None:
+        _generation_watcher.cancel()
+    query_logger.stop()
+    logger.info("✅ Server shutdown completed")
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     try:
         # Quick DB check
-        collection = _chroma_client.get_collection(name="companies")
+        collection = _chroma_client.get_collection(name=active_collection(DEFAULT_BATCH))
         is_db_healthy = True
     except Exception:
         is_db_healthy = False
+
+    # An open breaker means answers are served from local fallbacks
+    breakers = {name: state["state"] for name, state in breaker_states().items()}
     
     return {
-        "status": "online",
+        "status": "online" if OPEN not in breakers.values() else "degraded",
         "database": "healthy" if is_db_healthy else "error",
+        "breakers": breakers,
+        "timestamp": time.time()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Breaker, Gemini client, cache, query log and speculation counters"""
+    return {
+        "breakers": breaker_states(),
+        "gemini": gemini.stats(),
+        "cache": {
+            "exact_entries": len(query_cache),
+            "indexed_documents": len(cache_keys_by_id),
+            "semantic": semantic_cache.stats()
+        },
+        "query_log": {
+            "written": query_logger.written,
+            "dropped": query_logger.dropped
+        },
+        "logging": logging_stats(),
+        "profiler": profiler.stats(),
+        "speculation": speculation_stats.stats(),
         "timestamp": time.time()
     }
 
 @app.get("/status")
 async def status():
     try:
-        from src.config import get_chroma_client
-        client = get_chroma_client()
-        collection = client.get_collection(name="companies")
-        
+        # Served from precomputed statistics, no collection scan per request
         return {
             "status": "ok",
             "collection": {
-                "name": "companies",
-                "count": collection.count(),
-                "peek": collection.peek()
+                "name": collection_name(DEFAULT_BATCH),
+                "generation": active_collection(DEFAULT_BATCH),
+                "batch": DEFAULT_BATCH,
+                "count": collection_stats.total,
+                "stats": collection_stats.summary(),
+                "vocabulary": vocabulary.summary()
             },
+            "partitions": partition_counts(),
             "environment": {
                 "chroma_path": os.getenv('CHROMA_DB_PATH', 'chroma_data'),
                 "is_render": os.getenv('IS_RENDER', 'false'),
@@ -125,18 +355,21 @@ async def status():
 # Request body schema
 class QueryRequest(BaseModel):
     query: str
+    # Placement batch(es) to search: "2025", "2025,2026" or "all"; defaults to DEFAULT_BATCH
+    batch: Optional[str] = None
 
-async def process_query(query: str) -> dict:
+async def process_query(query: str, trace: Optional[Dict[str, Any]] = None, query_vector=None,
+                        batches: Optional[List[str]] = None, where_future=None) -> dict:
     """Process the query asynchronously with optimized timeout"""
     async def _process_with_timeout():
         try:
             # Use a background task for the processing
             result = await asyncio.get_event_loop().run_in_executor(
-                None, finalretrieval, query
+                None, bind_context(finalretrieval, query, trace, query_vector, batches, where_future)
             )
             return result
         except Exception as e:
-            print(f"Processing error: {str(e)}")
+            logger.exception("Processing error")
             return None
 
     try:
@@ -176,39 +409,116 @@ async def process_query(query: str) -> dict:
             "status": "timeout"
         }
     except Exception as e:
-        print(f"Query processing error: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Query processing error")
         return {
             "result": "Service is currently busy. Please retry in a few moments.",
             "cached": False,
             "status": "error"
         }
 
+class FacetRequest(BaseModel):
+    query: Optional[str] = None
+    where: Optional[Dict[str, Any]] = None
+    metrics: List[str] = ["count"]
+    group_by: Optional[str] = None
+    limit: int = 20
+
+@app.post("/facets")
+async def facets_endpoint(request: FacetRequest):
+    """
+    Counts, min/max/avg/sum and group-bys over the company metadata, without the LLM.
+    Either pass a natural-language `query`, or explicit `where`, `metrics` ("avg:ctc") and `group_by`.
+    """
+    if not column_store.loaded:
+        return JSONResponse(content={"status": "error", "error": "Metadata not loaded yet"}, status_code=503)
+
+    started = time.perf_counter()
+    if request.query:
+        spec = detect_aggregation(request.query)
+        if spec is None:
+            return JSONResponse(
+                content={"status": "error", "error": "Not an aggregation query"},
+                status_code=400
+            )
+    else:
+        metrics = []
+        for metric in request.metrics:
+            op, _, field = metric.partition(":")
+            if op not in AGGREGATE_OPS or (op != "count" and not field):
+                return JSONResponse(
+                    content={"status": "error", "error": f"Invalid metric '{metric}', expected e.g. 'count' or 'avg:ctc'"},
+                    status_code=400
+                )
+            metrics.append((op, field))
+        spec = {"metrics": metrics, "where": request.where, "group_by": request.group_by}
+
+    result = column_store.aggregate(
+        spec["metrics"], where=spec["where"], group_by=spec["group_by"], limit=request.limit
+    )
+    return {
+        "status": "success",
+        "spec": {"metrics": [f"{op}:{field}" if field else op for op, field in spec["metrics"]],
+                 "where": spec["where"], "group_by": spec["group_by"]},
+        "answer": format_aggregation(spec, result) if request.query else None,
+        **result,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+class SearchRequest(BaseModel):
+    text: Optional[str] = None
+    where: Optional[Dict[str, Any]] = None
+    fields: Optional[List[str]] = None
+    sort: Optional[str] = None
+    limit: int = SEARCH_DEFAULT_LIMIT
+    cursor: Optional[str] = None
+
+@app.post("/search")
+async def search_endpoint(request: SearchRequest):
+    """
+    Structured company search for listing pages, without the LLM.
+    Filter with `where`, rank with `text` (BM25) or `sort` ("-ctc"), choose the returned
+    metadata with `fields`, and pass `next_cursor` back as `cursor` for the next page.
+    """
+    if not column_store.loaded or not lexical_index.loaded:
+        return JSONResponse(content={"status": "error", "error": "Search indexes not loaded yet"}, status_code=503)
+
+    started = time.perf_counter()
+    try:
+        result = search(request.text, request.where, request.fields, request.sort, request.limit, request.cursor)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "error": str(e)}, status_code=400)
+    return {
+        "status": "success",
+        **result,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
 def clean_cache(max_age: int = 3600, max_size: int = 1000):
     """Clean old cache entries"""
     current_time = time.time()
     
-    # Remove entries older than max_age seconds
+    # Remove entries older than max_age seconds (precomputed answers are pinned)
     keys_to_remove = [
         k for k, v in query_cache.items()
-        if current_time - v["last_accessed"] > max_age
+        if not v.get("pinned") and current_time - v["last_accessed"] > max_age
     ]
     
     for k in keys_to_remove:
-        del query_cache[k]
+        drop_cached(k)
     
     # If still too many entries, remove oldest ones
     if len(query_cache) > max_size:
         sorted_entries = sorted(
-            query_cache.items(),
+            ((k, v) for k, v in query_cache.items() if not v.get("pinned")),
             key=lambda x: x[1]["last_accessed"]
         )
         for k, _ in sorted_entries[:len(query_cache) - max_size]:
-            del query_cache[k]
+            drop_cached(k)
 
 @app.post("/query")
 async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTasks):
     """Handle query requests with caching and fast async processing"""
+    started = time.perf_counter()
     try:
         # Validate query
         if not request.query or not request.query.strip():
@@ -220,13 +530,27 @@ async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTask
                 status_code=400
             )
             
-        # Check cache first for instant response
-        cache_key = request.query.strip().lower()
+        try:
+            batches = resolve_batches(request.batch)
+        except UnknownBatchError as e:
+            return JSONResponse(
+                content={"result": str(e), "status": "error", "batches": list_batches()},
+                status_code=400
+            )
+
+        # Check cache first for instant response (answers for other batches are cached under their own key)
+        cache_key = normalize_query(request.query)
+        if not is_default(batches):
+            cache_key += f" |batch={','.join(batches)}"
         cached_result = query_cache.get(cache_key)
         
         if cached_result:
             # Return cached result immediately
             cached_result["last_accessed"] = time.time()
+            query_logger.log(build_record(
+                request.query, "success", "hit", started,
+                {"result_ids": cached_result.get("result_ids", []), "batches": None if is_default(batches) else batches}
+            ))
             return JSONResponse(content={
                 "result": cached_result["result"],
                 "cached": True,
@@ -235,10 +559,9 @@ async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTask
             
         # Initialize ChromaDB with connection pooling
         try:
-            client = get_chroma_client()  # Uses singleton pattern
-            collection = client.get_or_create_collection(name="companies")
+            collection = get_partition(DEFAULT_BATCH, create=True)
         except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
+            logger.error("Database error: %s", db_error)
             return JSONResponse(
                 content={
                     "result": "Unable to connect to database. Please try again.",
@@ -247,16 +570,50 @@ async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTask
                 status_code=503
             )
             
+        trace: Dict[str, Any] = {"timings": {}}
+
+        # Near-duplicate phrasings are answered from the semantic cache (default batch only);
+        # on a miss the embedding is reused for the vector search. Aggregate questions skip
+        # it: the column store answers them in milliseconds.
+        query_vector = None
+        where_future = None
+        use_semantic_cache = SEMANTIC_CACHE_ENABLED and is_default(batches) and detect_aggregation(request.query) is None
+        signature = query_signature(request.query) if use_semantic_cache else None
+        if use_semantic_cache:
+            stage_start = time.perf_counter()
+            query_vector = await asyncio.get_event_loop().run_in_executor(
+                None, bind_context(embed_query, request.query)
+            )
+            trace["timings"]["embedding"] = round((time.perf_counter() - stage_start) * 1000, 2)
+            similar = semantic_cache.lookup(query_vector, signature)
+            if similar:
+                trace["result_ids"] = similar["result_ids"]
+                query_logger.log(build_record(request.query, "success", "semantic_hit", started, trace))
+                return JSONResponse(content={
+                    "result": similar["result"],
+                    "cached": True,
+                    "status": "success"
+                })
+            # Started only on a miss: a hit must not spend a Gemini call on filters it never uses
+            where_future = start_filter_extraction(request.query)
+
         # Process query with timeout
-        print(f"Processing query: {request.query}")
-        result = await process_query(request.query)
+        result = await process_query(request.query, trace, query_vector, batches, where_future)
+        annotate(query=request.query, plan=trace.get("plan"), timings=trace["timings"])
+        query_logger.log(build_record(request.query, result.get("status", "success"), "miss", started, trace))
         
-        # Only cache successful results
-        if result.get("result") and not result.get("result").startswith("Error"):
-            query_cache[cache_key] = {
+        # Only cache successful results (timeouts and fallbacks are retried next time).
+        # Aggregate answers are not cached: recomputing them is as fast as a cache hit.
+        if result.get("status") == "success" and result.get("result") and not result.get("result").startswith("Error") \
+                and trace.get("plan") != "aggregate":
+            cache_answer(cache_key, {
                 "result": result["result"],
+                "result_ids": trace.get("result_ids", []),
                 "last_accessed": time.time()
-            }
+            })
+            if use_semantic_cache:
+                semantic_cache.add(cache_key, query_vector, result["result"], trace.get("result_ids", []),
+                                   signature=signature)
             # Clean old cache entries in background
             background_tasks.add_task(clean_cache)
         
@@ -270,8 +627,7 @@ async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTask
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in query endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Unexpected error in query endpoint")
         raise HTTPException(
             status_code=500,
             detail={
@@ -280,6 +636,81 @@ async def query_endpoint(request: QueryRequest, background_tasks: BackgroundTask
             }
         )
 
+class CompanyUpsertRequest(BaseModel):
+    # Same shape as the ingest JSON: {"Name": ..., "description": ..., "Keys": [{"key": ..., "value": ...}]}
+    company: Dict[str, Any]
+    # Record to replace; without it the company is matched by name or created
+    id: Optional[str] = None
+    batch: Optional[str] = None
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def check_admin(token: Optional[str]):
+    """Admin endpoints need ADMIN_TOKEN configured and sent as X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin API is disabled (ADMIN_TOKEN not set)")
+    if not is_admin_token(token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.put("/admin/companies")
+async def admin_upsert_company(request: CompanyUpsertRequest, x_admin_token: Optional[str] = Header(None)):
+    """Insert or update one company, re-embedding only that record"""
+    check_admin(x_admin_token)
+    batch = (request.batch or DEFAULT_BATCH).strip()
+    try:
+        result = await asyncio.get_event_loop().run_in_executor(
+            None, bind_context(upsert_company, request.company, request.id, batch)
+        )
+    except CompanyNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No company with id {request.id}")
+    except UnknownBatchError:
+        raise HTTPException(status_code=404, detail=f"No partition for batch {batch}; ingest it first")
+    except BuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Company upsert failed")
+        raise HTTPException(status_code=502, detail=f"Upsert failed: {e}")
+
+    invalidated = invalidate_documents([result["id"]])
+    return {"status": "success", "batch": batch, **result, "invalidated": invalidated}
+
+@app.delete("/admin/companies/{doc_id}")
+async def admin_delete_company(doc_id: str, batch: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """Delete one company and the cached answers built from it"""
+    check_admin(x_admin_token)
+    batch = (batch or DEFAULT_BATCH).strip()
+    try:
+        result = await asyncio.get_event_loop().run_in_executor(
+            None, bind_context(delete_company, doc_id, batch)
+        )
+    except (CompanyNotFoundError, UnknownBatchError):
+        raise HTTPException(status_code=404, detail=f"No company with id {doc_id} in batch {batch}")
+    except BuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    invalidated = invalidate_documents([doc_id])
+    return {"status": "success", "batch": batch, **result, "invalidated": invalidated}
+
+@app.get("/admin/profiles")
+async def admin_list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Summaries of the most recent captured request profiles, newest first"""
+    check_admin(x_admin_token)
+    return {"profiles": profiler.recent(), "profiler": profiler.stats()}
+
+@app.get("/admin/profiles/{request_id}")
+async def admin_get_profile(request_id: str, format: str = "json", x_admin_token: Optional[str] = Header(None)):
+    """One captured profile; format=folded returns collapsed stacks for flamegraph.pl or speedscope"""
+    check_admin(x_admin_token)
+    profile = profiler.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No captured profile for request {request_id}")
+    if format == "folded":
+        return PlainTextResponse(profile.folded())
+    return profile.to_dict()
+
 def start():
     """Start the FastAPI server"""
     uvicorn.run(
@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL,
+    SEMANTIC_CACHE_MAX_SIZE,
+)
+from src.retrieval.vocabulary import vocabulary
+
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# Words that turn a filter around: "companies in pune" vs "companies not in pune"
+NEGATION_PATTERN = re.compile(
+    r"\b(?:not|no|except|excluding|exclude|outside|without|besides|other than|apart from)\b|n't\b"
+)
+
+
+def query_signature(query: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], bool]:
+    """
+    Numbers, canonical location/branch mentions and polarity (negated or not) of
+    a query. Embeddings barely move when only these change ("ctc above 10" vs
+    "ctc above 20", "ECE" vs "CSE", "in pune" vs "not in pune"), so a semantic
+    hit also requires an identical signature.
+    """
+    lowered = re.sub(r"\s+", " ", (query or "").strip().lower())
+    numbers = sorted({f"{float(n):g}" for n in NUMBER_PATTERN.findall(lowered)})
+    return tuple(numbers), tuple(vocabulary.entities(lowered)), bool(NEGATION_PATTERN.search(lowered))
+
+
+class SemanticCache:
+    """
+    In-memory answer cache keyed by query embedding.
+    - Embeddings are stored L2-normalized in one matrix, so a lookup is a single dot product
+    - A lookup hits when cosine similarity to a cached query is >= threshold and both
+      queries have the same signature (numbers, locations/branches and negation, see query_signature)
+    - Entries expire after ttl seconds and the least recently used are evicted past max_size
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: int = 3600, max_size: int = 1000, dim: int = 768):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._entries: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _normalize(vector) -> Optional[np.ndarray]:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        if v.ndim != 1 or not np.isfinite(norm) or norm == 0:
+            return None  # The zero-vector embedding fallback must never match
+        return v / norm
+
+    def lookup(self, vector, signature: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
+        """Return the closest cached entry with this signature above the threshold, or None."""
+        v = self._normalize(vector)
+        if v is None or v.shape[0] != self.dim:
+            return None
+        with self._lock:
+            self._expire(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            scores = self._vectors @ v
+            for i, e in enumerate(self._entries):
+                if e["signature"] != signature:
+                    scores[i] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[best]
+            entry["last_accessed"] = time.time()
+            self.hits += 1
+            return dict(entry, similarity=float(scores[best]))
+
+    def add(self, query: str, vector, result: str, result_ids: Optional[List[str]] = None,
+            signature: Optional[Tuple] = None):
+        """Cache an answer under the query embedding and signature."""
+        v = self._normalize(vector)
+        if v is None or v.shape[0] != self.dim:
+            return
+        now = time.time()
+        entry = {
+            "query": query,
+            "result": result,
+            "result_ids": list(result_ids or []),
+            "signature": signature,
+            "created": now,
+            "last_accessed": now,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self._vectors = np.vstack([self._vectors, v[None, :]])
+            if len(self._entries) > self.max_size:
+                self._evict(len(self._entries) - self.max_size)
+
+    def invalidate_ids(self, ids: List[str], include_empty: bool = True) -> int:
+        """
+        Drop answers that were built from any of the given documents, and answers
+        that retrieved nothing (when include_empty). Returns the count.
+        """
+        changed = set(ids)
+        with self._lock:
+            keep = [
+                i for i, e in enumerate(self._entries)
+                if not changed.intersection(e["result_ids"])
+                and (e["result_ids"] or not include_empty)
+            ]
+            dropped = len(self._entries) - len(keep)
+            if dropped:
+                self._keep(keep)
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "threshold": self.threshold,
+        }
+
+    def _keep(self, keep: List[int]):
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else np.zeros((0, self.dim), dtype=np.float32)
+
+    def _expire(self, now: float):
+        keep = [i for i, e in enumerate(self._entries) if now - e["created"] <= self.ttl]
+        if len(keep) != len(self._entries):
+            self._keep(keep)
+
+    def _evict(self, count: int):
+        order = sorted(range(len(self._entries)), key=lambda i: self._entries[i]["last_accessed"])
+        drop = set(order[:count])
+        self._keep([i for i in range(len(self._entries)) if i not in drop])
+
+
+# Shared cache used by the API
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL,
+    max_size=SEMANTIC_CACHE_MAX_SIZE,
+)
@@ -13,8 +13,10 @@ PROJECT_ROOT = pathlib.Path(__file__).parent.parent.absolute()
 # ChromaDB will always be in a directory named 'chroma_data' for consistency
 CHROMA_DB_PATH = 'chroma_data'
 
-# Set up the ChromaDB persistence directory
-if IS_RENDER:
+# Set up the ChromaDB persistence directory (CHROMA_DB_PERSIST_DIRECTORY overrides, e.g. for benchmarks)
+if os.getenv('CHROMA_DB_PERSIST_DIRECTORY'):
+    CHROMA_DB_PERSIST_DIRECTORY = os.getenv('CHROMA_DB_PERSIST_DIRECTORY')
+elif IS_RENDER:
     # On Render, use the persistent disk mounted at /data
     CHROMA_DB_PERSIST_DIRECTORY = str(pathlib.Path('/data/chroma_data'))
 else:
@@ -53,4 +55,116 @@ os.makedirs(CHROMA_DB_PERSIST_DIRECTORY, exist_ok=True)
 
 # API settings
 API_HOST = os.getenv('API_HOST', '0.0.0.0')
-API_PORT = int(os.getenv('API_PORT', '8000'))
\ No newline at end of file
+API_PORT = int(os.getenv('API_PORT', '8000'))
+
+# Query log settings
+if IS_RENDER:
+    DATA_DIRECTORY = '/data'
+else:
+    DATA_DIRECTORY = str(PROJECT_ROOT / 'data')
+
+QUERY_LOG_PATH = os.getenv('QUERY_LOG_PATH', os.path.join(DATA_DIRECTORY, 'logs', 'queries.jsonl'))
+QUERY_LOG_SAMPLE_RATE = float(os.getenv('QUERY_LOG_SAMPLE_RATE', '1.0'))
+QUERY_LOG_MAX_BYTES = int(os.getenv('QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+QUERY_LOG_BACKUP_COUNT = int(os.getenv('QUERY_LOG_BACKUP_COUNT', '5'))
+
+# Precomputed answers for the most frequent queries, loaded into the cache at startup
+HOT_ANSWERS_PATH = os.getenv('HOT_ANSWERS_PATH', os.path.join(DATA_DIRECTORY, 'hot_answers.json'))
+
+# Semantic answer cache: reuse answers for near-duplicate queries
+SEMANTIC_CACHE_ENABLED = str(os.getenv('SEMANTIC_CACHE_ENABLED', 'true')).lower() == 'true'
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.95'))
+SEMANTIC_CACHE_TTL = int(os.getenv('SEMANTIC_CACHE_TTL', '3600'))
+SEMANTIC_CACHE_MAX_SIZE = int(os.getenv('SEMANTIC_CACHE_MAX_SIZE', '1000'))
+
+# Collection statistics and query planning
+COLLECTION_STATS_PATH = os.getenv('COLLECTION_STATS_PATH', os.path.join(DATA_DIRECTORY, 'collection_stats.json'))
+# Use the filter alone when it is estimated to match at most this many documents
+PLANNER_FILTER_FIRST_MAX = int(os.getenv('PLANNER_FILTER_FIRST_MAX', '3'))
+# Search vectors first and post-filter when the filter keeps at least this fraction of documents
+PLANNER_VECTOR_FIRST_MIN_SELECTIVITY = float(os.getenv('PLANNER_VECTOR_FIRST_MIN_SELECTIVITY', '0.5'))
+
+# Compressed in-process vector index (int8 and/or Matryoshka truncation) with full-precision rescoring
+COMPRESSED_INDEX_ENABLED = str(os.getenv('COMPRESSED_INDEX_ENABLED', 'false')).lower() == 'true'
+VECTOR_QUANTIZE_INT8 = str(os.getenv('VECTOR_QUANTIZE_INT8', 'true')).lower() == 'true'
+VECTOR_TRUNCATE_DIM = int(os.getenv('VECTOR_TRUNCATE_DIM', '0'))  # 0 keeps all 768 dimensions
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', '4'))
+
+# Shared Gemini client: "sdk" talks to Google, "stub" to the local stand-in server (src/llm/stub_server.py),
+# "local" computes the stand-in responses in-process (no network; for benchmarks)
+GEMINI_BACKEND = os.getenv('GEMINI_BACKEND', 'sdk').lower()
+GEMINI_STUB_URL = os.getenv('GEMINI_STUB_URL', 'http://127.0.0.1:8765')
+GENERATION_MODEL = os.getenv('GENERATION_MODEL', 'gemini-2.0-flash')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'models/text-embedding-004')
+# Requests per minute allowed per model (token bucket) and the AIMD concurrency bounds
+GEMINI_GENERATION_RPM = int(os.getenv('GEMINI_GENERATION_RPM', '1000'))
+GEMINI_EMBEDDING_RPM = int(os.getenv('GEMINI_EMBEDDING_RPM', '1500'))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))
+# Share of the concurrency limit that background work (ingest) may use
+GEMINI_BATCH_SHARE = float(os.getenv('GEMINI_BATCH_SHARE', '0.5'))
+
+# Circuit breakers around LLM stages: open after consecutive failures/timeouts, probe again after the reset timeout
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+FILTER_EXTRACTION_TIMEOUT = float(os.getenv('FILTER_EXTRACTION_TIMEOUT', '3.0'))
+EMBEDDING_TIMEOUT = float(os.getenv('EMBEDDING_TIMEOUT', '2.0'))
+GENERATION_TIMEOUT = float(os.getenv('GENERATION_TIMEOUT', '2.0'))
+
+# Start generating on the unfiltered vector results while filter extraction is still running
+SPECULATIVE_GENERATION = str(os.getenv('SPECULATIVE_GENERATION', 'true')).lower() == 'true'
+
+# Structured logging: records are enqueued on the request path and written by a background thread
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # "text" or "json"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Placement-season partitions: each batch is stored in its own collection ("companies_<batch>").
+# Queries target DEFAULT_BATCH unless they name other batches; LEGACY_BATCH lives in the original "companies" collection.
+DEFAULT_BATCH = os.getenv('DEFAULT_BATCH', '2026')
+LEGACY_BATCH = os.getenv('LEGACY_BATCH', '2026')
+PARTITION_FANOUT_WORKERS = int(os.getenv('PARTITION_FANOUT_WORKERS', '8'))
+
+# Vector index of every partition: distance (l2, cosine or ip) and HNSW parameters, applied when a collection
+# is created. Only HNSW_SEARCH_EF can change later; the others need a rebuild (chroma_manager --rebuild-index).
+# Tune them with src/utils/hnsw_benchmark.py
+CHROMA_DISTANCE = os.getenv('CHROMA_DISTANCE', 'l2')
+HNSW_M = int(os.getenv('HNSW_M', '16'))
+HNSW_CONSTRUCTION_EF = int(os.getenv('HNSW_CONSTRUCTION_EF', '100'))
+HNSW_SEARCH_EF = int(os.getenv('HNSW_SEARCH_EF', '100'))
+
+# Blue/green index generations: rebuilds go into a new "<collection>__g<timestamp>" collection and are
+# promoted by rewriting the pointer file (kept with the Chroma data), which API workers re-read every
+# INDEX_POINTER_CHECK_SECONDS. Validation rejects a build that shrinks the record count by more than
+# INDEX_MAX_SHRINK or fails the sampled self-retrieval queries; INDEX_GENERATIONS_KEPT remain for rollback
+INDEX_POINTER_PATH = os.getenv('INDEX_POINTER_PATH') or os.path.join(CHROMA_DB_PERSIST_DIRECTORY, 'generations.json')
+INDEX_POINTER_CHECK_SECONDS = float(os.getenv('INDEX_POINTER_CHECK_SECONDS', '2'))
+INDEX_MAX_SHRINK = float(os.getenv('INDEX_MAX_SHRINK', '0.2'))
+INDEX_VALIDATION_SAMPLES = int(os.getenv('INDEX_VALIDATION_SAMPLES', '50'))
+INDEX_GENERATIONS_KEPT = int(os.getenv('INDEX_GENERATIONS_KEPT', '3'))
+# CPU niceness of a build process, so it yields to the API when they share cores (0 keeps the priority)
+INDEX_BUILD_NICE = int(os.getenv('INDEX_BUILD_NICE', '10'))
+
+# Admin endpoints (/admin/...) are disabled unless a token is set; send it as X-Admin-Token
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+# Admin changes are appended to this journal (kept with the Chroma data) so every API worker
+# applies them; workers read it every INDEX_POINTER_CHECK_SECONDS
+LIVE_UPDATE_LOG_PATH = os.getenv('LIVE_UPDATE_LOG_PATH') or os.path.join(CHROMA_DB_PERSIST_DIRECTORY, 'live_updates.jsonl')
+
+# Token budget for the retrieved context in generation prompts (estimated locally)
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '300'))
+
+# Canonical location/branch vocabulary: extra aliases ({"location": {"Bangalore": ["BLR"]}, "branch": {...}})
+# and whether near-miss spellings (one or two typos) resolve to a known value
+VOCABULARY_ALIASES_PATH = os.getenv('VOCABULARY_ALIASES_PATH', os.path.join(DATA_DIRECTORY, 'vocabulary_aliases.json'))
+VOCABULARY_FUZZY = str(os.getenv('VOCABULARY_FUZZY', 'true')).lower() == 'true'
+
+# Request profiling: sample stacks of requests slower than PROFILE_SLOW_MS (0 disables),
+# or of any request sent with "X-Profile: 1" plus the admin token; the last PROFILE_BUFFER_SIZE are kept
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', '20'))
+
+# Structured /search: page size bounds (results come from the in-memory column store and lexical index)
+SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '20'))
+SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '100'))
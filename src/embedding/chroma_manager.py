@@ -1,9 +1,9 @@
+import argparse
 import json
 import os
 import uuid
 import pathlib
 import chromadb
-import google.generativeai as genai
 from dotenv import load_dotenv
 
 # Load .env variables
@@ -15,19 +15,34 @@ JSON_FOLDER_PATH = BASE_DIR / "data" / "chunked_json"
 CHROMA_DB_PATH = BASE_DIR / "chroma_data"
 
 
+from src.config import GEMINI_BACKEND, DEFAULT_BATCH
+from src.llm.gemini_client import gemini, BATCH
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and GEMINI_BACKEND not in ("stub", "local"):
     raise EnvironmentError("GEMINI_API_KEY not found! Please set it as an environment variable.")
+from src.retrieval.stats import collection_stats, load_collection_stats
+from src.embedding.dedup import DuplicateDetector, deduplicate_companies, find_duplicate_groups
+from src.retrieval.partitions import get_partition, collection_name, get_all
+from src.embedding.generations import build_and_promote, rebuild_generation, print_report
+from src.retrieval.vocabulary import vocabulary, count_values
+from src.embedding.records import build_embedding_text, extract_metadata
 
-genai.configure(api_key=GEMINI_API_KEY)
-
-from src.config import get_chroma_client
+# Placement batch being written; each batch has its own partition (see use_batch)
+BATCH_NAME = DEFAULT_BATCH
+collection = get_partition(BATCH_NAME, create=True)
 
-# Persistent Chroma Client via shared config
-client = get_chroma_client()
+# Planner statistics describe the default batch only
+TRACK_STATS = True
 
-# Create or get collection
-collection = client.get_or_create_collection(name="companies")
+def use_batch(batch: str):
+    """Point ingestion and maintenance at another batch's partition."""
+    global BATCH_NAME, collection, TRACK_STATS
+    BATCH_NAME = str(batch).strip()
+    collection = get_partition(BATCH_NAME, create=True)
+    TRACK_STATS = BATCH_NAME == DEFAULT_BATCH
+    print(f"Using batch {BATCH_NAME} (collection {collection_name(BATCH_NAME)}, {collection.count()} records)")
+    return collection
 
 # Embedding Generation
 def generate_embedding(text: str):
@@ -36,61 +51,48 @@ def generate_embedding(text: str):
     Returns a list of floats (768 dimensions)
     """
     try:
-        response = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text
-        )
+        # Ingest runs at batch priority so it never starves interactive queries
+        response = gemini.embed_content(text, priority=BATCH)
         return response['embedding']
     except Exception as e:
         print(f"Error generating embedding: {e}")
         return [0.0] * 768  # fallback to prevent pipeline crash
 
 
-# Metadata Processing
-def extract_metadata(company):
-    """
-    Extract and clean metadata from company JSON.
-    - Converts keys to lowercase and underscores
-    - Keeps numeric values like CTC, LPA, Stipend as numbers
-    """
-    meta = {}
-    numeric_keys = {"ctc", "lpa", "stipend"}
-
-    for item in company.get("Keys", []):
-        key_name = item["key"].lower().replace(" ", "_")
-        value = item["value"]
-
-        # Convert numeric values where appropriate
-        if key_name in numeric_keys and isinstance(value, (int, float, str)):
-            try:
-                value = float(str(value).replace(",", ""))
-            except (ValueError, TypeError):
-                pass
-
-        meta[key_name] = value
-
-    meta["name"] = company["Name"].strip()  # Always include company name
-    return meta
-
-# Text Processing
-def build_embedding_text(company):
-    """Build a clean text string for embedding generation."""
-    text = f"Company Name: {company['Name']}\n"
-    text += f"Description: {company.get('description', '')}\n"
-    for item in company.get("Keys", []):
-        text += f"{item['key']}: {item['value']}\n"
-    return text
-
 # ---------------------
 # JSON Processing
 # ---------------------
-def process_json_file(json_path):
+def seed_detector(detector: DuplicateDetector):
+    """Register the records already stored so re-ingesting them is skipped."""
+    stored = get_all(collection, ["documents", "metadatas"])
+    for doc_id, doc, meta in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+        detector.add(doc_id, (meta or {}).get("name", ""), doc or "")
+    return detector
+
+def print_dedup_report(report, source):
+    if not report["collapsed"]:
+        return
+    print(f"Collapsed {len(report['collapsed'])} duplicate companies from {source} "
+          f"({report['exact']} exact, {report['near']} near, {report['existing']} already stored)")
+    for entry in report["collapsed"]:
+        target = entry.get("merged_into") or entry.get("matches_stored")
+        print(f"   - {entry['name']} → {target} ({entry['kind']}, similarity {entry['similarity']})")
+
+def process_json_file(json_path, detector=None):
     """Process a single JSON file and store data into ChromaDB."""
     with open(json_path, "r", encoding="utf-8") as f:
         companies_data = json.load(f)
 
     print(f"Processing {len(companies_data)} companies from {os.path.basename(json_path)}")
 
+    # Skip records already stored and merge duplicates within the file
+    detector = detector or seed_detector(DuplicateDetector())
+    companies_data, report = deduplicate_companies(companies_data, build_embedding_text, detector)
+    print_dedup_report(report, os.path.basename(json_path))
+    if not companies_data:
+        print(f"No new companies in {os.path.basename(json_path)}")
+        return report
+
     ids, documents, metadatas, embeddings = [], [], [], []
 
     for company in companies_data:
@@ -102,7 +104,7 @@ def process_json_file(json_path):
 
         ids.append(company_id)
         documents.append(text)
-        metadatas.append(extract_metadata(company))
+        metadatas.append(extract_metadata(company, BATCH_NAME))
         embeddings.append(vector)
 
     # Add data to Chroma
@@ -113,22 +115,152 @@ def process_json_file(json_path):
         embeddings=embeddings
     )
 
+    # Keep the planner/status statistics in step with the collection
+    if TRACK_STATS:
+        collection_stats.add(metadatas)
+        collection_stats.save()
+    vocabulary.add(metadatas)
+
     print(f"Added {len(ids)} companies to ChromaDB from {os.path.basename(json_path)}")
+    return report
+
+def process_all_json(json_folder=JSON_FOLDER_PATH):
+    """Process all JSON files in the chunked_json directory (or another batch's folder)."""
+    json_folder = pathlib.Path(json_folder)
+    if not json_folder.exists():
+        raise FileNotFoundError(f"JSON folder not found: {json_folder}")
 
-def process_all_json():
-    """Process all JSON files in the chunked_json directory."""
-    if not JSON_FOLDER_PATH.exists():
-        raise FileNotFoundError(f"JSON folder not found: {JSON_FOLDER_PATH}")
+    if TRACK_STATS:
+        load_collection_stats(collection)
+    load_vocabulary()
 
-    for file_name in os.listdir(JSON_FOLDER_PATH):
+    # One detector across all files, so duplicates split over chunks are caught too
+    detector = seed_detector(DuplicateDetector())
+    collapsed = 0
+    for file_name in os.listdir(json_folder):
         if file_name.endswith(".json"):
-            process_json_file(JSON_FOLDER_PATH / file_name)
+            collapsed += len(process_json_file(json_folder / file_name, detector)["collapsed"])
+
+    print(f"All JSON files processed and embedded into ChromaDB successfully! ({collapsed} duplicates collapsed)")
+
+def dedupe_collection(apply: bool = False):
+    """
+    Find duplicate companies already stored in the collection.
+    With apply=True, metadata missing from the kept record is copied over
+    from its duplicates and the duplicates are deleted.
+    """
+    stored = get_all(collection, ["documents", "metadatas"])
+    metas = dict(zip(stored["ids"], stored["metadatas"]))
+    names = [(m or {}).get("name", "") for m in stored["metadatas"]]
+    groups = find_duplicate_groups(stored["ids"], names, stored["documents"])
+
+    total = sum(len(g["duplicates"]) for g in groups)
+    print(f"Found {total} duplicates of {len(groups)} companies in {len(stored['ids'])} records")
+    for group in groups:
+        dupes = ", ".join(f"{d['id']} ({d['kind']} {d['similarity']})" for d in group["duplicates"])
+        print(f"   - {group['name']}: keep {group['keep']}, drop {dupes}")
+
+    if not apply or not groups:
+        return groups
+
+    for group in groups:
+        kept_meta = dict(metas[group["keep"]] or {})
+        dup_ids = [d["id"] for d in group["duplicates"]]
+        for dup_id in dup_ids:
+            for key, value in (metas[dup_id] or {}).items():
+                kept_meta.setdefault(key, value)
+        if kept_meta != metas[group["keep"]]:
+            collection.update(ids=[group["keep"]], metadatas=[kept_meta])
+            if TRACK_STATS:
+                collection_stats.remove([metas[group["keep"]]])
+                collection_stats.add([kept_meta])
+        collection.delete(ids=dup_ids)
+        if TRACK_STATS:
+            collection_stats.remove([metas[d] for d in dup_ids])
 
-    print("All JSON files processed and embedded into ChromaDB successfully!")
+    if TRACK_STATS:
+        collection_stats.save()
+    print(f"Removed {total} duplicate records, {collection.count()} remain")
+    return groups
 
 
+def load_vocabulary():
+    """Build the canonical vocabulary from the values already stored in this batch."""
+    if TRACK_STATS and collection_stats.loaded:
+        return vocabulary.build(collection_stats.value_counts)
+    return vocabulary.build(count_values(get_all(collection, ["metadatas"])["metadatas"]))
+
+def canonicalize_collection(apply: bool = False):
+    """
+    Report stored location/branch values that are not in their canonical
+    spelling. With apply=True, the metadata is rewritten in place (no re-embedding).
+    """
+    load_vocabulary()
+    stored = get_all(collection, ["metadatas"])
+    changed_ids, old_metas, new_metas = [], [], []
+    renames = {}
+    for doc_id, meta in zip(stored["ids"], stored["metadatas"]):
+        meta = meta or {}
+        canonical = vocabulary.canonicalize_metadata(meta)
+        if canonical != meta:
+            changed_ids.append(doc_id)
+            old_metas.append(meta)
+            new_metas.append(canonical)
+            for field, value in meta.items():
+                if canonical[field] != value:
+                    renames[(value, canonical[field])] = renames.get((value, canonical[field]), 0) + 1
+
+    print(f"{len(changed_ids)} of {len(stored['ids'])} records have non-canonical locations or branches")
+    for (old, new), count in sorted(renames.items(), key=lambda item: -item[1]):
+        print(f"   - {old} → {new} ({count})")
+
+    if not apply or not changed_ids:
+        return renames
+
+    collection.update(ids=changed_ids, metadatas=new_metas)
+    if TRACK_STATS:
+        collection_stats.remove(old_metas)
+        collection_stats.add(new_metas)
+        collection_stats.save()
+    print(f"Rewrote {len(changed_ids)} records")
+    return renames
+
+
+def build_generation(json_folder=JSON_FOLDER_PATH, promote_after: bool = True, force: bool = False):
+    """
+    Ingest into a new generation of the batch instead of the live collection,
+    then validate it against the live one and promote it. Queries keep using
+    the live collection until the promotion, and it stays available for rollback.
+    """
+    live, track = collection, TRACK_STATS
+
+    def fill(target):
+        global collection, TRACK_STATS
+        collection, TRACK_STATS = target, False
+        try:
+            process_all_json(json_folder)
+        finally:
+            collection, TRACK_STATS = live, track
+
+    result = build_and_promote(BATCH_NAME, fill, promote_after=promote_after, force=force)
+    after_build(result)
+    return result
+
+def after_build(result):
+    """Report a generation build; once promoted, point this process at it and refresh the planner statistics."""
+    global collection
+    print_report(result["validation"])
+    if "active" not in result:
+        print(f"Built {result['collection']}; promote with: python -m src.embedding.generations --promote {result['collection']}")
+        return
+    collection = get_partition(BATCH_NAME)
+    if TRACK_STATS:
+        collection_stats.rebuild(collection)
+        collection_stats.save()
+    print(f"Promoted {result['active']} (previous: {result['previous']}); API workers switch within seconds")
+
 # Initialization
-def init_chroma():
+def init_chroma(json_folder=JSON_FOLDER_PATH):
     """
     Initialize ChromaDB:
     - If collection is empty, populate with company data
@@ -137,7 +269,7 @@ def init_chroma():
     """
     if collection.count() == 0:
         print("ChromaDB is empty. Populating with data...")
-        process_all_json()
+        process_all_json(json_folder)
     else:
         print(f"ChromaDB already initialized with {collection.count()} records")
 
@@ -147,4 +279,34 @@ def init_chroma():
 # Main Entry Point
 # ---------------------
 if __name__ == "__main__":
-    init_chroma()
+    parser = argparse.ArgumentParser(description="Populate and maintain the companies collection")
+    parser.add_argument("--dedupe", action="store_true", help="Report duplicate companies already stored")
+    parser.add_argument("--canonicalize", action="store_true", help="Report locations/branches not in their canonical spelling")
+    parser.add_argument("--apply", action="store_true", help="With --dedupe or --canonicalize, apply the changes")
+    parser.add_argument("--rebuild-index", action="store_true",
+                        help="Rebuild the vector index with CHROMA_DISTANCE / HNSW_* from the config (no re-embedding)")
+    parser.add_argument("--generation", action="store_true",
+                        help="Ingest --json-dir into a new generation, validate it and swap it in (zero downtime)")
+    parser.add_argument("--no-promote", action="store_true", help="With --generation, build and validate only")
+    parser.add_argument("--force", action="store_true", help="With --generation, promote even if validation fails")
+    parser.add_argument("--batch", default=DEFAULT_BATCH, help="Placement batch (partition) to write to, e.g. 2027")
+    parser.add_argument("--json-dir", default=str(JSON_FOLDER_PATH), help="Folder of chunked JSON files for this batch")
+    args = parser.parse_args()
+
+    if args.batch != BATCH_NAME:
+        use_batch(args.batch)
+
+    if args.dedupe:
+        if TRACK_STATS:
+            load_collection_stats(collection)
+        dedupe_collection(apply=args.apply)
+    elif args.canonicalize:
+        if TRACK_STATS:
+            load_collection_stats(collection)
+        canonicalize_collection(apply=args.apply)
+    elif args.rebuild_index:
+        after_build(rebuild_generation(BATCH_NAME))
+    elif args.generation:
+        build_generation(args.json_dir, promote_after=not args.no_promote, force=args.force)
+    else:
+        init_chroma(args.json_dir)
@@ -0,0 +1,186 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Legal suffixes dropped when comparing company names
+NAME_SUFFIXES = {
+    "pvt", "private", "ltd", "limited", "inc", "llp", "llc", "corp", "corporation", "co", "company",
+}
+
+_PRIME = (1 << 31) - 1
+
+
+def normalize_name(name: str) -> str:
+    """'Blue Star India Limited' → 'bluestarindia', 'Cognida.ai' → 'cognidaai'."""
+    tokens = re.findall(r"[a-z0-9]+", (name or "").lower())
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    return "".join(tokens)
+
+
+def text_fingerprint(text: str) -> str:
+    """Hash of the whitespace/case-normalized text, for exact duplicates."""
+    normalized = " ".join(re.findall(r"\w+", (text or "").lower()))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """
+    Character n-gram shingles over the alphanumeric characters only, so that
+    PDF extraction artefacts ("KickdrumJob Role" vs "Kickdrum Job Role") still match.
+    """
+    chars = "".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+    if len(chars) < size:
+        return {chars} if chars else set()
+    return {chars[i:i + size] for i in range(len(chars) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures with universal hashing (a*x + b) mod p, vectorized in numpy."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        if not shingle_set:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        x = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+             for s in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        return ((np.outer(x, self.a) + self.b) % _PRIME).min(axis=0)
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the underlying shingle sets."""
+        return float(np.mean(sig_a == sig_b))
+
+
+class DuplicateDetector:
+    """
+    Detect exact and near-duplicate company records.
+    - exact: same normalized text
+    - near: MinHash similarity >= threshold and the same normalized company name,
+      or similarity >= cross_name_threshold regardless of name (renamed postings)
+    Candidates come from LSH banding, so each check only compares against
+    records that share at least one band.
+    """
+
+    def __init__(self, threshold: float = 0.8, cross_name_threshold: float = 0.95,
+                 num_perm: int = 64, bands: int = 16):
+        self.threshold = threshold
+        self.cross_name_threshold = cross_name_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._fingerprints: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._names: Dict[str, str] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def check(self, name: str, text: str) -> Optional[Dict[str, Any]]:
+        """Return the best matching record already added, or None."""
+        fingerprint = text_fingerprint(text)
+        if fingerprint in self._fingerprints:
+            return {"key": self._fingerprints[fingerprint], "kind": "exact", "similarity": 1.0}
+
+        signature = self.hasher.signature(shingles(text))
+        normalized = normalize_name(name)
+        candidates = {key for band_key in self._band_keys(signature) for key in self._buckets.get(band_key, [])}
+        best = None
+        for key in candidates:
+            score = self.hasher.similarity(signature, self._signatures[key])
+            required = self.threshold if self._names[key] == normalized else self.cross_name_threshold
+            if score >= required and (best is None or score > best["similarity"]):
+                best = {"key": key, "kind": "near", "similarity": round(score, 3)}
+        return best
+
+    def add(self, key: str, name: str, text: str):
+        signature = self.hasher.signature(shingles(text))
+        self._fingerprints.setdefault(text_fingerprint(text), key)
+        self._signatures[key] = signature
+        self._names[key] = normalize_name(name)
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].append(key)
+
+
+def merge_companies(kept: Dict[str, Any], duplicate: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill keys missing from the kept record with the duplicate's values."""
+    merged = dict(kept)
+    keys = list(kept.get("Keys", []))
+    present = {item["key"].lower() for item in keys}
+    for item in duplicate.get("Keys", []):
+        if item["key"].lower() not in present:
+            keys.append(item)
+            present.add(item["key"].lower())
+    merged["Keys"] = keys
+    if len(duplicate.get("description", "")) > len(kept.get("description", "")):
+        merged["description"] = duplicate["description"]
+    return merged
+
+
+def deduplicate_companies(companies: List[Dict[str, Any]], build_text,
+                          detector: Optional[DuplicateDetector] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Collapse duplicates within a list of company records.
+    Records matching one already known to `detector` (e.g. seeded from the
+    collection) are skipped; duplicates within the list are merged into the
+    first occurrence. Returns the unique records and a report of what was collapsed.
+    """
+    detector = detector or DuplicateDetector()
+    unique: List[Dict[str, Any]] = []
+    positions: Dict[str, int] = {}
+    report = {"input": len(companies), "exact": 0, "near": 0, "existing": 0, "collapsed": []}
+
+    for company in companies:
+        text = build_text(company)
+        match = detector.check(company["Name"], text)
+        if match is None:
+            key = f"new:{len(unique)}"
+            positions[key] = len(unique)
+            unique.append(company)
+            detector.add(key, company["Name"], text)
+            continue
+
+        report[match["kind"]] += 1
+        entry = {"name": company["Name"].strip(), "kind": match["kind"], "similarity": match["similarity"]}
+        if match["key"] in positions:
+            kept = unique[positions[match["key"]]]
+            unique[positions[match["key"]]] = merge_companies(kept, company)
+            entry["merged_into"] = kept["Name"].strip()
+        else:
+            report["existing"] += 1
+            entry["matches_stored"] = match["key"]
+        report["collapsed"].append(entry)
+
+    report["kept"] = len(unique)
+    return unique, report
+
+
+def find_duplicate_groups(ids: List[str], names: List[str], texts: List[str],
+                          detector: Optional[DuplicateDetector] = None) -> List[Dict[str, Any]]:
+    """Group stored records into duplicate clusters; the first record of each cluster is kept."""
+    detector = detector or DuplicateDetector()
+    groups: Dict[str, Dict[str, Any]] = {}
+    for doc_id, name, text in zip(ids, names, texts):
+        match = detector.check(name, text)
+        if match is None:
+            detector.add(doc_id, name, text)
+            groups[doc_id] = {"keep": doc_id, "name": name, "duplicates": []}
+        else:
+            groups[match["key"]]["duplicates"].append(
+                {"id": doc_id, "kind": match["kind"], "similarity": match["similarity"]}
+            )
+    return [g for g in groups.values() if g["duplicates"]]
@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.config import (
+    get_chroma_client, DEFAULT_BATCH, INDEX_MAX_SHRINK, INDEX_VALIDATION_SAMPLES, INDEX_GENERATIONS_KEPT,
+    INDEX_BUILD_NICE
+)
+from src.retrieval.partitions import (
+    GENERATION_SEPARATOR, READ_PAGE_SIZE, collection_name, active_collection, generation_pointer,
+    get_partition, index_configuration, refresh_generations, build_in_progress
+)
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# A sampled record counts as found when its own embedding returns it first (or an identical vector)
+SELF_MATCH_DISTANCE = 1e-6
+MIN_SELF_RECALL = 0.9
+
+
+class ValidationError(RuntimeError):
+    """A generation failed validation and was not promoted."""
+
+
+def _collection_names() -> List[str]:
+    return [getattr(c, "name", c) for c in get_chroma_client().list_collections()]
+
+
+def generation_name(batch: str) -> str:
+    """New, unused generation name: "companies__g20261019T083000" (suffixed if built twice in a second)."""
+    base = f"{collection_name(batch)}{GENERATION_SEPARATOR}{time.strftime('%Y%m%dT%H%M%S')}"
+    existing = set(_collection_names())
+    name, number = base, 1
+    while name in existing:
+        number += 1
+        name = f"{base}-{number}"
+    return name
+
+
+def create_generation(batch: str = DEFAULT_BATCH, **settings):
+    """Empty collection for a new generation of a batch, with the configured (or given) index settings."""
+    name = generation_name(batch)
+    collection = get_chroma_client().create_collection(name=name, configuration=index_configuration(**settings))
+    logger.info("Generation created", extra={"batch": batch, "collection": name})
+    return collection
+
+
+def checksum(collection, page_size: int = READ_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Content checksum (ids, documents, metadata and embeddings, in id order) read
+    page by page, plus the embedding problems found on the way. Two collections
+    with the same records have the same checksum, whatever their index settings.
+    """
+    digests: Dict[str, str] = {}
+    problems: List[str] = []
+    dimensions = set()
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        embeddings = page.get("embeddings")
+        for i, doc_id in enumerate(ids):
+            vector = None if embeddings is None else embeddings[i]
+            if vector is None or not len(vector):
+                problems.append(f"{doc_id}: no embedding")
+                continue
+            vector = np.asarray(vector, dtype=np.float32)
+            dimensions.add(vector.shape[0])
+            if not np.all(np.isfinite(vector)) or not np.any(vector):
+                problems.append(f"{doc_id}: zero or non-finite embedding")
+            record = hashlib.sha256()
+            record.update(doc_id.encode("utf-8"))
+            record.update((page["documents"][i] or "").encode("utf-8"))
+            record.update(json.dumps(page["metadatas"][i] or {}, sort_keys=True, default=str).encode("utf-8"))
+            record.update(vector.tobytes())
+            digests[doc_id] = record.hexdigest()
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    if len(dimensions) > 1:
+        problems.append(f"mixed embedding dimensions {sorted(dimensions)}")
+    total = hashlib.sha256()
+    for doc_id in sorted(digests):
+        total.update(digests[doc_id].encode("ascii"))
+    return {"checksum": total.hexdigest(), "records": len(digests), "dimension": min(dimensions, default=None),
+            "problems": problems[:20], "problem_count": len(problems)}
+
+
+def sample_queries(collection, samples: int = INDEX_VALIDATION_SAMPLES) -> Dict[str, Any]:
+    """
+    Query the index with the stored embeddings of evenly spaced records: each
+    should come back first. Catches an index that is missing or out of step with the records.
+    """
+    count = collection.count()
+    if not count or samples <= 0:
+        return {"samples": 0, "self_recall": None, "p50_ms": None}
+    step = max(1, count // samples)
+    found, latencies = 0, []
+    offsets = list(range(0, count, step))[:samples]
+    for offset in offsets:
+        record = collection.get(include=["embeddings"], limit=1, offset=offset)
+        doc_id, vector = record["ids"][0], record["embeddings"][0]
+        start = time.perf_counter()
+        hits = collection.query(query_embeddings=[vector], n_results=1, include=["distances"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        if hits["ids"][0] and (hits["ids"][0][0] == doc_id or hits["distances"][0][0] <= SELF_MATCH_DISTANCE):
+            found += 1
+    return {"samples": len(offsets), "self_recall": round(found / len(offsets), 4),
+            "p50_ms": round(float(np.median(latencies)), 2)}
+
+
+def validate(collection, reference=None, max_shrink: float = INDEX_MAX_SHRINK,
+             samples: int = INDEX_VALIDATION_SAMPLES, expect_checksum: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Check a generation before it is promoted:
+    - it has records, and every record has a finite, non-zero embedding of one dimension
+    - it has no fewer than (1 - max_shrink) x the records of `reference` (the active generation)
+    - sampled self-retrieval queries find their own record
+    - with expect_checksum (a copy), the content checksum matches
+    Returns the report; report["ok"] is False if any check failed.
+    """
+    report: Dict[str, Any] = {"collection": collection.name, "validated": time.time()}
+    report.update(checksum(collection))
+    report.update(sample_queries(collection, samples))
+    failures = []
+    if not report["records"]:
+        failures.append("no records")
+    if report["problem_count"]:
+        failures.append(f"{report['problem_count']} records with bad embeddings")
+    if reference is not None and reference.name != collection.name:
+        report["reference"] = reference.name
+        report["reference_records"] = reference.count()
+        if report["records"] < (1 - max_shrink) * report["reference_records"]:
+            failures.append(f"{report['records']} records, down from {report['reference_records']} "
+                            f"(more than {max_shrink:.0%} fewer)")
+    if report["self_recall"] is not None and report["self_recall"] < MIN_SELF_RECALL:
+        failures.append(f"self-retrieval recall {report['self_recall']} below {MIN_SELF_RECALL}")
+    if expect_checksum and report["checksum"] != expect_checksum:
+        failures.append("checksum differs from the source")
+    report["failures"] = failures
+    report["ok"] = not failures
+    return report
+
+
+def promote(batch: str, name: str, report: Optional[Dict[str, Any]] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Make a generation the active one by rewriting the pointer file. The previous
+    generation is kept for rollback. Pass the validation report, or force=True.
+    """
+    logical = collection_name(batch)
+    if not name.startswith(logical + GENERATION_SEPARATOR) and name != logical:
+        raise ValueError(f"{name} is not a generation of {logical}")
+    if name not in _collection_names():
+        raise ValueError(f"No collection named {name}")
+    if report is not None and not report.get("ok") and not force:
+        raise ValidationError(f"{name} failed validation: {', '.join(report['failures'])}")
+    if report is None and not force:
+        raise ValidationError(f"{name} has not been validated; validate it or pass force")
+
+    entry = generation_pointer.entry(logical)
+    current = entry.get("active") or logical
+    details = entry.get("generations", {})
+    changed = source_changed(details.get(name, {}), current)
+    if changed and not force:
+        raise ValidationError(f"Cannot promote {name}: {changed}, so updates made since would be lost. "
+                              "Rebuild it or pass force")
+    history = [g for g in entry.get("history", []) if g not in (name, current)]
+    if current != name:
+        history.insert(0, current)
+    details[name] = dict(details.get(name, {}), promoted=time.time(),
+                         **({"validation": report} if report is not None else {}))
+    generation_pointer.write(logical, {"active": name, "history": history, "generations": details})
+    refresh_generations()
+    logger.info("Generation promoted", extra={"batch": batch, "collection": name, "previous": current})
+    return {"active": name, "previous": current}
+
+
+def source_changed(details: Dict[str, Any], current: str) -> Optional[str]:
+    """
+    Why promoting a build would lose writes: the active generation is no longer
+    the one it was built alongside, or its records changed during or after the build.
+    None if nothing changed (or the build recorded no source).
+    """
+    source = details.get("source")
+    if not source:
+        return None
+    if source != current:
+        return f"it was built while {source} was active, now {current}"
+    if checksum(get_chroma_client().get_collection(current))["checksum"] != details.get("source_checksum"):
+        return f"{current} changed after the build started"
+    return None
+
+
+def _mark_build(batch: str, name: str, building: bool, **details):
+    """Set or clear the pointer's build marker (admin writes are refused while set) and record build details."""
+    logical = collection_name(batch)
+    entry = generation_pointer.entry(logical)
+    if building:
+        entry["building"] = name
+    elif entry.get("building") == name:
+        entry.pop("building")
+    if details:
+        entry.setdefault("generations", {}).setdefault(name, {}).update(details)
+    generation_pointer.write(logical, entry)
+
+
+def rollback(batch: str = DEFAULT_BATCH) -> Dict[str, Any]:
+    """Switch back to the previous generation (the one rolled back from becomes the previous one)."""
+    logical = collection_name(batch)
+    entry = generation_pointer.entry(logical)
+    history = [g for g in entry.get("history", []) if g in set(_collection_names())]
+    if not history:
+        raise ValueError(f"No earlier generation of {logical} to roll back to")
+    current = entry.get("active") or logical
+    target = history.pop(0)
+    generation_pointer.write(logical, dict(entry, active=target, history=[current] + history))
+    refresh_generations()
+    logger.info("Generation rolled back", extra={"batch": batch, "collection": target, "previous": current})
+    return {"active": target, "previous": current}
+
+
+def prune(batch: str = DEFAULT_BATCH, keep: int = INDEX_GENERATIONS_KEPT) -> List[str]:
+    """
+    Delete old generations: the active one and the newest keep-1 before it stay,
+    as do unpromoted builds newer than the active one (they may be about to be promoted).
+    """
+    logical = collection_name(batch)
+    entry = generation_pointer.entry(logical)
+    active = entry.get("active") or logical
+    kept = {active, *entry.get("history", [])[:max(0, keep - 1)]}
+    deleted = []
+    for name in _collection_names():
+        if name != logical and not name.startswith(logical + GENERATION_SEPARATOR):
+            continue
+        if name in kept or (name > active and name.startswith(logical + GENERATION_SEPARATOR)):
+            continue
+        get_chroma_client().delete_collection(name)
+        deleted.append(name)
+    if deleted:
+        history = [g for g in entry.get("history", []) if g not in deleted]
+        details = {g: d for g, d in entry.get("generations", {}).items() if g not in deleted}
+        generation_pointer.write(logical, dict(entry, active=active, history=history, generations=details))
+        logger.info("Generations pruned", extra={"batch": batch, "deleted": deleted})
+    return deleted
+
+
+def list_generations(batch: str = DEFAULT_BATCH) -> List[Dict[str, Any]]:
+    logical = collection_name(batch)
+    entry = generation_pointer.entry(logical)
+    active = entry.get("active") or logical
+    details = entry.get("generations", {})
+    client = get_chroma_client()
+    rows = []
+    for name in sorted(_collection_names()):
+        if name != logical and not name.startswith(logical + GENERATION_SEPARATOR):
+            continue
+        validation = details.get(name, {}).get("validation") or {}
+        rows.append({
+            "collection": name,
+            "state": "active" if name == active else ("previous" if name in entry.get("history", []) else "built"),
+            "records": client.get_collection(name).count(),
+            "checksum": (validation.get("checksum") or "")[:12] or None,
+            "promoted": details.get(name, {}).get("promoted"),
+        })
+    return rows
+
+
+def build_and_promote(batch: str, fill, expect_checksum: Optional[str] = None, promote_after: bool = True,
+                      force: bool = False, **settings) -> Dict[str, Any]:
+    """
+    Build a new generation with fill(collection), validate it against the active
+    one and promote it. The live collection is never written; a failed build or
+    validation leaves it serving and the new collection in place for inspection.
+    Admin writes to the batch are refused while the build runs, and promotion
+    (now or later) is refused if the active generation changed since the build started.
+    """
+    if INDEX_BUILD_NICE and hasattr(os, "nice"):
+        os.nice(INDEX_BUILD_NICE)  # this process only; the API keeps its priority
+    reference = get_partition(batch, create=True)
+    target = create_generation(batch, **settings)
+    _mark_build(batch, target.name, True)
+    try:
+        # Taken after the marker is set: later writes are either refused or caught by promote()
+        _mark_build(batch, target.name, True, source=reference.name,
+                    source_checksum=checksum(reference)["checksum"])
+        fill(target)
+        report = validate(target, reference, expect_checksum=expect_checksum)
+        if not report["ok"] and not force:
+            logger.error("Generation failed validation", extra={"collection": target.name, "failures": report["failures"]})
+            raise ValidationError(f"{target.name} failed validation: {', '.join(report['failures'])}")
+        result = {"collection": target.name, "validation": report}
+        if promote_after:
+            result.update(promote(batch, target.name, report, force=force))
+    finally:
+        _mark_build(batch, target.name, False)
+    return result
+
+
+def copy_records(source, target, page_size: int = READ_PAGE_SIZE):
+    """Copy records with their stored embeddings (no re-embedding)."""
+    step = min(page_size, get_chroma_client().get_max_batch_size())
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=step, offset=offset)
+        if page["ids"]:
+            target.add(ids=page["ids"], embeddings=page["embeddings"],
+                       documents=page["documents"], metadatas=page["metadatas"])
+        if len(page["ids"]) < step:
+            return
+        offset += step
+
+
+def rebuild_generation(batch: str = DEFAULT_BATCH, **settings) -> Dict[str, Any]:
+    """New generation with the same records under new index settings (see chroma_manager --rebuild-index)."""
+    source = get_partition(batch)
+    expected = checksum(source)["checksum"]
+    return build_and_promote(batch, lambda target: copy_records(source, target), expect_checksum=expected, **settings)
+
+
+def print_report(report: Dict[str, Any]):
+    status = "passed" if report["ok"] else "FAILED: " + "; ".join(report["failures"])
+    print(f"Validation of {report['collection']} {status}")
+    print(f"   records {report['records']} (active: {report.get('reference_records', '-')}), "
+          f"self-retrieval {report['self_recall']} over {report['samples']} samples (p50 {report['p50_ms']} ms), "
+          f"checksum {report['checksum'][:12]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List, validate, promote, roll back and prune index generations")
+    parser.add_argument("--batch", default=DEFAULT_BATCH)
+    parser.add_argument("--validate", metavar="COLLECTION", help="Validate a generation against the active one")
+    parser.add_argument("--promote", metavar="COLLECTION", help="Validate, then make a generation active")
+    parser.add_argument("--force", action="store_true", help="With --promote, promote even if validation fails")
+    parser.add_argument("--rollback", action="store_true", help="Switch back to the previous generation")
+    parser.add_argument("--prune", action="store_true", help="Delete generations beyond INDEX_GENERATIONS_KEPT")
+    parser.add_argument("--end-build", action="store_true",
+                        help="Clear the build marker left by a build that was killed (re-enables admin writes)")
+    args = parser.parse_args()
+
+    if args.validate or args.promote:
+        name = args.validate or args.promote
+        report = validate(get_chroma_client().get_collection(name), get_partition(args.batch))
+        print_report(report)
+        if args.promote:
+            result = promote(args.batch, name, report, force=args.force)
+            print(f"Active: {result['active']} (previous: {result['previous']})")
+    elif args.rollback:
+        result = rollback(args.batch)
+        print(f"Rolled back to {result['active']} (from {result['previous']})")
+    elif args.prune:
+        deleted = prune(args.batch)
+        print(f"Deleted {len(deleted)} generations" + (f": {', '.join(deleted)}" if deleted else ""))
+    elif args.end_build:
+        building = build_in_progress(args.batch)
+        if building:
+            _mark_build(args.batch, building, False)
+        print(f"Cleared the build marker for {building}" if building else "No build in progress")
+
+    building = build_in_progress(args.batch)
+    print(f"Generations of batch {args.batch} (active: {active_collection(args.batch)}"
+          + (f", building: {building}" if building else "") + "):")
+    for row in list_generations(args.batch):
+        print(f"   {row['state']:>8}  {row['collection']}  {row['records']} records"
+              + (f", checksum {row['checksum']}" if row["checksum"] else ""))
@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from src.config import DEFAULT_BATCH, LIVE_UPDATE_LOG_PATH
+from src.llm.gemini_client import gemini, INTERACTIVE
+from src.embedding.records import build_embedding_text, extract_metadata
+from src.retrieval.partitions import (
+    get_partition, list_batches, adjust_partition_count, build_in_progress, active_collection,
+    UnknownBatchError, BuildInProgressError
+)
+from src.retrieval.stats import collection_stats
+from src.retrieval.facets import column_store
+from src.retrieval.search import lexical_index
+from src.retrieval.vocabulary import vocabulary
+from src.retrieval import retriever2
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# One writer at a time, so the collection and the in-memory indexes change together
+_write_lock = threading.Lock()
+
+
+class CompanyNotFoundError(KeyError):
+    """No stored company has the given ID."""
+
+
+class UpdateJournal:
+    """
+    Append-only log of admin changes shared by all API workers, one JSON line per
+    change. The worker that made a change applies it at once; the others replay it
+    from here, so their caches and in-memory indexes follow the collection.
+    """
+
+    def __init__(self, path: str = LIVE_UPDATE_LOG_PATH):
+        self.path = path
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]):
+        line = (json.dumps(entry, default=str) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # A single write on an O_APPEND descriptor, so lines from concurrent workers never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def skip_to_end(self):
+        """Ignore earlier changes: the indexes were just loaded from the collection, which has them."""
+        with self._lock:
+            self._offset = self._size()
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Complete lines appended since the last read."""
+        with self._lock:
+            size = self._size()
+            if size < self._offset:
+                self._offset = 0  # The journal was removed or replaced
+            if size == self._offset:
+                return []
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(size - self._offset)
+            data = data[:data.rfind(b"\n") + 1]  # A line still being written is read next time
+            self._offset += len(data)
+        entries = []
+        for line in data.splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.error("Unreadable live update journal line", extra={"path": self.path})
+        return entries
+
+
+journal = UpdateJournal()
+# Tells this worker's own journal entries apart (process IDs can be reused after a restart)
+_origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _check_no_build(batch: str):
+    """Refuse writes while a new generation is built: it is filled from other data and would drop them."""
+    building = build_in_progress(batch)
+    if building:
+        raise BuildInProgressError(f"Generation {building} of batch {batch} is being built; retry after it is promoted")
+
+
+def _find_existing(collection, company: Dict[str, Any], doc_id: Optional[str]):
+    """Return (id, metadata) of the record this upsert replaces, or (None, None)."""
+    if doc_id:
+        found = collection.get(ids=[doc_id], include=["metadatas"])
+    else:
+        # Without an ID, a company is matched by its exact stored name
+        found = collection.get(where={"name": company["Name"].strip()}, include=["metadatas"])
+        if len(found["ids"]) > 1:
+            raise ValueError(f"{len(found['ids'])} stored records are named '{company['Name'].strip()}', pass an id")
+    if found["ids"]:
+        return found["ids"][0], found["metadatas"][0] or {}
+    return None, None
+
+
+def _update_indexes(batch: str, removed: List[Dict[str, Any]], removed_ids: List[str],
+                    added_ids: List[str], added: List[Dict[str, Any]], vectors: List[List[float]],
+                    documents: Optional[List[str]] = None, save: bool = True):
+    """Apply a change to the statistics, vocabulary, column store, lexical and compressed indexes (default batch only)."""
+    adjust_partition_count(batch, len(added_ids) - len(removed_ids))
+    if batch != DEFAULT_BATCH:
+        return
+    if collection_stats.loaded:
+        collection_stats.remove(removed)
+        collection_stats.add(added)
+        if save:
+            collection_stats.save()
+        vocabulary.build(collection_stats.value_counts)
+    if column_store.loaded:
+        # Added IDs too: a replayed change may already be in a store loaded just before it
+        column_store.remove(removed_ids + added_ids)
+        column_store.add(added_ids, added)
+    if lexical_index.loaded:
+        lexical_index.remove(removed_ids)
+        lexical_index.add(added_ids, documents or [None] * len(added_ids), added)
+    if retriever2.compressed_index is not None:
+        retriever2.compressed_index.remove(removed_ids)
+        if added_ids:
+            retriever2.compressed_index.upsert(added_ids, vectors)
+
+
+def _apply_change(batch: str, removed: List[Dict[str, Any]], removed_ids: List[str],
+                  added_ids: List[str], added: List[Dict[str, Any]], vectors: List[List[float]],
+                  documents: List[str]):
+    """Update this worker's indexes, then record the change for the other workers."""
+    _update_indexes(batch, removed, removed_ids, added_ids, added, vectors, documents)
+    try:
+        journal.append({
+            "origin": _origin, "batch": batch, "collection": active_collection(batch),
+            "removed_ids": removed_ids, "removed": removed,
+            "added_ids": added_ids, "added": added, "documents": documents,
+            "vectors": [[float(x) for x in vector] for vector in vectors],
+        })
+    except OSError:
+        logger.exception("Writing the live update journal failed; other workers keep the old data")
+
+
+def apply_journal() -> List[str]:
+    """
+    Replay the changes other workers made since the last call. Returns the
+    document IDs they touched, whose cached answers the caller must drop.
+    """
+    changed: List[str] = []
+    for entry in journal.read_new():
+        if entry.get("origin") == _origin:
+            continue
+        batch = entry["batch"]
+        if entry.get("collection") != active_collection(batch):
+            continue  # Made to another generation; a generation switch reloads everything anyway
+        with _write_lock:
+            _update_indexes(batch, entry["removed"], entry["removed_ids"], entry["added_ids"],
+                            entry["added"], entry["vectors"], entry["documents"], save=False)
+        changed.extend(entry["removed_ids"] + entry["added_ids"])
+    if changed:
+        logger.info("Applied admin changes from other workers", extra={"documents": len(changed)})
+    return changed
+
+
+def upsert_company(company: Dict[str, Any], doc_id: Optional[str] = None,
+                   batch: str = DEFAULT_BATCH) -> Dict[str, Any]:
+    """
+    Insert or replace one company (same JSON shape as the ingest files) and
+    re-embed only that record. Replaces the record with `doc_id`, or the one
+    with the same name; otherwise a new record is created.
+    Returns {"id", "created", "previous_id"}.
+    """
+    if not company.get("Name", "").strip():
+        raise ValueError("Company 'Name' is required")
+    # Only the default partition is created on demand; other batches come from an
+    # ingest, so a mistyped batch name must not silently start an empty partition
+    if batch != DEFAULT_BATCH and batch not in list_batches():
+        raise UnknownBatchError(f"No partition for batch {batch}")
+    collection = get_partition(batch, create=batch == DEFAULT_BATCH)
+    text = build_embedding_text(company)
+    metadata = extract_metadata(company, batch)
+    # Raises on failure: a zero-vector fallback would silently break search for this record
+    vector = gemini.embed_content(text, priority=INTERACTIVE)["embedding"]
+
+    with _write_lock:
+        _check_no_build(batch)
+        existing_id, existing_meta = _find_existing(collection, company, doc_id)
+        if doc_id and existing_id is None:
+            raise CompanyNotFoundError(doc_id)
+        new_id = existing_id or f"{company['Name'].strip()}_{uuid.uuid4()}"
+        # One upsert, so queries never see the record missing and a failed write keeps the old one.
+        # Chroma merges metadata on upsert: keys dropped from the record are removed by setting them to None
+        stored = dict({key: None for key in existing_meta or {} if key not in metadata}, **metadata)
+        collection.upsert(ids=[new_id], documents=[text], metadatas=[stored], embeddings=[vector])
+        _apply_change(
+            batch,
+            [existing_meta] if existing_id else [], [existing_id] if existing_id else [],
+            [new_id], [metadata], [vector], [text],
+        )
+
+    logger.info("Company upserted", extra={"id": new_id, "batch": batch, "new_record": existing_id is None})
+    return {"id": new_id, "created": existing_id is None, "previous_id": existing_id}
+
+
+def delete_company(doc_id: str, batch: str = DEFAULT_BATCH) -> Dict[str, Any]:
+    """Delete one company by ID. Returns {"id", "name"}."""
+    collection = get_partition(batch)
+    with _write_lock:
+        _check_no_build(batch)
+        found = collection.get(ids=[doc_id], include=["metadatas"])
+        if not found["ids"]:
+            raise CompanyNotFoundError(doc_id)
+        metadata = found["metadatas"][0] or {}
+        collection.delete(ids=[doc_id])
+        _apply_change(batch, [metadata], [doc_id], [], [], [], [])
+
+    logger.info("Company deleted", extra={"id": doc_id, "batch": batch})
+    return {"id": doc_id, "name": metadata.get("name")}
@@ -0,0 +1,170 @@
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows decoded per block during the int8 scan, so a query never materializes the whole float matrix
+SCAN_CHUNK_ROWS = 2048
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row; zero rows stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def truncate(vectors: np.ndarray, dim: Optional[int]) -> np.ndarray:
+    """
+    Matryoshka-style truncation: keep the leading `dim` dimensions and renormalize.
+    text-embedding-004 is trained so that prefixes remain usable embeddings.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dim and dim < vectors.shape[-1]:
+        vectors = vectors[..., :dim]
+    return normalize_rows(vectors)
+
+
+class Int8Quantizer:
+    """Symmetric per-dimension scalar quantization of float vectors to int8."""
+
+    def __init__(self, scales: Optional[np.ndarray] = None):
+        self.scales = scales
+
+    def fit(self, vectors: np.ndarray) -> "Int8Quantizer":
+        peak = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+        peak[peak == 0] = 1.0
+        self.scales = (peak / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scales)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scales
+
+
+class CompressedVectorIndex:
+    """
+    Brute-force cosine index over compressed embeddings with full-precision rescoring.
+    - First pass scans the int8 and/or truncated vectors for `k * rescore_factor` candidates
+    - Candidates are rescored with full-precision vectors from `fetch_full(ids)`
+      (or the kept float matrix) and the top k are returned
+    """
+
+    def __init__(self, quantize: bool = True, truncate_dim: Optional[int] = None,
+                 rescore_factor: int = 4, keep_full: bool = False):
+        self.quantize = quantize
+        self.truncate_dim = truncate_dim or None
+        self.rescore_factor = max(1, rescore_factor)
+        self.keep_full = keep_full
+        self.ids: List[str] = []
+        self.codes: Optional[np.ndarray] = None
+        self.full: Optional[np.ndarray] = None
+        self.quantizer: Optional[Int8Quantizer] = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> "CompressedVectorIndex":
+        full = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        compressed = truncate(full, self.truncate_dim)
+        quantizer = None
+        if self.quantize:
+            quantizer = Int8Quantizer().fit(compressed)
+            compressed = quantizer.encode(compressed)
+        with self._lock:
+            self.ids = list(ids)
+            self.codes = compressed
+            self.quantizer = quantizer
+            self.full = full if self.keep_full else None
+        return self
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """
+        Add or replace vectors without rebuilding. The fitted int8 scales are
+        reused, so values outside the original range are clipped; rebuild
+        after large changes.
+        """
+        if self.codes is None or not self.ids:
+            self.build(ids, vectors)
+            return
+        self.remove(ids)
+        full = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        compressed = truncate(full, self.truncate_dim)
+        with self._lock:
+            if self.quantizer is not None:
+                compressed = self.quantizer.encode(compressed)
+            self.ids.extend(ids)
+            self.codes = np.vstack([self.codes, compressed])
+            if self.full is not None:
+                self.full = np.vstack([self.full, full])
+
+    def remove(self, ids: Sequence[str]):
+        drop = set(ids)
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in drop]
+            if len(keep) == len(self.ids):
+                return
+            self.ids = [self.ids[i] for i in keep]
+            self.codes = self.codes[keep]
+            if self.full is not None:
+                self.full = self.full[keep]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the scan representation (plus the float matrix if kept)."""
+        total = 0 if self.codes is None else self.codes.nbytes
+        if self.quantizer is not None:
+            total += self.quantizer.scales.nbytes
+        if self.full is not None:
+            total += self.full.nbytes
+        return total
+
+    def _first_pass(self, query: np.ndarray, n: int) -> np.ndarray:
+        q = truncate(query[None, :], self.truncate_dim)[0]
+        if self.quantizer is not None:
+            # Fold the per-dimension scales into the query; the int8 codes are widened one
+            # block at a time, so the scan's working memory stays at SCAN_CHUNK_ROWS rows
+            scaled = q * self.quantizer.scales
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), SCAN_CHUNK_ROWS):
+                block = self.codes[start:start + SCAN_CHUNK_ROWS]
+                np.dot(block.astype(np.float32), scaled, out=scores[start:start + len(block)])
+        else:
+            scores = self.codes @ q
+        n = min(n, len(scores))
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query: Sequence[float], k: int = 3,
+               fetch_full: Optional[Callable[[List[str]], Dict[str, Sequence[float]]]] = None,
+               rescore: bool = True) -> List[Tuple[str, float]]:
+        """Return the top k (id, cosine similarity) pairs."""
+        with self._lock:
+            if not self.ids:
+                return []
+            q = normalize_rows(np.asarray(query, dtype=np.float32)[None, :])[0]
+            candidates = self._first_pass(q, k * self.rescore_factor if rescore else k)
+            candidate_ids = [self.ids[i] for i in candidates]
+            full = self.full
+
+        if not rescore:
+            return [(doc_id, None) for doc_id in candidate_ids[:k]]
+
+        if full is not None:
+            vectors = full[candidates]
+        elif fetch_full is not None:
+            fetched = fetch_full(candidate_ids)
+            candidate_ids = [i for i in candidate_ids if i in fetched]
+            if not candidate_ids:
+                return []
+            vectors = normalize_rows(np.asarray([fetched[i] for i in candidate_ids], dtype=np.float32))
+        else:
+            raise ValueError("Rescoring needs keep_full=True or a fetch_full callable")
+
+        scores = vectors @ q
+        order = np.argsort(-scores)[:k]
+        return [(candidate_ids[i], float(scores[i])) for i in order]
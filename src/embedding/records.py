@@ -0,0 +1,43 @@
+from typing import Any, Dict
+
+from src.config import DEFAULT_BATCH
+from src.retrieval.vocabulary import vocabulary
+
+
+# Metadata Processing
+def extract_metadata(company: Dict[str, Any], batch: str = DEFAULT_BATCH) -> Dict[str, Any]:
+    """
+    Extract and clean metadata from company JSON.
+    - Converts keys to lowercase and underscores
+    - Keeps numeric values like CTC, LPA, Stipend as numbers
+    - Stores locations and branches under their canonical spelling
+    """
+    meta = {}
+    numeric_keys = {"ctc", "lpa", "stipend"}
+
+    for item in company.get("Keys", []):
+        key_name = item["key"].lower().replace(" ", "_")
+        value = item["value"]
+
+        # Convert numeric values where appropriate
+        if key_name in numeric_keys and isinstance(value, (int, float, str)):
+            try:
+                value = float(str(value).replace(",", ""))
+            except (ValueError, TypeError):
+                pass
+
+        meta[key_name] = vocabulary.canonicalize(key_name, value)
+
+    meta["name"] = company["Name"].strip()  # Always include company name
+    meta["batch"] = batch
+    return meta
+
+
+# Text Processing
+def build_embedding_text(company: Dict[str, Any]) -> str:
+    """Build a clean text string for embedding generation."""
+    text = f"Company Name: {company['Name']}\n"
+    text += f"Description: {company.get('description', '')}\n"
+    for item in company.get("Keys", []):
+        text += f"{item['key']}: {item['value']}\n"
+    return text
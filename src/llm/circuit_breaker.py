@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional
+
+from src.config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+from src.utils.log import bind_context
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The dependency's breaker is open; use the local fallback immediately."""
+
+
+class NotStartedError(Exception):
+    """
+    The call timed out in a local queue and never reached the dependency. It says
+    nothing about the dependency's health, so it is not counted as a breaker failure.
+    """
+
+
+class QueueTimeoutError(NotStartedError, FutureTimeout):
+    """No guarded-call worker picked the call up within its timeout."""
+
+
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker.
+    - closed: calls pass; `failure_threshold` consecutive failures or timeouts open it
+    - open: calls are rejected at once until `reset_timeout` seconds have passed
+    - half_open: a single probe call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counts = {"success": 0, "failure": 0, "rejected": 0, "opened": 0, "not_started": 0}
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.counts["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.counts["success"] += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counts["failure"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counts["opened"] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def record_not_started(self):
+        """The allowed call never ran: neither success nor failure, but a half-open probe slot is freed."""
+        with self._lock:
+            self.counts["not_started"] += 1
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self.state
+            if state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                state = HALF_OPEN  # Next call will probe
+            return dict(self.counts, state=state, consecutive_failures=self.consecutive_failures)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+# Guarded calls with a timeout run in their breaker's own pool, so a caller never waits
+# on a hung call and one dependency's slow calls never queue another's
+GUARD_POOL_WORKERS = 32
+_guard_pools: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def _guard_pool(breaker: CircuitBreaker) -> ThreadPoolExecutor:
+    with _registry_lock:
+        if breaker.name not in _guard_pools:
+            _guard_pools[breaker.name] = ThreadPoolExecutor(
+                max_workers=GUARD_POOL_WORKERS, thread_name_prefix=f"guarded-{breaker.name}"
+            )
+        return _guard_pools[breaker.name]
+
+
+def _run_with_timeout(breaker: CircuitBreaker, fn, args, kwargs, timeout: float):
+    """
+    Run fn in the breaker's pool with `timeout` counted from when it starts
+    running: time spent waiting for a pool thread is not the dependency's. A call
+    still queued after `timeout` is cancelled and raises QueueTimeoutError.
+    """
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return fn(*args, timeout=timeout, **kwargs)
+
+    future = _guard_pool(breaker).submit(bind_context(run))
+    if not started.wait(timeout) and future.cancel():
+        raise QueueTimeoutError(f"{breaker.name} call waited {timeout}s for a worker and was dropped")
+    started.wait()  # Not cancelled, so it is running
+    return future.result(timeout=timeout)
+
+
+def guarded_call(breaker: CircuitBreaker, fn, *args, timeout: Optional[float] = None, **kwargs):
+    """
+    Run fn under a circuit breaker.
+    Raises CircuitOpenError without calling fn when the breaker is open.
+    Exceptions and timeouts (concurrent.futures.TimeoutError) count as failures
+    and are re-raised; a call that never reached the dependency (NotStartedError)
+    does not. With a timeout, fn also receives it as its own `timeout` keyword, so
+    its queueing, rate-limit waits and retries stop when the caller stops waiting
+    instead of holding a pool thread and quota.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError(f"{breaker.name} circuit is open")
+    try:
+        if timeout is None:
+            result = fn(*args, **kwargs)
+        else:
+            result = _run_with_timeout(breaker, fn, args, kwargs, timeout)
+    except NotStartedError:
+        breaker.record_not_started()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
@@ -0,0 +1,379 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from src.config import (
+    GEMINI_BACKEND,
+    GEMINI_STUB_URL,
+    GENERATION_MODEL,
+    EMBEDDING_MODEL,
+    GEMINI_GENERATION_RPM,
+    GEMINI_EMBEDDING_RPM,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_BATCH_SHARE,
+)
+from src.llm.circuit_breaker import NotStartedError
+
+load_dotenv()
+
+# Call priorities: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+
+
+class QuotaExceededError(Exception):
+    """Gemini rejected the call with a rate/quota error (HTTP 429) after all retries."""
+
+
+class LimiterTimeoutError(NotStartedError):
+    """No capacity became available within the caller's timeout (the call never reached Gemini)."""
+
+
+# Exception class names used for quota errors (google.api_core, HTTP client libraries)
+QUOTA_ERROR_TYPES = {"ResourceExhausted", "TooManyRequests"}
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    True for 429 / ResourceExhausted errors from the SDK or the stub backend, judged
+    by status code and exception type only: the message may contain "429" for any reason.
+    """
+    if isinstance(error, QuotaExceededError):
+        return True
+    code = getattr(error, "code", None)
+    if code == 429 or getattr(code, "value", None) == 429:
+        return True
+    return any(cls.__name__ in QUOTA_ERROR_TYPES for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `burst` tokens."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter with priority admission.
+    - The limit grows by 1/limit per successful call and halves on a quota error
+    - Waiters are admitted in (priority, arrival) order
+    - BATCH callers may only use `batch_share` of the limit, leaving headroom for interactive calls
+    """
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 16, batch_share: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.batch_share = batch_share
+        self.in_flight = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _capacity(self, priority: int) -> int:
+        share = 1.0 if priority == INTERACTIVE else self.batch_share
+        return max(1, int(self.limit * share))
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None):
+        ticket = (priority, next(self._seq))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while not (self._waiters[0] == ticket and self.in_flight < self._capacity(priority)):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise LimiterTimeoutError("Timed out waiting for Gemini capacity")
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiters)
+                self.in_flight += 1
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    def release(self, overloaded: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "queued": len(self._waiters)}
+
+
+class GeminiResponse:
+    """Minimal response object exposing `.text`, like the SDK's GenerateContentResponse."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class SdkBackend:
+    """Calls Gemini through google.generativeai."""
+
+    def __init__(self):
+        import google.generativeai as genai
+
+        self.genai = genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self._models = {}
+
+    @staticmethod
+    def _options(timeout: Optional[float]) -> Dict[str, Any]:
+        return {} if timeout is None else {"request_options": {"timeout": timeout}}
+
+    def generate(self, model: str, contents, timeout: Optional[float] = None):
+        if model not in self._models:
+            self._models[model] = self.genai.GenerativeModel(model)
+        return self._models[model].generate_content(contents, **self._options(timeout))
+
+    def embed(self, model: str, content: str, timeout: Optional[float] = None):
+        return self.genai.embed_content(model=model, content=content, **self._options(timeout))
+
+
+class HttpStubBackend:
+    """Calls the local stand-in server from src/llm/stub_server.py."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            wait = self.timeout if timeout is None else min(self.timeout, timeout)
+            with urllib.request.urlopen(request, timeout=wait) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise QuotaExceededError(f"429 from stub server: {e.read().decode('utf-8', 'replace')}")
+            raise
+
+    def generate(self, model: str, contents, timeout: Optional[float] = None):
+        if not isinstance(contents, str):
+            contents = "\n".join(str(c) for c in contents)
+        return GeminiResponse(self._post("/v1/generate", {"model": model, "contents": contents}, timeout)["text"])
+
+    def embed(self, model: str, content: str, timeout: Optional[float] = None):
+        return {"embedding": self._post("/v1/embed", {"model": model, "content": content}, timeout)["embedding"]}
+
+
+class LocalBackend:
+    """The stub server's responses computed in-process, for benchmarks that must not be network-bound."""
+
+    def generate(self, model: str, contents, timeout: Optional[float] = None):
+        from src.llm.stub_server import stub_generation
+
+        if not isinstance(contents, str):
+            contents = "\n".join(str(c) for c in contents)
+        return GeminiResponse(stub_generation(contents))
+
+    def embed(self, model: str, content: str, timeout: Optional[float] = None):
+        from src.llm.stub_server import stub_embedding
+
+        return {"embedding": stub_embedding(content)}
+
+
+def make_backend(name: str = GEMINI_BACKEND):
+    if name == "stub":
+        return HttpStubBackend(GEMINI_STUB_URL)
+    if name == "local":
+        return LocalBackend()
+    return SdkBackend()
+
+
+class GeminiClient:
+    """
+    Shared, quota-aware entry point for every Gemini call.
+    Each model gets a token bucket (requests per minute) and an AIMD concurrency
+    limiter; quota errors shrink the concurrency limit and are retried with
+    jittered exponential backoff (more patiently for BATCH than INTERACTIVE calls).
+    With a timeout, every wait, retry and the request itself share one deadline,
+    and the call gives up once it has passed.
+    """
+
+    def __init__(self, backend=None, rpm: Optional[Dict[str, int]] = None,
+                 max_concurrency: int = 16, batch_share: float = 0.5):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.rpm = rpm or {}
+        self.max_concurrency = max_concurrency
+        self.batch_share = batch_share
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = make_backend()
+        return self._backend
+
+    def _model_state(self, model: str):
+        with self._lock:
+            if model not in self._limiters:
+                self._buckets[model] = TokenBucket(self.rpm.get(model, 600))
+                self._limiters[model] = AdaptiveLimiter(
+                    initial=max(1, self.max_concurrency // 4),
+                    maximum=self.max_concurrency,
+                    batch_share=self.batch_share,
+                )
+                self._counters[model] = {"calls": 0, "errors": 0, "quota_errors": 0, "retries": 0}
+            return self._buckets[model], self._limiters[model], self._counters[model]
+
+    def _count(self, counters: Dict[str, int], *names: str):
+        # Calls run on many threads at once; += on a shared dict is not atomic
+        with self._lock:
+            for name in names:
+                counters[name] += 1
+
+    def _call(self, model: str, fn, priority: int, timeout: Optional[float], max_retries: Optional[int]):
+        bucket, limiter, counters = self._model_state(model)
+        if max_retries is None:
+            max_retries = 1 if priority == INTERACTIVE else 5
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        attempt = 0
+        while True:
+            if not bucket.acquire(timeout=remaining()):
+                raise LimiterTimeoutError(f"Rate limit wait exceeded for {model}")
+            limiter.acquire(priority, timeout=remaining())
+            overloaded = False
+            try:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LimiterTimeoutError(f"Deadline passed before calling {model}")
+                self._count(counters, "calls")
+                return fn(remaining())
+            except LimiterTimeoutError:
+                raise
+            except Exception as e:
+                overloaded = is_quota_error(e)
+                if not overloaded:
+                    self._count(counters, "errors")
+                    raise
+                self._count(counters, "errors", "quota_errors")
+                if attempt >= max_retries:
+                    raise QuotaExceededError(f"Gemini quota exceeded for {model}: {e}") from e
+            finally:
+                limiter.release(overloaded=overloaded)
+
+            attempt += 1
+            self._count(counters, "retries")
+            backoff = min(8.0, 0.25 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            if deadline is not None and time.monotonic() + backoff >= deadline:
+                raise QuotaExceededError(f"Gemini quota exceeded for {model}, no time left to retry")
+            time.sleep(backoff)
+
+    def generate_content(self, contents, model: str = GENERATION_MODEL, priority: int = INTERACTIVE,
+                         timeout: Optional[float] = None, max_retries: Optional[int] = None):
+        """Generate text; returns an object with `.text`."""
+        return self._call(model, lambda left: self.backend.generate(model, contents, timeout=left),
+                          priority, timeout, max_retries)
+
+    def embed_content(self, content: str, model: str = EMBEDDING_MODEL, priority: int = INTERACTIVE,
+                      timeout: Optional[float] = None, max_retries: Optional[int] = None):
+        """Embed text; returns {'embedding': [...]} like genai.embed_content."""
+        return self._call(model, lambda left: self.backend.embed(model, content, timeout=left),
+                          priority, timeout, max_retries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {model: dict(counts) for model, counts in self._counters.items()}
+        return {
+            model: dict(counts, **self._limiters[model].snapshot())
+            for model, counts in counters.items()
+        }
+
+
+# Shared client used by retrieval, generation and ingest
+gemini = GeminiClient(
+    rpm={GENERATION_MODEL: GEMINI_GENERATION_RPM, EMBEDDING_MODEL: GEMINI_EMBEDDING_RPM},
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+    batch_share=GEMINI_BATCH_SHARE,
+)
+
+
+if __name__ == "__main__":
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Fire a burst of mixed-priority calls and print limiter stats")
+    parser.add_argument("--interactive", type=int, default=40, help="Interactive embedding calls")
+    parser.add_argument("--batch", type=int, default=80, help="Batch (ingest) embedding calls")
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    latencies = {INTERACTIVE: [], BATCH: []}
+    failures = {INTERACTIVE: 0, BATCH: 0}
+    results_lock = threading.Lock()
+
+    def one(priority):
+        start = time.perf_counter()
+        try:
+            gemini.embed_content("campus placement burst test", priority=priority)
+            with results_lock:
+                latencies[priority].append(time.perf_counter() - start)
+        except Exception:
+            with results_lock:
+                failures[priority] += 1
+
+    jobs = [BATCH] * args.batch + [INTERACTIVE] * args.interactive
+    random.shuffle(jobs)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(one, jobs))
+
+    for name, priority in (("interactive", INTERACTIVE), ("batch", BATCH)):
+        lat = sorted(latencies[priority])
+        p95 = lat[int(0.95 * (len(lat) - 1))] if lat else float("nan")
+        print(f"{name:<12} ok={len(lat):<4} failed={failures[priority]:<4} p95={p95 * 1000:.0f}ms")
+    print(json.dumps(gemini.stats(), indent=2))
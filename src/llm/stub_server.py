@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 768
+
+
+def stub_embedding(text: str, dim: int = EMBEDDING_DIM):
+    """
+    Deterministic hashed bag-of-words embedding: texts sharing words get similar
+    vectors, so caches and vector search behave plausibly without Gemini.
+    """
+    vector = [0.0] * dim
+    for token in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def stub_generation(contents: str) -> str:
+    """Canned generation: an empty filter for where-clause prompts, a short summary otherwise."""
+    if "where_clause" in contents:
+        return "{}"
+    return "Here are the companies matching your query, based on the provided context."
+
+
+class QuotaState:
+    """Sliding one-minute request window per model plus a concurrency cap."""
+
+    def __init__(self, rpm: int, max_concurrency: int):
+        self.rpm = rpm
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.windows = {}
+        self.counts = {"ok": 0, "rate_limited": 0, "concurrency_limited": 0}
+        self.lock = threading.Lock()
+
+    def admit(self, model: str):
+        """Return None if admitted, otherwise the reason for a 429."""
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.setdefault(model, deque())
+            while window and now - window[0] > 60:
+                window.popleft()
+            if self.rpm and len(window) >= self.rpm:
+                self.counts["rate_limited"] += 1
+                return "RESOURCE_EXHAUSTED: requests per minute exceeded"
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                self.counts["concurrency_limited"] += 1
+                return "RESOURCE_EXHAUSTED: too many concurrent requests"
+            window.append(now)
+            self.in_flight += 1
+            return None
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+            self.counts["ok"] += 1
+
+
+def make_handler(quota: QuotaState, latency_ms: float, jitter_ms: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, dict(quota.counts, in_flight=quota.in_flight, rpm=quota.rpm))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path not in ("/v1/generate", "/v1/embed"):
+                self._send(404, {"error": "not found"})
+                return
+
+            rejected = quota.admit(payload.get("model", ""))
+            if rejected:
+                self._send(429, {"error": rejected})
+                return
+            try:
+                time.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000.0)
+                if self.path == "/v1/generate":
+                    self._send(200, {"text": stub_generation(payload.get("contents", ""))})
+                else:
+                    self._send(200, {"embedding": stub_embedding(payload.get("content", ""))})
+            finally:
+                quota.done()
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet under load
+
+    return StubHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, rpm: int = 0, max_concurrency: int = 0,
+          latency_ms: float = 50.0, jitter_ms: float = 10.0) -> ThreadingHTTPServer:
+    """Start the stand-in server on a background thread and return it."""
+    quota = QuotaState(rpm, max_concurrency)
+    server = ThreadingHTTPServer((host, port), make_handler(quota, latency_ms, jitter_ms))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="gemini-stub", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini API with simulated quota limits")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute per model before 429s (0 = unlimited)")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Concurrent requests before 429s (0 = unlimited)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean simulated latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Latency standard deviation")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.rpm, args.max_concurrency, args.latency_ms, args.jitter_ms)
+    print(f"Gemini stub listening on http://{args.host}:{args.port} "
+          f"(rpm={args.rpm or 'unlimited'}, max concurrency={args.max_concurrency or 'unlimited'})")
+    print("Point the app at it with GEMINI_BACKEND=stub GEMINI_STUB_URL=http://{}:{}".format(args.host, args.port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -8,6 +8,11 @@ from dotenv import load_dotenv
 import types
 load_dotenv()
 
+from src.utils.log import get_logger
+from src.retrieval.vocabulary import vocabulary
+
+logger = get_logger(__name__)
+
 
 numeric_keys = {"ctc", "lpa", "stipend"}
 
@@ -27,6 +32,7 @@ def normalize_where_clause(raw_clause):
     Recursively normalize the where clause:
     - Lowercase all keys.
     - Convert numeric strings to integers/floats.
+    - Match every stored spelling of location/branch values ("Bengaluru" → $in Bangalore, Bengaluru, ...).
     """
     if isinstance(raw_clause, dict):
         new_dict = {}
@@ -44,6 +50,7 @@ def normalize_where_clause(raw_clause):
                     except ValueError:
                         pass  # Leave as string if conversion fails
 
+                operator, val = vocabulary.expand_condition(lower_key, operator, val)
                 new_dict[lower_key] = {operator: val}
         return new_dict
     return raw_clause
@@ -58,7 +65,7 @@ def group_conditions(where_dict, group_type="$and"):
 
     # Handle empty dictionary
     if not where_dict:
-        print("Warning: Empty where clause detected.")
+        logger.debug("Empty where clause detected")
         return None
 
     # If dictionary already has $and or $or operators
@@ -68,7 +75,7 @@ def group_conditions(where_dict, group_type="$and"):
                 conditions = where_dict[op]
                 # Validate conditions is a non-empty list with at least 2 items
                 if not isinstance(conditions, list) or len(conditions) < 2:
-                    print(f"Warning: Invalid {op} conditions")
+                    logger.debug("Invalid %s conditions", op)
                     return None
         return where_dict
 
@@ -78,7 +85,7 @@ def group_conditions(where_dict, group_type="$and"):
         if isinstance(value, dict):
             conditions.append({key: value})
         else:
-            print(f"Warning: Invalid value format for key {key}")
+            logger.debug("Invalid value format for key %s", key)
             return None
 
     # Return based on number of conditions
@@ -92,3 +99,68 @@ def group_conditions(where_dict, group_type="$and"):
         return {group_type: conditions}
     return {key: value}
 
+
+def _compare(operator, actual, expected):
+    """Evaluate a single ChromaDB operator against a metadata value."""
+    if operator == "$exists":
+        # Local-only operator: /search uses it for "not in <city>" over the numbered fields
+        return (actual is not None) == bool(expected)
+    if actual is None:
+        return False  # A missing field never matches, not even $ne/$nin
+    if operator == "$eq":
+        return actual == expected
+    if operator == "$ne":
+        return actual != expected
+    if operator == "$in":
+        return actual in (expected or [])
+    if operator == "$nin":
+        return actual not in (expected or [])
+    if isinstance(actual, bool) or not isinstance(actual, (int, float)):
+        return False
+    try:
+        if operator == "$gt":
+            return actual > expected
+        if operator == "$gte":
+            return actual >= expected
+        if operator == "$lt":
+            return actual < expected
+        if operator == "$lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    return False
+
+def has_negation(where_clause) -> bool:
+    """True if the clause uses $ne or $nin anywhere."""
+    if isinstance(where_clause, list):
+        return any(has_negation(c) for c in where_clause)
+    if not isinstance(where_clause, dict):
+        return False
+    return any(
+        key in ("$ne", "$nin") or has_negation(value)
+        for key, value in where_clause.items()
+    )
+
+def matches_where(metadata, where_clause):
+    """
+    Evaluate a ChromaDB where clause against one metadata dict locally.
+    A record missing a field matches no condition on it ($ne and $nin included),
+    like the planner statistics assume.
+    """
+    if not where_clause:
+        return True
+    metadata = metadata or {}
+    for key, value in where_clause.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in value):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in value):
+                return False
+        else:
+            if not isinstance(value, dict):
+                value = {"$eq": value}
+            for operator, expected in value.items():
+                if not _compare(operator, metadata.get(key), expected):
+                    return False
+    return True
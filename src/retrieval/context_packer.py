@@ -0,0 +1,129 @@
+import json
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import CONTEXT_TOKEN_BUDGET
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate without a tokenizer: about 4 characters per word
+    piece, and one token per punctuation mark (JSON braces and quotes add up).
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _TOKEN_PATTERN.findall(text or "")
+    )
+
+
+def _listed(meta: Dict[str, Any], prefix: str, count: int) -> List[Any]:
+    return [meta.get(f"{prefix}_{i}") for i in range(1, count + 1) if meta.get(f"{prefix}_{i}")]
+
+
+# Context fields in default priority order, each read from the coalesced metadata
+FIELDS: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
+    ("name", lambda m: m.get("name") or m.get("company_name")),
+    ("role", lambda m: m.get("role") or m.get("domain")),
+    ("ctc", lambda m: m.get("ctc") or m.get("ctc_min") or m.get("lpa")),
+    ("locations", lambda m: _listed(m, "location", 2)),
+    ("cgpa", lambda m: m.get("cgpa") or m.get("percent")),
+    ("branches", lambda m: _listed(m, "branch", 4)),
+    ("stipend", lambda m: m.get("stipend") or m.get("stipend_min")),
+    ("batch", lambda m: m.get("batch")),
+]
+
+# Fields only sent when the query asks about them
+OPTIONAL_FIELDS = {"stipend"}
+
+# Query words that make a field more relevant than the default order
+FIELD_HINTS = {
+    "role": ("role", "job", "position", "profile", "domain", "developer", "engineer", "analyst"),
+    "ctc": ("ctc", "lpa", "package", "salary", "pay", "highest", "lowest"),
+    "locations": ("location", "city", "where", "remote", "based"),
+    "cgpa": ("cgpa", "gpa", "percent", "criteria", "eligib", "cutoff"),
+    "branches": ("branch", "cse", "computer", "entc", "electrical", "mechanical", "civil", "eligib"),
+    "stipend": ("stipend", "intern"),
+    "batch": ("batch", "year", "season"),
+}
+
+
+def _mentions_value(query: str, value) -> bool:
+    values = value if isinstance(value, list) else [value]
+    return any(isinstance(v, str) and len(v) > 2 and v.lower() in query for v in values)
+
+
+def field_order(user_query: str, meta: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Name first, then fields the query mentions (by hint word, or by one of
+    this document's values, e.g. "pune" → locations), then the rest in default order.
+    """
+    query = (user_query or "").lower()
+    hinted = [
+        f for f, read in FIELDS
+        if any(h in query for h in FIELD_HINTS.get(f, ())) or (meta and _mentions_value(query, read(meta)))
+    ]
+    rest = [f for f, _ in FIELDS if f not in hinted and f != "name" and f not in OPTIONAL_FIELDS]
+    return ["name"] + [f for f in hinted if f != "name"] + rest
+
+
+def compact_record(meta: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Selected fields only, with empty values left out."""
+    readers = dict(FIELDS)
+    record = {}
+    for field in fields:
+        value = readers[field](meta or {})
+        if value not in (None, "", []):
+            record[field] = value
+    return record
+
+
+def serialize(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def pack_context(user_query: str, metadatas: List[Dict[str, Any]],
+                 budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Fit the most relevant documents (already in rank order) into `budget` tokens.
+    Each document is added with every field that fits; lower-priority fields
+    are dropped first, and packing stops once not even a name fits (the top
+    document's name is always kept, so the answer is never built from nothing).
+    Returns (context as one JSON object per line, packed records, report).
+    """
+    lines, records = [], []
+    used = 0
+    trimmed = 0
+    for meta in metadatas:
+        order = field_order(user_query, meta or {})
+        fields = list(order)
+        while fields:
+            record = compact_record(meta, fields)
+            line = serialize(record)
+            cost = estimate_tokens(line) + 1  # + newline
+            if used + cost <= budget:
+                break
+            fields.pop()
+        if not fields:
+            if records:
+                break
+            record = compact_record(meta, ["name"])
+            line = serialize(record)
+            cost = estimate_tokens(line) + 1
+            fields = ["name"]
+        if len(fields) < len(order):
+            trimmed += 1
+        lines.append(line)
+        records.append(record)
+        used += cost
+
+    report = {
+        "documents": len(records),
+        "dropped_documents": len(metadatas) - len(records),
+        "trimmed_documents": trimmed,
+        "context_tokens": used,
+        "budget": budget,
+    }
+    return "\n".join(lines), records, report
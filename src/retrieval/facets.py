@@ -0,0 +1,348 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.retrieval.clean_clause import matches_where
+from src.retrieval.partitions import get_all
+from src.retrieval.vocabulary import normalize_key, vocabulary
+
+AGGREGATE_OPS = ("count", "min", "max", "avg", "sum")
+
+# Fields read through a fallback chain, mirroring the compact view used for generation
+COALESCED_FIELDS = {
+    "ctc": ("ctc", "ctc_min", "lpa"),
+    "stipend": ("stipend", "stipend_min"),
+    "cgpa": ("cgpa", "cgpa_1"),
+}
+
+# Ranged postings store <field>_min/<field>_max: the maximum ranks them by the upper
+# bound, so a 10-40 LPA posting counts as 40 for "highest CTC", not 10
+UPPER_BOUND_FIELDS = {
+    "ctc": ("ctc", "ctc_max", "lpa"),
+    "stipend": ("stipend", "stipend_max"),
+}
+
+# Group-by names that span several metadata fields (location_1, location_2, ...)
+MULTI_VALUE_GROUPS = ("location", "branch")
+
+UNITS = {"ctc": " LPA", "percent": "%"}
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ColumnStore:
+    """
+    Columnar in-memory copy of the company metadata for aggregations.
+    Each metadata field is a list aligned with `ids`; missing values are None.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.columns: Dict[str, List[Any]] = {}
+        self.loaded = False
+        self._positions: Optional[Dict[str, int]] = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, collection):
+        """Replace the store with the collection's current metadata."""
+        data = get_all(collection, ["metadatas"])
+        with self._lock:
+            self.ids = []
+            self.columns = {}
+            self._positions = None
+            self.add(data.get("ids") or [], data.get("metadatas") or [])
+            self.loaded = True
+
+    def add(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            for doc_id, meta in zip(ids, metadatas):
+                meta = meta or {}
+                row = len(self.ids)
+                self.ids.append(doc_id)
+                if self._positions is not None:
+                    self._positions[doc_id] = row
+                for field in meta:
+                    if field not in self.columns:
+                        self.columns[field] = [None] * row
+                for field, column in self.columns.items():
+                    column.append(meta.get(field))
+
+    def remove(self, ids: List[str]):
+        drop = set(ids)
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in drop]
+            self.ids = [self.ids[i] for i in keep]
+            self.columns = {f: [col[i] for i in keep] for f, col in self.columns.items()}
+            self._positions = None
+
+    def positions(self) -> Dict[str, int]:
+        """Row index of each document ID (rebuilt lazily after removals)."""
+        with self._lock:
+            if self._positions is None:
+                self._positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+            return self._positions
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Metadata of one row, with coalesced fields (ctc, stipend, cgpa) filled in."""
+        row = {f: col[i] for f, col in self.columns.items() if col[i] is not None}
+        for field in COALESCED_FIELDS:
+            value = self.value(field, i)
+            if value is not None:
+                row[field] = value
+        return row
+
+    def value(self, field: str, i: int, upper: bool = False):
+        """Value of a field; with upper=True, ranged fields give their upper bound."""
+        chain = UPPER_BOUND_FIELDS.get(field) if upper else None
+        for source in chain or COALESCED_FIELDS.get(field, (field,)):
+            column = self.columns.get(source)
+            if column is not None and column[i] is not None:
+                return column[i]
+        return None
+
+    def is_range(self, field: str, i: int) -> bool:
+        """The row has a <field>_min/<field>_max range instead of a single value."""
+        column = self.columns.get(f"{field}_max")
+        return column is not None and column[i] is not None and self.value(field, i) != self.value(field, i, upper=True)
+
+    def group_values(self, group: str, i: int) -> List[Any]:
+        """Values of a group-by key for one row; location/branch span all numbered fields."""
+        if group in MULTI_VALUE_GROUPS:
+            values = []
+            for field, column in self.columns.items():
+                if field.startswith(group + "_") and column[i] is not None and column[i] not in values:
+                    values.append(column[i])
+            return values
+        value = self.value(group, i)
+        return [] if value is None else [value]
+
+    def distinct_values(self, group: str) -> List[Any]:
+        with self._lock:
+            seen = set()
+            for i in range(len(self.ids)):
+                seen.update(v for v in self.group_values(group, i) if isinstance(v, str))
+            return sorted(seen)
+
+    def filter_rows(self, where: Optional[Dict[str, Any]]) -> List[int]:
+        if not where:
+            return list(range(len(self.ids)))
+        return [i for i in range(len(self.ids)) if matches_where(self.row(i), where)]
+
+    def aggregate(self, metrics: List[Tuple[str, str]], where: Optional[Dict[str, Any]] = None,
+                  group_by: Optional[str] = None, limit: int = 20) -> Dict[str, Any]:
+        """
+        Compute aggregates over the rows matching `where`.
+        metrics is a list of (op, field) pairs, e.g. [("count", ""), ("avg", "ctc")].
+        min/max also report the companies holding the extreme value.
+        """
+        with self._lock:
+            rows = self.filter_rows(where)
+            if not group_by:
+                return {"matched": len(rows), "results": [self._compute(metrics, rows)]}
+
+            groups: Dict[Any, List[int]] = defaultdict(list)
+            for i in rows:
+                for value in self.group_values(group_by, i):
+                    groups[value].append(i)
+            results = [dict(group=g, **self._compute(metrics, members)) for g, members in groups.items()]
+            results.sort(key=lambda r: (-r["count"], str(r["group"])))
+            return {"matched": len(rows), "group_by": group_by, "results": results[:limit]}
+
+    def _compute(self, metrics: List[Tuple[str, str]], rows: List[int]) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": len(rows)}
+        for op, field in metrics:
+            if op == "count":
+                continue
+            values = [(self.value(field, i, upper=op == "max"), i) for i in rows]
+            values = [(v, i) for v, i in values if _is_number(v)]
+            key = f"{op}_{field}"
+            if not values:
+                out[key] = None
+                continue
+            numbers = [v for v, _ in values]
+            if op == "sum":
+                out[key] = round(sum(numbers), 2)
+            elif op == "avg":
+                out[key] = round(sum(numbers) / len(numbers), 2)
+                out[f"{key}_count"] = len(numbers)
+            elif op in ("min", "max"):
+                best = min(numbers) if op == "min" else max(numbers)
+                out[key] = best
+                out[f"{key}_companies"] = sorted({
+                    self.value("name", i) or self.ids[i] for v, i in values if v == best
+                })
+                out[f"{key}_ids"] = [self.ids[i] for v, i in values if v == best]
+                if op == "max" and field in UPPER_BOUND_FIELDS:
+                    # Tells the answer that the top value is the upper end of a range
+                    out[f"{key}_ranged"] = any(self.is_range(field, i) for v, i in values if v == best)
+        return out
+
+
+# Shared column store for the companies collection
+column_store = ColumnStore()
+
+
+# ---------------------
+# Aggregation detection
+# ---------------------
+OP_PATTERNS = [
+    ("count", r"\bhow many\b|\bnumber of\b|\bcount\b"),
+    ("avg", r"\baverage\b|\bavg\b|\bmean\b"),
+    ("max", r"\bhighest\b|\bmaximum\b|\bmax\b|\blargest\b|\bmost\b"),
+    ("min", r"\blowest\b|\bminimum\b|\bmin\b|\bleast\b|\bsmallest\b"),
+]
+
+FIELD_PATTERNS = [
+    ("stipend", r"\bstipend\b"),
+    ("cgpa", r"\bcgpa\b|\bgpa\b|\bpointer\b"),
+    ("percent", r"\bpercent(age)?\b"),
+    ("ctc", r"\bctc\b|\bpackage\b|\blpa\b|\bsalary\b|\bpay\b"),
+]
+
+GROUP_PATTERNS = [
+    ("location", r"\b(per|by|each|every)\s+(location|city|cities)\b"),
+    ("branch", r"\b(per|by|each|every)\s+(branch|branches|department)\b"),
+]
+
+RANGE_PATTERN = re.compile(
+    r"\b(above|over|more than|greater than|at least|below|under|less than|at most)\s+"
+    r"(\d+(?:\.\d+)?)\s*(lpa|k|cgpa|%|percent)?",
+    re.IGNORECASE,
+)
+RANGE_OPS = {
+    "above": "$gt", "over": "$gt", "more than": "$gt", "greater than": "$gt", "at least": "$gte",
+    "below": "$lt", "under": "$lt", "less than": "$lt", "at most": "$lte",
+}
+RANGE_UNITS = {"lpa": "ctc", "k": "stipend", "cgpa": "cgpa", "%": "percent", "percent": "percent"}
+
+# Words an aggregation question may contain besides its operation, field, filters and grouping.
+# Any other word (a company, a role, "rounds", "suitable", a bare number) is a constraint
+# the spec cannot represent, so the question goes to retrieval instead.
+AGGREGATION_FILLER = {
+    "what", "which", "who", "is", "are", "was", "were", "the", "a", "an", "of", "in", "at", "for", "to",
+    "by", "from", "and", "or", "do", "does", "did", "there", "that", "have", "has", "had", "we", "our",
+    "me", "tell", "show", "total", "overall", "all", "across", "currently", "this", "year", "so", "far",
+    "company", "companies", "firm", "firms", "employer", "employers", "recruiter", "recruiters",
+    "offer", "offers", "offered", "offering", "give", "gives", "given", "giving", "paid", "paying",
+    "hire", "hires", "hired", "hiring", "recruit", "recruits", "recruited", "recruiting",
+    "visit", "visits", "visited", "visiting", "came", "come", "coming",
+    "job", "jobs", "role", "roles", "opening", "openings", "position", "positions", "opportunities",
+    "placement", "placements", "campus", "college", "student", "students", "eligible", "eligibility",
+    "location", "locations", "city", "cities", "based", "branch", "branches", "department", "departments",
+    "value", "amount", "required", "requirement", "criteria", "cutoff",
+}
+WORD_PATTERN = re.compile(r"[a-z0-9%][a-z0-9.%]*")
+
+
+def _mentions(query: str, value: str) -> bool:
+    """Whole-word match; short all-caps codes (CS, IT, EC) must match case exactly."""
+    if len(value) <= 3 and value.isupper():
+        return re.search(rf"(?<![\w]){re.escape(value)}(?![\w])", query) is not None
+    return re.search(rf"(?<![\w]){re.escape(value.lower())}(?![\w])", query.lower()) is not None
+
+
+def detect_aggregation(user_query: str, store: Optional[ColumnStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Recognise analytical questions ("how many companies hire ECE", "average CTC for Pune roles",
+    "highest stipend") and translate them into an aggregation spec. Returns None otherwise,
+    including when the question has words the spec cannot represent ("max CTC offered by
+    Google", "how many rounds are there"), so those are answered by retrieval.
+    """
+    store = store or column_store
+    # Aliases resolved first, so "blr" finds the Bangalore records
+    lowered = vocabulary.canonicalize_text(re.sub(r"\s+", " ", user_query.lower().strip()))
+    op = next((name for name, pattern in OP_PATTERNS if re.search(pattern, lowered)), None)
+    if op is None:
+        return None
+    field = next((name for name, pattern in FIELD_PATTERNS if re.search(pattern, lowered)), None)
+    if op != "count" and field is None:
+        return None  # "most popular", "least competitive" etc. are not numeric questions
+
+    conditions = []
+    explained = [pattern for _, pattern in OP_PATTERNS + FIELD_PATTERNS + GROUP_PATTERNS]
+    for group in MULTI_VALUE_GROUPS:
+        mentioned = [v for v in store.distinct_values(group) if _mentions(user_query, v) or _mentions(lowered, v)]
+        # "Electronics" inside "Electronics & Communication" is not a mention of its own
+        mentioned = [v for v in mentioned if not any(o != v and _mentions(o, v) for o in mentioned)]
+        if mentioned:
+            values = []
+            for v in mentioned:
+                values.extend(x for x in vocabulary.variants(group + "_1", v) if x not in values)
+            # Mentions may appear as typed or in the canonical form canonicalize_text wrote
+            spellings = {x.lower() for x in values} | {normalize_key(x) for x in values}
+            explained.extend(rf"(?<![\w]){re.escape(x)}(?![\w])" for x in sorted(spellings, key=len, reverse=True))
+            fields = sorted(f for f in store.columns if f.startswith(group + "_"))
+            conditions.append({"$or": [{f: {"$in": values}} for f in fields]} if len(fields) > 1
+                              else {fields[0]: {"$in": values}})
+    for match in RANGE_PATTERN.finditer(lowered):
+        phrase, number, unit = match.group(1).lower(), float(match.group(2)), (match.group(3) or "").lower()
+        range_field = RANGE_UNITS.get(unit) or field or "ctc"
+        conditions.append({range_field: {RANGE_OPS[phrase]: number}})
+    explained.append(RANGE_PATTERN.pattern)
+
+    rest = lowered
+    for pattern in explained:
+        rest = re.sub(pattern, " ", rest, flags=re.IGNORECASE)
+    if any(word not in AGGREGATION_FILLER for word in WORD_PATTERN.findall(rest)):
+        return None
+
+    where = None
+    if len(conditions) == 1:
+        where = conditions[0]
+    elif conditions:
+        where = {"$and": conditions}
+
+    group_by = next((name for name, pattern in GROUP_PATTERNS if re.search(pattern, lowered)), None)
+    metrics = [("count", "")] if op == "count" else [(op, field)]
+    return {"metrics": metrics, "where": where, "group_by": group_by}
+
+
+def _format_value(field: str, value) -> str:
+    return f"{value}{UNITS.get(field, '')}"
+
+
+def format_aggregation(spec: Dict[str, Any], result: Dict[str, Any]) -> str:
+    """Render an aggregation result as a short answer."""
+    op, field = spec["metrics"][0]
+    label = field.upper() if field in ("ctc", "cgpa") else field
+    rows = result["results"]
+
+    if spec.get("group_by"):
+        lines = [f"Companies grouped by {spec['group_by']} ({result['matched']} matching):"]
+        for r in rows:
+            if op == "count":
+                lines.append(f"- {r['group']}: {r['count']}")
+            else:
+                lines.append(f"- {r['group']}: {op} {label} {_format_value(field, r.get(f'{op}_{field}'))} ({r['count']} companies)")
+        return "\n".join(lines)
+
+    r = rows[0]
+    if op == "count":
+        return f"{r['count']} companies match your query."
+    value = r.get(f"{op}_{field}")
+    if value is None:
+        return f"No {label} information is available for the matching companies."
+    if op == "avg":
+        return f"Average {label}: {_format_value(field, value)} across {r[f'avg_{field}_count']} companies."
+    if op in ("min", "max"):
+        word = "Highest" if op == "max" else "Lowest"
+        companies = ", ".join(r.get(f"{op}_{field}_companies", []))
+        note = f" {label} ranges count at their upper end." if r.get(f"{op}_{field}_ranged") else ""
+        return f"{word} {label}: {_format_value(field, value)} ({companies}).{note}"
+    return f"Total {label}: {_format_value(field, value)}."
+
+
+def answer_aggregation(user_query: str, store: Optional[ColumnStore] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Answer an analytical question from the column store, or return None if it is not one."""
+    store = store or column_store
+    spec = detect_aggregation(user_query, store)
+    if spec is None:
+        return None
+    result = store.aggregate(spec["metrics"], where=spec["where"], group_by=spec["group_by"])
+    return format_aggregation(spec, result), result
@@ -4,29 +4,48 @@ import re
 import os
 import chromadb
 import pathlib
-import google.generativeai as genai
 from dotenv import load_dotenv
+import time
 import types
-from .retriever1 import retriev
-from .retriever2 import generate_embedding
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .retriever1 import extract_where_clause, filter_search
+from .retriever2 import embed_query, vector_search
+from .clean_clause import matches_where, has_negation
+from .planner import plan_query, FILTER_FIRST, VECTOR_FIRST, VECTOR_FIRST_OVERFETCH
+from .stats import collection_stats, load_collection_stats
+from .facets import column_store, answer_aggregation
+from .partitions import fan_out, merge_ranked, is_default, get_partition
+from .context_packer import pack_context, compact_record, estimate_tokens
+from .speculation import Speculation, speculation_stats
+from src.llm.gemini_client import gemini, INTERACTIVE
+from src.llm.circuit_breaker import get_breaker, guarded_call, CircuitOpenError
+from src.config import GENERATION_TIMEOUT, DEFAULT_BATCH, SPECULATIVE_GENERATION
+from src.utils.log import get_logger, bind_context
 
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+generation_breaker = get_breaker("gemini.generation")
+logger = get_logger(__name__)
 
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Filter extractions started by callers ahead of finalretrieval
+_extraction_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="filter-extraction")
 
 
-def serialize_chroma_result(result):
-    """Normalize Chroma result to flat lists and cap to top-K."""
+def start_filter_extraction(user_query: str) -> Future:
+    """Start extracting the query's filters in the background; pass the future to finalretrieval."""
+    return _extraction_pool.submit(bind_context(extract_where_clause, user_query))
+
+
+def serialize_chroma_result(result, TOP_K: int = 3):
+    """Normalize Chroma result to flat lists and cap to top-K (distances are kept for query results)."""
     if not isinstance(result, dict):
         return {"ids": [], "documents": [], "metadatas": []}
     ids = result.get("ids", [])
     docs = result.get("documents", [])
     metas = result.get("metadatas", [])
+    dists = result.get("distances") or []
     # Flatten nested list shape [[...]] → [...]
     if ids and isinstance(ids[0], list):
         ids = ids[0]
@@ -34,86 +53,278 @@ def serialize_chroma_result(result):
         docs = docs[0]
     if metas and isinstance(metas[0], list):
         metas = metas[0]
-    TOP_K = 3
-    return {"ids": ids[:TOP_K], "documents": docs[:TOP_K], "metadatas": metas[:TOP_K]}
+    if len(dists) and isinstance(dists[0], list):
+        dists = dists[0]
+    serialized = {"ids": ids[:TOP_K], "documents": docs[:TOP_K], "metadatas": metas[:TOP_K]}
+    if len(dists):
+        serialized["distances"] = list(dists[:TOP_K])
+    return serialized
+
+def recheck(result, where, limit: int):
+    """
+    Keep the records of a Chroma result that match the clause locally, up to limit.
+    Chroma 1.x returns records lacking a field for $ne/$nin; locally (and in the
+    planner statistics) a missing field never matches, so every path agrees.
+    """
+    if not where or not has_negation(where):
+        return {k: v[:limit] for k, v in result.items()}
+    keep = [i for i, meta in enumerate(result["metadatas"]) if matches_where(meta, where)][:limit]
+    return {k: [v[i] for i in keep] for k, v in result.items()}
+
+def _fetch_size(where, limit: int) -> int:
+    """Over-fetch for negated clauses, whose Chroma results may be trimmed by recheck."""
+    return limit * VECTOR_FIRST_OVERFETCH if where and has_negation(where) else limit
+
+def execute_plan(plan, query_vector, limit: int = 3):
+    """Run the retrieval strategy chosen by the planner and return a serialized result."""
+    where = plan.get("where")
+    fetch = _fetch_size(where, limit)
+    if query_vector is None or not any(query_vector):
+        # Embedding failed or its circuit is open: answer from metadata alone
+        return recheck(serialize_chroma_result(filter_search(where, limit=fetch), TOP_K=fetch), where, limit)
+
+    if plan["strategy"] == FILTER_FIRST:
+        result = recheck(serialize_chroma_result(filter_search(where, limit=fetch), TOP_K=fetch), where, limit)
+        if result["ids"]:
+            return result
+        # Statistics were stale; let the vector index answer instead
+        return serialize_chroma_result(vector_search(query_vector, n_results=limit))
+
+    if plan["strategy"] == VECTOR_FIRST:
+        if not where:
+            return serialize_chroma_result(vector_search(query_vector, n_results=limit))
+        raw = serialize_chroma_result(
+            vector_search(query_vector, n_results=limit * VECTOR_FIRST_OVERFETCH),
+            TOP_K=limit * VECTOR_FIRST_OVERFETCH
+        )
+        kept = [
+            (i, d, m) for i, d, m in zip(raw["ids"], raw["documents"], raw["metadatas"])
+            if matches_where(m, where)
+        ]
+        if kept:
+            ids, docs, metas = (list(x) for x in zip(*kept[:limit]))
+            return {"ids": ids, "documents": docs, "metadatas": metas}
+
+    # Filtered vector search, also the fallback when post-filtering kept nothing
+    try:
+        return recheck(serialize_chroma_result(vector_search(query_vector, where=where, n_results=fetch), TOP_K=fetch),
+                       where, limit)
+    except ValueError as e:
+        logger.warning("ChromaDB query error, retrying without filters: %s", e)
+        return serialize_chroma_result(vector_search(query_vector, n_results=limit))
+
+def search_partitions(where, query_vector, batches, limit: int = 3):
+    """
+    Search several batch partitions in parallel and merge the ranked hits.
+    Planner statistics describe the default batch only, so each partition runs
+    a filtered vector search (or a filter-only get without an embedding).
+    """
+    fetch = _fetch_size(where, limit)
+
+    def search(batch, partition):
+        if query_vector is None or not any(query_vector):
+            raw = filter_search(where, limit=fetch, partition=partition)
+            return recheck(serialize_chroma_result(raw, TOP_K=fetch), where, limit)
+        try:
+            raw = vector_search(query_vector, where=where, n_results=fetch, partition=partition)
+        except ValueError as e:
+            logger.warning("ChromaDB query error in batch %s, retrying without filters: %s", batch, e)
+            raw = vector_search(query_vector, n_results=limit, partition=partition)
+        return recheck(serialize_chroma_result(raw, TOP_K=fetch), where, limit)
+
+    return merge_ranked(fan_out(search, batches), limit=limit)
 
-def finalretrieval(user_query: str):
-    """Process user query and return relevant results quickly"""
+def collect_docs(result) -> List[Dict[str, Any]]:
+    """Retrieved documents in rank order, without duplicate texts."""
+    all_docs = []
+    seen_docs = set()
+    for doc_id, doc, meta in zip(result.get("ids", []), result.get("documents", []), result.get("metadatas", [])):
+        if doc and doc not in seen_docs:
+            seen_docs.add(doc)
+            all_docs.append({"id": doc_id, "document": doc, "metadata": meta})
+    return all_docs
+
+def build_prompt(user_query: str, metadatas: List[Dict[str, Any]]):
+    """
+    Pack the most relevant documents and fields into the context token budget
+    (prompt size drives generation latency). Returns the prompt and packing details.
+    """
+    context, _, packing = pack_context(user_query, metadatas)
+    prompt = (
+        f"User query: {user_query}\n"
+        f"Context (one company per line):\n{context}\n"
+        "Task: Write a detailed answer based only on the context, tailored to the query. "
+        "Include roles, CTC, locations and eligibility where present."
+    )
+    return prompt, packing
+
+def speculate(user_query: str, query_vector) -> Optional[Speculation]:
+    """
+    Start generating on the unfiltered vector results, which is what the query
+    retrieves when filter extraction finds no filters (or filters that keep them).
+    """
+    if query_vector is None or not any(query_vector):
+        return None
+    result = serialize_chroma_result(vector_search(query_vector, n_results=3))
+    docs = collect_docs(result)[:4]
+    if not docs:
+        return None
+    prompt, _ = build_prompt(user_query, [item.get("metadata", {}) or {} for item in docs])
+    return Speculation(
+        [item["id"] for item in docs], result,
+        guarded_call, generation_breaker, gemini.generate_content, prompt,
+        priority=INTERACTIVE, timeout=GENERATION_TIMEOUT
+    )
+
+def finalretrieval(user_query: str, trace: Optional[Dict[str, Any]] = None, query_vector=None,
+                   batches: Optional[List[str]] = None, where_future: Optional[Future] = None):
+    """
+    Process user query and return relevant results quickly.
+    If a trace dict is passed it is filled with per-stage timings (ms)
+    and the IDs of the documents used for the answer.
+    Pass query_vector to skip re-embedding a query the caller already embedded,
+    and where_future (from start_filter_extraction) to reuse a filter extraction
+    the caller already started.
+    Pass batches to search other placement batches than the default one.
+    With SPECULATIVE_GENERATION, generation starts on the unfiltered vector
+    results while filter extraction is still running, and is kept when the
+    filtered results are the same documents.
+    """
+    if trace is None:
+        trace = {}
+    timings = trace.setdefault("timings", {})
     try:
-        print(f"Processing query: {user_query}")
-        # Run both retrieval paths in parallel for completeness
+        logger.debug("Processing query", extra={"query": user_query})
+        if not collection_stats.loaded:
+            load_collection_stats(get_partition(DEFAULT_BATCH, create=True))
+        if not column_store.loaded:
+            column_store.load(get_partition(DEFAULT_BATCH, create=True))
+
+        # Analytical questions (counts, averages, extremes) are answered from the column store,
+        # which holds the default batch only
+        stage_start = time.perf_counter()
+        aggregation = answer_aggregation(user_query) if is_default(batches) else None
+        if aggregation is not None:
+            answer, agg_result = aggregation
+            timings["aggregation"] = round((time.perf_counter() - stage_start) * 1000, 2)
+            trace["plan"] = "aggregate"
+            trace["result_ids"] = [
+                doc_id for r in agg_result["results"] for k, ids in r.items() if k.endswith("_ids") for doc_id in ids
+            ]
+            return answer
+
+        # Extract filters and embed the query in parallel
         import concurrent.futures
+        stage_start = time.perf_counter()
+        speculation = None
+        speculative = SPECULATIVE_GENERATION and is_default(batches)
         with concurrent.futures.ThreadPoolExecutor(max_workers=2) as ex:
-            fut_meta = ex.submit(retriev, user_query)
-            fut_vec = ex.submit(generate_embedding, user_query)
-            raw_meta = fut_meta.result()
-            raw_vec = fut_vec.result()
-        res1 = serialize_chroma_result(raw_meta)
-        res2 = serialize_chroma_result(raw_vec)
-        print(f"Metadata search results: {len(res1.get('documents', []))} documents")
-        print(f"Embedding search results: {len(res2.get('documents', []))} documents")
+            # bind_context keeps the request's correlation ID in the worker threads
+            fut_where = where_future or ex.submit(bind_context(extract_where_clause, user_query))
+            fut_vec = ex.submit(bind_context(embed_query, user_query)) if query_vector is None else None
+            if speculative:
+                if fut_vec is not None:
+                    concurrent.futures.wait([fut_where, fut_vec], return_when=concurrent.futures.FIRST_COMPLETED)
+                # The embedding won the race: generate on the vector results while the filters are extracted
+                if not fut_where.done() and (fut_vec is None or fut_vec.done()):
+                    speculation = speculate(user_query, query_vector if fut_vec is None else fut_vec.result())
+                if speculation is None:
+                    trace["speculation"] = "skipped"
+                    speculation_stats.skip()
+            where_clause = fut_where.result()
+            if fut_vec is not None:
+                query_vector = fut_vec.result()
+        timings["understanding"] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+        stage_start = time.perf_counter()
+        if is_default(batches):
+            # Pick filter-first, vector-first or filtered-vector execution from the filter's selectivity
+            plan = plan_query(where_clause)
+            trace["plan"] = plan["strategy"]
+            if speculation is not None and plan["strategy"] == VECTOR_FIRST and not plan["where"]:
+                result = speculation.retrieved  # Same search the speculation already ran
+            else:
+                result = execute_plan(plan, query_vector)
+            logger.debug("Plan executed", extra={
+                "strategy": plan["strategy"], "estimated": plan["estimated"], "documents": len(result.get("documents", []))
+            })
+        else:
+            trace["plan"] = "fan_out"
+            trace["batches"] = list(batches)
+            result = search_partitions(where_clause, query_vector, batches)
+            logger.debug("Partitions searched", extra={"batches": batches, "documents": len(result.get("documents", []))})
+        timings["retrieval"] = round((time.perf_counter() - stage_start) * 1000, 2)
         
         # Prepare results for response (dedupe, then compact view for speed)
-        all_docs = []
-        seen_docs = set()
-        
-        for result in [res1, res2]:
-            for doc, meta in zip(result.get("documents", []), result.get("metadatas", [])):
-                if doc and doc not in seen_docs:
-                    seen_docs.add(doc)
-                    all_docs.append({"document": doc, "metadata": meta})
+        all_docs = collect_docs(result)
+        result_ids = [item["id"] for item in all_docs[:4]]
+
+        # Keep the speculative answer only if it was built from the same evidence
+        if speculation is not None:
+            if all_docs and speculation.matches(result_ids):
+                trace["speculation"] = "hit"
+            else:
+                trace["speculation"] = "miss"
+                speculation_stats.miss(wasted=speculation.cancel())
+                speculation = None
         
         if not all_docs:
             return "No matching companies found for your query. Please try different keywords."
         
-        print(f"Found {len(all_docs)} matching companies")
-        
-        # Build compact context to minimize prompt size and speed up generation
-        compact = []
-        for item in all_docs[:4]:
-            meta = item.get("metadata", {}) or {}
-            compact.append({
-                "name": meta.get("name") or meta.get("company_name"),
-                "role": meta.get("role") or meta.get("domain"),
-                "ctc": meta.get("ctc") or meta.get("ctc_min") or meta.get("lpa"),
-                "locations": [
-                    loc for loc in [meta.get("location_1"), meta.get("location_2")] if loc
-                ],
-                "eligibility": {
-                    "cgpa": meta.get("cgpa") or meta.get("percent"),
-                    "branches": [
-                        b for b in [meta.get("branch_1"), meta.get("branch_2"), meta.get("branch_3"), meta.get("branch_4")] if b
-                    ]
-                }
-            })
+        trace["result_ids"] = result_ids
 
-        prompt = f"""
-        User Query: {user_query}
-        Context (concise): {json.dumps(compact, indent=2)}
-        Task: Write a detailed answer based only on the context. Include roles, CTC, locations, and eligibility if present. Keep it informative and helpful.
-        also modify your answer according to user query.
-        """
-        # Fast generation with a strict time cap; fall back to template if slow
-        import concurrent.futures
-        def _gen():
-            return model.generate_content(prompt)
+        metadatas = [item.get("metadata", {}) or {} for item in all_docs[:4]]
+        prompt, packing = build_prompt(user_query, metadatas)
+        trace["prompt_tokens"] = estimate_tokens(prompt)
+        trace["context"] = packing
+        logger.debug("Context packed", extra=dict(packing, prompt_tokens=trace["prompt_tokens"]))
+
+        # Fast generation with a strict time cap; fall back to template if slow.
+        # While the generation circuit is open the template is used without waiting.
+        stage_start = time.perf_counter()
         try:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                fut = ex.submit(_gen)
-                response = fut.result(timeout=2.0)
+            if speculation is not None:
+                # Counted as a hit only once it produced a usable answer
+                try:
+                    response = speculation.result()
+                except Exception:
+                    trace["speculation"] = "failed"
+                    speculation_stats.failure()
+                    raise
                 if response and getattr(response, 'text', None):
-                    return response.text.strip()
+                    saved = speculation.saved_ms(stage_start)
+                    timings["speculation_saved"] = saved
+                    speculation_stats.hit(saved)
+                else:
+                    trace["speculation"] = "failed"
+                    speculation_stats.failure()
+            else:
+                response = guarded_call(
+                    generation_breaker,
+                    gemini.generate_content,
+                    prompt,
+                    priority=INTERACTIVE,
+                    timeout=GENERATION_TIMEOUT
+                )
+            if response and getattr(response, 'text', None):
+                timings["generation"] = round((time.perf_counter() - stage_start) * 1000, 2)
+                return response.text.strip()
+        except CircuitOpenError:
+            trace["circuit_open"] = True
         except Exception as model_error:
-            print(f"Model generation issue: {str(model_error)}")
+            logger.warning("Model generation issue: %s %s", type(model_error).__name__, model_error)
+        timings["generation"] = round((time.perf_counter() - stage_start) * 1000, 2)
+        trace["fallback"] = True
 
         # Fallback ultra-fast templated response
         lines = []
-        for c in compact:
+        for meta in metadatas:
+            c = compact_record(meta, ["name", "role", "ctc", "locations"])
             lines.append(
                 f"- {c.get('name') or 'Company'} | Role: {c.get('role') or 'N/A'} | CTC: {c.get('ctc') or 'N/A'} | Locations: {', '.join(c.get('locations', [])) or 'N/A'}"
             )
         return "\n".join(lines) if lines else "No matching results found."
             
     except Exception as e:
-        print(f"Error in finalretrieval: {str(e)}")
+        logger.exception("Error in finalretrieval")
         return f"An error occurred while processing your query: {str(e)}"
@@ -0,0 +1,342 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import (
+    get_chroma_client, DEFAULT_BATCH, LEGACY_BATCH, PARTITION_FANOUT_WORKERS,
+    CHROMA_DISTANCE, HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, INDEX_POINTER_PATH
+)
+from src.utils.log import get_logger, bind_context
+
+logger = get_logger(__name__)
+
+COLLECTION_PREFIX = "companies"
+ALL_BATCHES = "all"
+# Generation collections are named "<collection>__g<timestamp>" (see src/embedding/generations.py)
+GENERATION_SEPARATOR = "__g"
+
+
+class UnknownBatchError(ValueError):
+    """A query named a placement batch that has no partition."""
+
+
+class BuildInProgressError(RuntimeError):
+    """A new generation of the batch is being built; a write to the live one would be lost at promotion."""
+
+
+def collection_name(batch: str) -> str:
+    """'2025' → 'companies_2025'; the legacy batch keeps the original 'companies' collection."""
+    batch = str(batch).strip()
+    return COLLECTION_PREFIX if batch == LEGACY_BATCH else f"{COLLECTION_PREFIX}_{batch}"
+
+
+def batch_of(name: str) -> Optional[str]:
+    """Inverse of collection_name; None for collections that are not partitions (or are generations of one)."""
+    if GENERATION_SEPARATOR in name:
+        return None
+    if name == COLLECTION_PREFIX:
+        return LEGACY_BATCH
+    if name.startswith(COLLECTION_PREFIX + "_"):
+        return name[len(COLLECTION_PREFIX) + 1:]
+    return None
+
+
+class GenerationPointer:
+    """
+    The pointer file: for each partition (by collection name) the generation
+    collection that is active, plus the generations before it, newest first.
+    It is only ever replaced whole (write to a temp file, then rename), so
+    readers see the old or the new pointer and never a partial one.
+    """
+
+    def __init__(self, path: str = INDEX_POINTER_PATH):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def refresh(self) -> List[str]:
+        """Re-read the file if it changed; returns the collections whose active generation changed."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return []
+            try:
+                entries = self._read() if stamp else {}
+            except (OSError, ValueError) as e:
+                logger.error("Unreadable generation pointer, keeping the current one",
+                             extra={"path": self.path, "error": str(e)})
+                return []
+            changed = [
+                name for name in set(entries) | set(self.entries)
+                if entries.get(name, {}).get("active") != self.entries.get(name, {}).get("active")
+            ]
+            self.entries, self._stamp = entries, stamp
+            return changed
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def active(self, name: str) -> str:
+        """Collection currently serving `name` (the name itself until a generation is promoted)."""
+        return self.entries.get(name, {}).get("active") or name
+
+    def entry(self, name: str) -> Dict[str, Any]:
+        """Current entry read from the file (a copy; change it through write)."""
+        with self._lock:
+            entries = self._read() if self._file_stamp() else {}
+        return entries.get(name, {})
+
+    def write(self, name: str, entry: Dict[str, Any]):
+        """
+        Replace one collection's entry, re-reading the file first so other entries
+        are kept. Processes (this one included) switch on refresh_generations().
+        """
+        with self._lock:
+            entries = self._read() if self._file_stamp() else {}
+            entries[name] = dict(entry, updated=time.time())
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+
+generation_pointer = GenerationPointer()
+
+_partitions: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+# Record count per batch for /status: counted at startup and on a generation
+# switch, then kept current by live updates instead of counting per request
+_partition_counts: Dict[str, int] = {}
+
+# HNSW settings fixed when a collection is built (ef_search can change in place)
+BUILD_SETTINGS = ("space", "max_neighbors", "ef_construction")
+
+# Shared pool for cross-batch fan-out, so queries don't start threads per partition
+_fanout_pool = ThreadPoolExecutor(max_workers=PARTITION_FANOUT_WORKERS, thread_name_prefix="partition")
+
+
+def get_partition(batch: str = DEFAULT_BATCH, create: bool = False):
+    """Collection for a batch. Raises UnknownBatchError for a missing partition unless create=True."""
+    batch = str(batch).strip()
+    with _lock:
+        if batch not in _partitions:
+            client = get_chroma_client()
+            name = generation_pointer.active(collection_name(batch))
+            if create:
+                collection = client.get_or_create_collection(name=name, configuration=index_configuration())
+            else:
+                try:
+                    collection = client.get_collection(name=name)
+                except Exception:
+                    raise UnknownBatchError(f"No partition for batch {batch}")
+            sync_index_configuration(collection)
+            _partitions[batch] = collection
+        return _partitions[batch]
+
+
+def active_collection(batch: str = DEFAULT_BATCH) -> str:
+    """Name of the collection (generation) serving a batch."""
+    return generation_pointer.active(collection_name(batch))
+
+
+def build_in_progress(batch: str) -> Optional[str]:
+    """Generation being built for a batch (read from the pointer file), or None."""
+    return generation_pointer.entry(collection_name(batch)).get("building")
+
+
+def refresh_generations() -> List[str]:
+    """
+    Pick up a promoted or rolled-back generation written by another process.
+    Returns the batches whose active collection changed; they are reopened on next use.
+    """
+    changed = [b for b in (batch_of(name) for name in generation_pointer.refresh()) if b]
+    if changed:
+        with _lock:
+            for batch in changed:
+                _partitions.pop(batch, None)
+        for batch in changed:
+            count_partition(batch)
+        logger.info("Index generation switched", extra={
+            "batches": changed, "collections": [active_collection(b) for b in changed]
+        })
+    return changed
+
+
+def index_configuration(space: Optional[str] = None, m: Optional[int] = None,
+                        construction_ef: Optional[int] = None, search_ef: Optional[int] = None) -> Dict[str, Any]:
+    """Chroma collection configuration for the vector index; unset values come from the config."""
+    return {"hnsw": {
+        "space": space or CHROMA_DISTANCE,
+        "max_neighbors": m or HNSW_M,
+        "ef_construction": construction_ef or HNSW_CONSTRUCTION_EF,
+        "ef_search": search_ef or HNSW_SEARCH_EF,
+    }}
+
+
+def sync_index_configuration(collection) -> Dict[str, Any]:
+    """
+    Bring an existing collection in line with the config: ef_search is updated
+    in place, differing build-time settings are reported (they need a rebuild).
+    Returns those settings as {name: {"current", "configured"}}.
+    """
+    current = ((collection.configuration or {}).get("hnsw") or {})
+    if not current:
+        return {}
+    wanted = index_configuration()["hnsw"]
+    if current.get("ef_search") != wanted["ef_search"]:
+        try:
+            collection.modify(configuration={"hnsw": {"ef_search": wanted["ef_search"]}})
+        except Exception as e:
+            logger.warning("Could not update ef_search", extra={"collection": collection.name, "error": str(e)})
+    stale = {
+        key: {"current": current.get(key), "configured": wanted[key]}
+        for key in BUILD_SETTINGS if current.get(key) != wanted[key]
+    }
+    if stale:
+        logger.warning("Index settings differ from the config, rebuild the collection to apply them",
+                       extra={"collection": collection.name, "settings": stale})
+    return stale
+
+
+# Page size for whole-collection reads: one unpaged get() of a large collection
+# (around 100k records) exceeds SQLite's limit on query variables
+READ_PAGE_SIZE = 5000
+
+
+def get_all(collection, include: List[str], page_size: int = READ_PAGE_SIZE) -> Dict[str, List[Any]]:
+    """Same as collection.get(include=...) over the whole collection, read page by page."""
+    merged: Dict[str, List[Any]] = {"ids": [], **{field: [] for field in include}}
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        merged["ids"].extend(ids)
+        for field in include:
+            values = page.get(field)
+            if values is not None:
+                merged[field].extend(values)
+        if len(ids) < page_size:
+            return merged
+        offset += page_size
+
+
+def list_batches() -> List[str]:
+    """Batches that have a partition, oldest first."""
+    names = [getattr(c, "name", c) for c in get_chroma_client().list_collections()]
+    names += list(generation_pointer.entries)
+    return sorted({b for b in (batch_of(n) for n in names) if b})
+
+
+def count_partition(batch: str) -> int:
+    """Count one partition's records and keep the result for partition_counts()."""
+    count = get_partition(batch).count()
+    with _lock:
+        _partition_counts[batch] = count
+    return count
+
+
+def load_partition_counts() -> Dict[str, int]:
+    """Count every partition once (at startup); /status serves these counts."""
+    counts = {}
+    for batch in list_batches():
+        try:
+            counts[batch] = count_partition(batch)
+        except UnknownBatchError:
+            logger.warning("Partition listed but not found", extra={"batch": batch})
+    return counts
+
+
+def adjust_partition_count(batch: str, delta: int):
+    """Apply a live update's added (+) or removed (-) records to the kept count."""
+    with _lock:
+        _partition_counts[batch] = max(0, _partition_counts.get(batch, 0) + delta)
+
+
+def partition_counts() -> Dict[str, int]:
+    """Kept record counts per batch, without touching the collections."""
+    with _lock:
+        return dict(sorted(_partition_counts.items()))
+
+
+def resolve_batches(spec: Optional[str] = None) -> List[str]:
+    """
+    Turn a request's batch selector into partition names.
+    None → the default batch; "all" → every partition; "2025,2026" → those batches.
+    """
+    if not spec or not str(spec).strip():
+        return [DEFAULT_BATCH]
+    if str(spec).strip().lower() == ALL_BATCHES:
+        return list_batches() or [DEFAULT_BATCH]
+    batches = []
+    for batch in str(spec).split(","):
+        batch = batch.strip()
+        if batch and batch not in batches:
+            get_partition(batch)  # Validate early so the API can answer 400
+            batches.append(batch)
+    return batches or [DEFAULT_BATCH]
+
+
+def is_default(batches: Optional[List[str]]) -> bool:
+    return not batches or list(batches) == [DEFAULT_BATCH]
+
+
+def fan_out(fn: Callable[[str, Any], Any], batches: List[str]) -> Dict[str, Any]:
+    """
+    Call fn(batch, collection) for every batch in parallel and return {batch: result}.
+    A failing partition is logged and left out instead of failing the whole query.
+    """
+    if len(batches) == 1:
+        return {batches[0]: fn(batches[0], get_partition(batches[0]))}
+    futures = {
+        batch: _fanout_pool.submit(bind_context(fn, batch, get_partition(batch)))
+        for batch in batches
+    }
+    results = {}
+    for batch, future in futures.items():
+        try:
+            results[batch] = future.result()
+        except Exception as e:
+            logger.warning("Partition %s failed: %s", batch, e)
+    return results
+
+
+def merge_ranked(results: Dict[str, Dict[str, Any]], limit: int = 3) -> Dict[str, Any]:
+    """
+    Merge serialized per-partition results into one top-`limit` list.
+    Hits are ordered by distance (results without distances, e.g. filter-only
+    gets, rank after scored hits by their position); each hit's metadata is
+    tagged with its batch.
+    """
+    hits = []
+    for batch, result in results.items():
+        distances = result.get("distances") or []
+        for rank, (doc_id, doc, meta) in enumerate(zip(result.get("ids", []), result.get("documents", []),
+                                                       result.get("metadatas", []))):
+            distance = distances[rank] if rank < len(distances) else None
+            hits.append((distance is None, distance or 0.0, rank, batch, doc_id, doc, meta, distance))
+    hits.sort(key=lambda h: h[:3])
+
+    merged = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+    for _, _, _, batch, doc_id, doc, meta, distance in hits[:limit]:
+        merged["ids"].append(doc_id)
+        merged["documents"].append(doc)
+        merged["metadatas"].append(dict(meta or {}, batch=(meta or {}).get("batch", batch)))
+        merged["distances"].append(distance)
+    return merged
@@ -0,0 +1,42 @@
+from typing import Any, Dict, Optional
+
+from src.config import PLANNER_FILTER_FIRST_MAX, PLANNER_VECTOR_FIRST_MIN_SELECTIVITY
+from src.retrieval.stats import CollectionStats, collection_stats
+
+FILTER_FIRST = "filter_first"        # collection.get(where=...) only
+VECTOR_FIRST = "vector_first"        # nearest neighbours, then filter locally
+FILTERED_VECTOR = "filtered_vector"  # collection.query(..., where=...)
+
+# How many extra neighbours to fetch per result slot when post-filtering
+VECTOR_FIRST_OVERFETCH = 4
+
+
+def plan_query(where_clause: Optional[Dict[str, Any]], stats: Optional[CollectionStats] = None) -> Dict[str, Any]:
+    """
+    Choose an execution strategy for a query from the filter's estimated selectivity.
+    - No filter, or a filter estimated to match nothing → plain vector search
+    - Few estimated matches → filter only, every match fits in the result slots
+    - Filter that keeps most documents → vector search with local post-filtering
+    - Anything in between → vector search restricted by the filter inside Chroma
+    """
+    stats = stats or collection_stats
+    if not where_clause:
+        return {"strategy": VECTOR_FIRST, "where": None, "estimated": None, "selectivity": 1.0}
+
+    if not stats.loaded or not stats.total:
+        return {"strategy": FILTERED_VECTOR, "where": where_clause, "estimated": None, "selectivity": None}
+
+    selectivity = stats.selectivity(where_clause)
+    estimated = selectivity * stats.total
+    plan = {"where": where_clause, "estimated": round(estimated, 2), "selectivity": round(selectivity, 4)}
+
+    if estimated < 0.5:
+        # Likely a spelling mismatch; the old unfiltered fallback gives better answers than nothing
+        plan.update(strategy=VECTOR_FIRST, where=None)
+    elif estimated <= PLANNER_FILTER_FIRST_MAX:
+        plan["strategy"] = FILTER_FIRST
+    elif selectivity >= PLANNER_VECTOR_FIRST_MIN_SELECTIVITY:
+        plan["strategy"] = VECTOR_FIRST
+    else:
+        plan["strategy"] = FILTERED_VECTOR
+    return plan
@@ -4,7 +4,6 @@ import re
 import os
 import chromadb
 import pathlib
-import google.generativeai as genai
 from dotenv import load_dotenv
 import types
 from src.retrieval.clean_clause import group_conditions, cleanjson, normalize_where_clause
@@ -16,19 +15,16 @@ from pathlib import Path
 # parent directory 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from src.config import get_chroma_client
+from src.config import FILTER_EXTRACTION_TIMEOUT, DEFAULT_BATCH
+from src.llm.gemini_client import gemini, INTERACTIVE
+from src.llm.circuit_breaker import get_breaker, guarded_call, CircuitOpenError
+from src.utils.log import get_logger
+from src.retrieval.partitions import get_partition
 
-# Initialize Persistent Chroma client 
-client1 = get_chroma_client()
+logger = get_logger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
-
-# Create or get collection 
-collection = client1.get_or_create_collection(name="companies")
+# Filter extraction is skipped outright while Gemini keeps failing
+filter_breaker = get_breaker("gemini.filter_extraction")
 
 keywords = [
     "ctc","ctc_min","ctc_max"," domains","percent","location_1","location_2",
@@ -36,7 +32,11 @@ keywords = [
     "branch_1","branch_2","branch_3","branch_4",
 ]
 
-def retriev(user_query: str):
+def extract_where_clause(user_query: str):
+    """
+    Ask Gemini for a ChromaDB where clause matching the user query.
+    Returns the normalized, grouped clause or None when no usable filter was found.
+    """
     systeminstruction = f"""
     You are a helpful assistant that helps to findout or filter metadata like {keywords} from user query{user_query}
     and then strictly return structure like this, dont add anything else.
@@ -103,45 +103,67 @@ def retriev(user_query: str):
     
     try:
         # Generate response from Gemini
-        response = model.generate_content(
-            contents=[systeminstruction, content]
+        response = guarded_call(
+            filter_breaker,
+            gemini.generate_content,
+            [systeminstruction, content],
+            priority=INTERACTIVE,
+            timeout=FILTER_EXTRACTION_TIMEOUT
         )
-        
+    except CircuitOpenError:
+        logger.debug("Filter extraction circuit open, querying without filters")
+        return None
+    except Exception as e:
+        logger.warning("Error extracting filters: %s %s", type(e).__name__, e)
+        return None
+
+    try:
         # Process the where clause
         where_clause = response.text
         cleaned_response = cleanjson(where_clause)
         raw_where_clause = json.loads(cleaned_response)
         normalized_clause = normalize_where_clause(raw_where_clause)
 
-        print("Debug - Raw where clause:", raw_where_clause)
-        print("Debug - Normalized clause:", normalized_clause)
+        logger.debug("Where clause extracted", extra={"raw": raw_where_clause, "normalized": normalized_clause})
         
         # Handle invalid or empty normalized clause
         if not normalized_clause or not isinstance(normalized_clause, dict):
-            print("Debug - No valid normalized clause, querying without filters")
-            return collection.get(limit=3)
+            logger.debug("No valid normalized clause, querying without filters")
+            return None
 
         # Group conditions and validate the result
         final_where_clause = group_conditions(normalized_clause, group_type="$and")
-        print("Debug - Final where clause:", final_where_clause)
+        logger.debug("Final where clause", extra={"where": final_where_clause})
 
         # If no valid where clause was created, query without filters
         if final_where_clause is None:
-            print("Debug - No valid where clause after grouping, querying without filters")
-            return collection.get(limit=3)
-
-        try:
-            # Execute query with valid where clause
-            return collection.get(
-                where=final_where_clause,
-                limit=3
-            )
-        except ValueError as e:
-            print(f"Debug - ChromaDB query error: {str(e)}")
-            # Fall back to unfiltered query
-            return collection.get(limit=3)
+            logger.debug("No valid where clause after grouping, querying without filters")
+        return final_where_clause
 
     except Exception as e:
-        print(f"Error in retriev function: {str(e)}")
-        # Fallback to a simple query without filters
-        return collection.get(limit=3)
+        logger.warning("Error parsing filters: %s", e)
+        return None
+
+def filter_search(where_clause, limit: int = 3, partition=None):
+    """
+    Fetch documents matching a where clause, falling back to an unfiltered get.
+    Searches the default batch unless another partition is passed.
+    """
+    # Resolved per call, so a promoted index generation is used without a restart
+    target = partition if partition is not None else get_partition(DEFAULT_BATCH, create=True)
+    if where_clause is None:
+        return target.get(limit=limit)
+    try:
+        # Execute query with valid where clause
+        return target.get(
+            where=where_clause,
+            limit=limit
+        )
+    except ValueError as e:
+        logger.warning("ChromaDB query error, retrying without filters: %s", e)
+        # Fall back to unfiltered query
+        return target.get(limit=limit)
+
+def retriev(user_query: str):
+    """Extract filters from the query and fetch the matching documents."""
+    return filter_search(extract_where_clause(user_query))
@@ -4,7 +4,6 @@ import re
 import os
 import chromadb
 import pathlib
-import google.generativeai as genai
 from dotenv import load_dotenv
 import types
 load_dotenv()
@@ -15,36 +14,110 @@ from pathlib import Path
 # Add the parent directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from src.config import get_chroma_client
+from src.config import (
+    DEFAULT_BATCH,
+    EMBEDDING_TIMEOUT,
+    COMPRESSED_INDEX_ENABLED,
+    VECTOR_QUANTIZE_INT8,
+    VECTOR_TRUNCATE_DIM,
+    VECTOR_RESCORE_FACTOR,
+)
+from src.embedding.quantize import CompressedVectorIndex
+from src.llm.gemini_client import gemini, INTERACTIVE
+from src.llm.circuit_breaker import get_breaker, guarded_call, CircuitOpenError
+from src.utils.log import get_logger
+from src.retrieval.partitions import get_partition, get_all
 
-# --- Initialize Persistent Chroma client ---
-client1 = get_chroma_client()
+logger = get_logger(__name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+embedding_breaker = get_breaker("gemini.embedding")
 
-# Initialize Gemini model
-model = genai.GenerativeModel('gemini-2.0-flash')
-
-#Create or get collection
-collection = client1.get_or_create_collection(name="companies")
-
-def generate_embedding(text: str):
+def embed_query(text: str):
     """
     Generate embedding using Google's Gemini text-embedding-004 model.
+    Returns a list of floats (768 dimensions), all zeros if the call fails
+    or the embedding circuit is open.
     """
     try:
-        response = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text
+        response = guarded_call(
+            embedding_breaker,
+            gemini.embed_content,
+            text,
+            priority=INTERACTIVE,
+            timeout=EMBEDDING_TIMEOUT
         )
-        query_vector = response['embedding']  # Returns a list of floats (768 dimensions)
+        return response['embedding']
+    except CircuitOpenError:
+        return [0.0] * 768
     except Exception as e:
-        print(f"❌ Error generating embedding: {e}")
-        query_vector = [0.0] * 768  # Fallback to prevent pipeline crash
+        logger.warning("Error generating embedding: %s %s", type(e).__name__, e)
+        return [0.0] * 768  # Fallback to prevent pipeline crash
+
+def generate_embedding(text: str, query_vector=None):
+    """
+    Run a vector search for the query text.
+    Pass query_vector to reuse an embedding that was already computed.
+    """
+    if query_vector is None:
+        query_vector = embed_query(text)
+
+    return vector_search(query_vector)
+
+# Optional compressed scan index, built lazily from the collection's embeddings
+compressed_index = None
+
+def load_compressed_index():
+    """Build the int8/truncated scan index from the embeddings stored in Chroma."""
+    global compressed_index
+    data = get_all(get_partition(DEFAULT_BATCH, create=True), ["embeddings"])
+    index = CompressedVectorIndex(
+        quantize=VECTOR_QUANTIZE_INT8,
+        truncate_dim=VECTOR_TRUNCATE_DIM,
+        rescore_factor=VECTOR_RESCORE_FACTOR
+    )
+    if len(data["ids"]):
+        index.build(data["ids"], data["embeddings"])
+    compressed_index = index
+    logger.info("Compressed vector index: %d vectors, %.1f KiB", len(index), index.memory_bytes() / 1024)
+    return compressed_index
+
+def compressed_search(query_vector, n_results: int = 3):
+    """
+    Scan the compressed vectors, then rescore the candidates with the
+    full-precision embeddings read from Chroma in the same round trip.
+    """
+    if compressed_index is None:
+        load_compressed_index()
+    rows = {}
+    collection = get_partition(DEFAULT_BATCH, create=True)
 
-    results2 = collection.query(
+    def fetch_full(ids):
+        data = collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        for doc_id, emb, doc, meta in zip(data["ids"], data["embeddings"], data["documents"], data["metadatas"]):
+            rows[doc_id] = (emb, doc, meta)
+        return {doc_id: row[0] for doc_id, row in rows.items()}
+
+    hits = compressed_index.search(query_vector, k=n_results, fetch_full=fetch_full)
+    return {
+        "ids": [[doc_id for doc_id, _ in hits]],
+        "documents": [[rows[doc_id][1] for doc_id, _ in hits]],
+        "metadatas": [[rows[doc_id][2] for doc_id, _ in hits]],
+        "distances": [[1.0 - score for _, score in hits]],
+    }
+
+def vector_search(query_vector, where=None, n_results: int = 3, partition=None):
+    """
+    Nearest-neighbour search, optionally restricted by a where clause.
+    Searches the default batch unless another partition is passed.
+    """
+    if COMPRESSED_INDEX_ENABLED and not where and partition is None:
+        return compressed_search(query_vector, n_results=n_results)
+    # Resolved per call, so a promoted index generation is used without a restart
+    target = partition if partition is not None else get_partition(DEFAULT_BATCH, create=True)
+    kwargs = {"where": where} if where else {}
+    results2 = target.query(
         query_embeddings=[query_vector],
-        n_results=3
+        n_results=n_results,
+        **kwargs
     )
     return results2
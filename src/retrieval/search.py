@@ -0,0 +1,295 @@
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import SEARCH_MAX_LIMIT
+from src.retrieval.clean_clause import normalize_where_clause, matches_where
+from src.retrieval.facets import ColumnStore, MULTI_VALUE_GROUPS, column_store
+from src.retrieval.partitions import get_all
+from src.retrieval.vocabulary import vocabulary
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOPWORDS = {"a", "an", "and", "the", "of", "in", "for", "to", "with", "at", "on", "or", "is", "are", "by"}
+
+# Metadata fields counted this many times on top of the document text (a light BM25F)
+FIELD_BOOSTS = {"name": 3, "role": 2, "domains": 2}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DEFAULT_FIELDS = ["name", "role", "ctc", "stipend", "location", "branch"]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the stored documents, keyed by document ID.
+    Only postings and lengths are kept in memory, not the text itself.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def load(self, collection):
+        """Replace the index with the collection's current documents."""
+        data = get_all(collection, ["documents", "metadatas"])
+        with self._lock:
+            self.postings = {}
+            self.lengths = {}
+            self.total_length = 0
+            self.add(data.get("ids") or [], data.get("documents") or [], data.get("metadatas") or [])
+            self.loaded = True
+
+    def add(self, ids: List[str], documents: List[Optional[str]], metadatas: List[Dict[str, Any]]):
+        with self._lock:
+            for doc_id, document, meta in zip(ids, documents, metadatas):
+                if doc_id in self.lengths:
+                    self.remove([doc_id])
+                tokens = tokenize(document or "")
+                for field, boost in FIELD_BOOSTS.items():
+                    if (meta or {}).get(field) is not None:
+                        tokens.extend(tokenize(meta[field]) * boost)
+                for term, count in Counter(tokens).items():
+                    self.postings.setdefault(term, {})[doc_id] = count
+                self.lengths[doc_id] = len(tokens)
+                self.total_length += len(tokens)
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            drop = {doc_id for doc_id in ids if doc_id in self.lengths}
+            if not drop:
+                return
+            for term in list(self.postings):
+                docs = self.postings[term]
+                for doc_id in drop.intersection(docs):
+                    del docs[doc_id]
+                if not docs:
+                    del self.postings[term]
+            for doc_id in drop:
+                self.total_length -= self.lengths.pop(doc_id)
+
+    def query_terms(self, text: str) -> List[str]:
+        """Query words plus their canonical location/branch spellings ("blr" also searches "bangalore")."""
+        lowered = text.lower()
+        terms = tokenize(lowered) + tokenize(vocabulary.canonicalize_text(lowered))
+        return list(dict.fromkeys(terms))
+
+    def score(self, text: str) -> Dict[str, float]:
+        """BM25 score of every document containing at least one query term."""
+        scores: Dict[str, float] = {}
+        with self._lock:
+            total = len(self.lengths)
+            if not total:
+                return scores
+            average = self.total_length / total
+            for term in self.query_terms(text):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+
+# Shared lexical index for the companies collection (default batch, like the column store)
+lexical_index = LexicalIndex()
+
+
+# ---------------------
+# Sorting and cursors
+# ---------------------
+def _descending_text(value: str) -> Tuple[int, ...]:
+    """Sort key that orders strings in reverse (the trailing 0 puts "abc" before "ab")."""
+    return tuple(-ord(c) for c in value) + (0,)
+
+
+def sort_key(value: Any, doc_id: str, descending: bool) -> Tuple:
+    """Numbers before text, missing values last, document ID as the tie-breaker."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, -value if descending else value, doc_id)
+    if isinstance(value, str):
+        return (1, _descending_text(value.lower()) if descending else value.lower(), doc_id)
+    return (2, 0, doc_id)
+
+
+def parse_sort(sort: Optional[str], text: Optional[str]) -> Tuple[str, bool]:
+    """"relevance", "ctc" (ascending) or "-ctc" (descending); relevance by default when there is text."""
+    sort = (sort or ("relevance" if text else "name")).strip()
+    descending = sort.startswith("-")
+    field = sort.lstrip("-+")
+    if field == "relevance":
+        if not text:
+            raise ValueError("Sorting by relevance needs 'text'")
+        return field, True
+    if not field or field in MULTI_VALUE_GROUPS:
+        raise ValueError(f"Cannot sort by '{sort}'")
+    return field, descending
+
+
+def parse_fields(fields: Optional[List[str]], store: ColumnStore) -> List[str]:
+    """Fields to return; DEFAULT_FIELDS when none are given."""
+    if not fields:
+        return DEFAULT_FIELDS
+    with store._lock:
+        known = set(store.columns) | set(MULTI_VALUE_GROUPS) | {"id"}
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def fingerprint(text: Optional[str], where: Optional[Dict[str, Any]], sort: str) -> str:
+    """Identifies the query a cursor belongs to."""
+    payload = json.dumps({"text": text or "", "where": where, "sort": sort}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(query: str, value: Any, doc_id: str) -> str:
+    payload = json.dumps({"q": query, "v": value, "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, query: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, doc_id, owner = payload["v"], payload["id"], payload["q"]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if owner != query:
+        raise ValueError("Cursor belongs to a different search; start again without a cursor")
+    return value, doc_id
+
+
+# ---------------------
+# Search
+# ---------------------
+def expand_groups(where: Any, store: ColumnStore) -> Any:
+    """Let filters name "location"/"branch" directly, expanded over the numbered fields (location_1, location_2, ...)."""
+    if not isinstance(where, dict):
+        return where
+    out: Dict[str, Any] = {}
+    extra = []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            out[key] = [expand_groups(c, store) for c in value]
+            continue
+        value = value if isinstance(value, dict) else {"$eq": value}
+        if key in MULTI_VALUE_GROUPS:
+            fields = sorted(f for f in store.columns if f.startswith(key + "_")) or [key + "_1"]
+            if set(value) & {"$ne", "$nin"}:
+                # "not in Pune": a location is known and none of them is Pune
+                # (a missing field matches no condition, so absent ones are allowed explicitly)
+                conditions = [{fields[0]: value}] + [{"$or": [{f: value}, {f: {"$exists": False}}]} for f in fields[1:]]
+                extra.append(conditions[0] if len(conditions) == 1 else {"$and": conditions})
+            else:
+                conditions = [{f: value} for f in fields]
+                extra.append(conditions[0] if len(conditions) == 1 else {"$or": conditions})
+        else:
+            out[key] = value
+    if extra:
+        parts = ([out] if out else []) + extra
+        return parts[0] if len(parts) == 1 else {"$and": parts}
+    return out
+
+
+def project(store: ColumnStore, i: int, fields: List[str]) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"id": store.ids[i]}
+    for field in fields:
+        if field in MULTI_VALUE_GROUPS:
+            values = store.group_values(field, i)
+            if values:
+                item[field] = values
+        else:
+            value = store.value(field, i)
+            if value is not None:
+                item[field] = value
+    return item
+
+
+def search(text: Optional[str] = None, where: Optional[Dict[str, Any]] = None,
+           fields: Optional[List[str]] = None, sort: Optional[str] = None, limit: int = 20,
+           cursor: Optional[str] = None, store: Optional[ColumnStore] = None,
+           index: Optional[LexicalIndex] = None) -> Dict[str, Any]:
+    """
+    Structured search over the in-memory metadata, without the LLM.
+    - `text` ranks documents by BM25 and keeps only those matching a query word
+    - `where` is a ChromaDB where clause, normalized like extracted filters
+      (spellings expanded); "location"/"branch" match any numbered field
+    - Results are ordered by `sort` with the document ID as tie-breaker, and
+      `cursor` resumes after the last result of the previous page (keyset
+      pagination: with a field sort, records added or removed between pages
+      never shift others; relevance scores depend on the whole corpus, so an
+      update between pages can move a record across the page boundary)
+    - `fields` must name stored metadata fields or "location"/"branch"
+    Raises ValueError for invalid input.
+    """
+    store = store or column_store
+    index = index or lexical_index
+    text = (text or "").strip() or None
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    field, descending = parse_sort(sort, text)
+    sort_label = f"-{field}" if descending else field
+    try:
+        clause = normalize_where_clause(expand_groups(where, store)) if where else None
+    except (AttributeError, TypeError, StopIteration):
+        raise ValueError("Invalid where clause, expected e.g. {\"ctc\": {\"$gte\": 10}}")
+    query = fingerprint(text, clause, sort_label)
+    after = None
+    if cursor:
+        value, doc_id = decode_cursor(cursor, query)
+        after = sort_key(value, doc_id, descending)
+    fields = parse_fields(fields, store)
+
+    scores = index.score(text) if text else None
+    with store._lock:
+        if scores is None:
+            candidates = range(len(store.ids))
+        else:
+            positions = store.positions()
+            candidates = [positions[doc_id] for doc_id in scores if doc_id in positions]
+        rows = [i for i in candidates if not clause or matches_where(store.row(i), clause)]
+
+        def value_of(i):
+            return scores[store.ids[i]] if field == "relevance" else store.value(field, i)
+
+        keyed = [(sort_key(value_of(i), store.ids[i], descending), i) for i in rows]
+        remaining = [(k, i) for k, i in keyed if k > after] if after else keyed
+        page = heapq.nsmallest(limit + 1, remaining)
+        results = []
+        for _, i in page[:limit]:
+            item = project(store, i, fields)
+            if scores is not None:
+                item["score"] = round(scores[store.ids[i]], 4)
+            results.append(item)
+        next_cursor = None
+        if len(page) > limit:
+            last = page[limit - 1][1]
+            next_cursor = encode_cursor(query, value_of(last), store.ids[last])
+
+    return {
+        "matched": len(rows),
+        "sort": sort_label,
+        "where": clause,
+        "results": results,
+        "next_cursor": next_cursor,
+    }
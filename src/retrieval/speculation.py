@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.utils.log import bind_context
+
+# Speculative generations run here, so an abandoned one never holds up its request
+_speculation_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="speculation")
+
+
+class Speculation:
+    """
+    An answer generation started on the unfiltered vector results while filter
+    extraction is still running. It is kept if the filtered results turn out to
+    be the same documents, and abandoned otherwise.
+    """
+
+    def __init__(self, doc_ids: List[str], retrieved: Dict[str, Any], fn, *args, **kwargs):
+        self.doc_ids = list(doc_ids)
+        self.retrieved = retrieved
+        self.call_started: Optional[float] = None
+        self.call_finished: Optional[float] = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self.future = _speculation_pool.submit(bind_context(self._run, fn, *args, **kwargs))
+
+    def _run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._cancelled:
+                return None
+            self.call_started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.call_finished = time.perf_counter()
+
+    def matches(self, doc_ids: List[str]) -> bool:
+        """Same evidence set as the final results (order may differ)."""
+        return set(doc_ids) == set(self.doc_ids)
+
+    def result(self):
+        """Wait for the speculative call; raises what the call raised."""
+        return self.future.result()
+
+    def cancel(self) -> bool:
+        """
+        Abandon the speculation. Returns True if the LLM call had already started:
+        it cannot be interrupted, so it runs to completion (or its timeout) unused.
+        """
+        with self._lock:
+            self._cancelled = True
+            started = self.call_started is not None
+        self.future.cancel()
+        return started
+
+    def saved_ms(self, final_ready: float) -> float:
+        """
+        Latency saved by a hit: generating only once the final results were
+        ready (at `final_ready`) would have finished one call duration later.
+        """
+        if self.call_started is None or self.call_finished is None:
+            return 0.0
+        sequential_end = final_ready + (self.call_finished - self.call_started)
+        return round(max(0.0, sequential_end - time.perf_counter()) * 1000, 2)
+
+
+class SpeculationStats:
+    """Hit rate and latency saved by speculative generation."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.failed = 0
+        self.wasted_calls = 0
+        self.saved_ms = 0.0
+        self._lock = threading.Lock()
+
+    def hit(self, saved_ms: float):
+        with self._lock:
+            self.hits += 1
+            self.saved_ms += saved_ms
+
+    def miss(self, wasted: bool):
+        with self._lock:
+            self.misses += 1
+            self.wasted_calls += int(wasted)
+
+    def failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.hits + self.misses + self.failed
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                # Filters were ready before the embedding, or there was no embedding
+                "skipped": self.skipped,
+                # Same evidence, but the speculative call raised, timed out or returned no text
+                "failed": self.failed,
+                # Misses whose LLM call had already started
+                "wasted_calls": self.wasted_calls,
+                "hit_rate": round(self.hits / attempts, 4) if attempts else None,
+                "saved_ms_total": round(self.saved_ms, 2),
+                "saved_ms_avg": round(self.saved_ms / self.hits, 2) if self.hits else None,
+            }
+
+
+# Shared counters reported by GET /metrics
+speculation_stats = SpeculationStats()
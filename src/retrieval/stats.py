@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.config import COLLECTION_STATS_PATH
+from src.utils.log import get_logger
+from src.retrieval.partitions import get_all
+
+logger = get_logger(__name__)
+
+# Histogram bucket width per numeric field (values are LPA, thousands, CGPA points, percent)
+BUCKET_WIDTHS = {
+    "ctc": 2.0, "ctc_min": 2.0, "ctc_max": 2.0, "lpa": 2.0,
+    "stipend": 5.0, "stipend_min": 5.0, "stipend_max": 5.0,
+    "cgpa": 0.5, "percent": 5.0,
+}
+
+# Fields whose values are grouped together in the summary (location_1, location_2, ...)
+GROUPED_PREFIXES = ("location", "branch")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class CollectionStats:
+    """
+    Per-field statistics over the company metadata.
+    - value_counts: exact counts of every value per field
+    - histograms: equi-width bucket counts for numeric fields, used for range selectivity
+    Statistics are updated incrementally as documents are added or removed.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.field_counts: Counter = Counter()
+        self.value_counts: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Counter] = {}
+        self.sums: Counter = Counter()
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    # ---------------------
+    # Updates
+    # ---------------------
+    def add(self, metadatas: Iterable[Dict[str, Any]]):
+        self._apply(metadatas, 1)
+
+    def remove(self, metadatas: Iterable[Dict[str, Any]]):
+        self._apply(metadatas, -1)
+
+    def _apply(self, metadatas, sign: int):
+        with self._lock:
+            for meta in metadatas:
+                if not meta:
+                    continue
+                self.total += sign
+                for field, value in meta.items():
+                    self.field_counts[field] += sign
+                    counts = self.value_counts.setdefault(field, Counter())
+                    counts[value] += sign
+                    if counts[value] <= 0:
+                        del counts[value]
+                    if _is_number(value):
+                        hist = self.histograms.setdefault(field, Counter())
+                        bucket = math.floor(value / self._width(field))
+                        hist[bucket] += sign
+                        if hist[bucket] <= 0:
+                            del hist[bucket]
+                        self.sums[field] += sign * value
+
+    def clear(self):
+        with self._lock:
+            self.total = 0
+            self.field_counts = Counter()
+            self.value_counts = {}
+            self.histograms = {}
+            self.sums = Counter()
+
+    @staticmethod
+    def _width(field: str) -> float:
+        return BUCKET_WIDTHS.get(field, 1.0)
+
+    # ---------------------
+    # Selectivity estimates
+    # ---------------------
+    def _range_count(self, field: str, operator: str, bound) -> float:
+        """Estimate how many values satisfy a range operator from the histogram."""
+        hist = self.histograms.get(field)
+        if not hist or not _is_number(bound):
+            return 0.0
+        width = self._width(field)
+        estimate = 0.0
+        for bucket, count in hist.items():
+            lo, hi = bucket * width, (bucket + 1) * width
+            if operator in ("$gt", "$gte"):
+                if lo >= bound:
+                    estimate += count
+                elif hi > bound:
+                    estimate += count * (hi - bound) / width
+            else:
+                if hi <= bound:
+                    estimate += count
+                elif lo < bound:
+                    estimate += count * (bound - lo) / width
+        return estimate
+
+    def _condition_fraction(self, field: str, condition: Dict[str, Any]) -> float:
+        if not self.total:
+            return 1.0
+        counts = self.value_counts.get(field, Counter())
+        present = self.field_counts.get(field, 0)
+        fraction = 1.0
+        for operator, expected in condition.items():
+            if operator == "$eq":
+                matched = counts.get(expected, 0)
+            elif operator == "$ne":
+                matched = present - counts.get(expected, 0)
+            elif operator == "$in":
+                matched = sum(counts.get(v, 0) for v in (expected or []))
+            elif operator == "$nin":
+                matched = present - sum(counts.get(v, 0) for v in (expected or []))
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                matched = self._range_count(field, operator, expected)
+            else:
+                matched = present
+            fraction *= min(1.0, max(0.0, matched / self.total))
+        return fraction
+
+    def selectivity(self, where_clause: Optional[Dict[str, Any]]) -> float:
+        """Estimated fraction of documents matching a where clause (conditions assumed independent)."""
+        if not where_clause:
+            return 1.0
+        with self._lock:
+            fraction = 1.0
+            for key, value in where_clause.items():
+                if key == "$and":
+                    for c in value:
+                        fraction *= self.selectivity(c)
+                elif key == "$or":
+                    miss = 1.0
+                    for c in value:
+                        miss *= 1.0 - self.selectivity(c)
+                    fraction *= 1.0 - miss
+                else:
+                    if not isinstance(value, dict):
+                        value = {"$eq": value}
+                    fraction *= self._condition_fraction(key, value)
+            return fraction
+
+    def estimate_count(self, where_clause: Optional[Dict[str, Any]]) -> float:
+        return self.selectivity(where_clause) * self.total
+
+    # ---------------------
+    # Reporting
+    # ---------------------
+    def numeric_summary(self, field: str) -> Optional[Dict[str, Any]]:
+        values = [v for v in self.value_counts.get(field, {}) if _is_number(v)]
+        if not values:
+            return None
+        count = sum(self.histograms.get(field, Counter()).values())
+        width = self._width(field)
+        return {
+            "count": count,
+            "min": min(values),
+            "max": max(values),
+            "avg": round(self.sums[field] / count, 2) if count else None,
+            "histogram": [
+                {"from": b * width, "to": (b + 1) * width, "count": c}
+                for b, c in sorted(self.histograms.get(field, Counter()).items())
+            ],
+        }
+
+    def grouped_counts(self, prefix: str, top: int = 20) -> List[Dict[str, Any]]:
+        """Count documents per value across all fields sharing a prefix (location_1, location_2, ...)."""
+        combined: Counter = Counter()
+        for field, counts in self.value_counts.items():
+            if field == prefix or field.startswith(prefix + "_"):
+                combined.update({k: v for k, v in counts.items() if isinstance(k, str)})
+        return [{"value": k, "count": v} for k, v in combined.most_common(top)]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": self.total,
+                "fields": dict(self.field_counts.most_common()),
+                "ctc": self.numeric_summary("ctc"),
+                "stipend": self.numeric_summary("stipend"),
+                "cgpa": self.numeric_summary("cgpa"),
+                **{f"companies_per_{p}": self.grouped_counts(p) for p in GROUPED_PREFIXES},
+            }
+
+    # ---------------------
+    # Persistence
+    # ---------------------
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total": self.total,
+                "field_counts": dict(self.field_counts),
+                "value_counts": {f: [[v, c] for v, c in counts.items()] for f, counts in self.value_counts.items()},
+                "histograms": {f: {str(b): c for b, c in hist.items()} for f, hist in self.histograms.items()},
+                "sums": dict(self.sums),
+            }
+
+    def load_dict(self, data: Dict[str, Any]):
+        with self._lock:
+            self.total = data.get("total", 0)
+            self.field_counts = Counter(data.get("field_counts", {}))
+            self.value_counts = {f: Counter({v: c for v, c in pairs}) for f, pairs in data.get("value_counts", {}).items()}
+            self.histograms = {f: Counter({int(b): c for b, c in hist.items()}) for f, hist in data.get("histograms", {}).items()}
+            self.sums = Counter(data.get("sums", {}))
+            self.loaded = True
+
+    def save(self, path: str = COLLECTION_STATS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def rebuild(self, collection):
+        """Recompute all statistics from the collection's metadata."""
+        metadatas = get_all(collection, ["metadatas"])["metadatas"]
+        with self._lock:
+            self.clear()
+            self.add(metadatas)
+            self.loaded = True
+
+
+# Shared statistics for the companies collection
+collection_stats = CollectionStats()
+
+
+def load_collection_stats(collection, path: str = COLLECTION_STATS_PATH) -> CollectionStats:
+    """
+    Load statistics saved at ingest time, rebuilding them from the collection
+    when the file is missing or out of date.
+    """
+    with collection_stats._lock:
+        try:
+            expected = collection.count()
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    collection_stats.load_dict(json.load(f))
+                if collection_stats.total == expected:
+                    return collection_stats
+                logger.info("Collection stats out of date (%d vs %d documents), rebuilding", collection_stats.total, expected)
+            collection_stats.rebuild(collection)
+            collection_stats.save(path)
+        except Exception as e:
+            logger.exception("Error loading collection stats")
+        return collection_stats
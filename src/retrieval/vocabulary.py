@@ -0,0 +1,358 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import VOCABULARY_ALIASES_PATH, VOCABULARY_FUZZY
+from src.retrieval.stats import GROUPED_PREFIXES
+from src.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Known spellings per canonical value; extended by VOCABULARY_ALIASES_PATH and by the stored metadata
+ALIASES: Dict[str, Dict[str, List[str]]] = {
+    "location": {
+        "Bangalore": ["Bengaluru", "Banglore", "Bengalore", "Bangaluru", "BLR"],
+        "Mumbai": ["Bombay"],
+        "Delhi": ["New Delhi", "Delhi NCR", "NCR"],
+        "Gurugram": ["Gurgaon"],
+        "Chennai": ["Madras"],
+        "Mysore": ["Mysuru"],
+        "Pune": ["Poona"],
+        "Pan India": ["Anywhere in India", "All India"],
+        "Remote": ["Remote Working", "Work from Home", "WFH"],
+    },
+    "branch": {
+        "Computer Science": ["CS", "CSE", "Computer", "Computer Science Engineering",
+                             "Computer Science and Engineering", "Computer Engineering"],
+        "Information Technology": ["IT", "IT Engineering", "Information Technology/Science"],
+        "Information Science": ["IS", "ISE"],
+        "Electronics & Telecommunication": ["E&TC", "EnTC", "ETC", "EXTC", "Telecommunications",
+                                            "Electronics and Telecommunication"],
+        "Electronics & Communication": ["ECE", "EC", "Electronics and Communication"],
+        "Electrical": ["EE", "EEE", "Electrical Engineering", "Electrical Engineer",
+                       "Electrical / EEE", "Electrical & Electronics"],
+        "Mechanical": ["Mech", "Mechanical Engineering", "Mechanical Engineer"],
+        "Civil": ["Civil Engineering", "Civil Engineer"],
+        "Industrial": ["Indus"],
+        "B.Tech": ["BTech", "B. Tech"],
+        "B.E": ["BE"],
+    },
+}
+
+# Aliases never rewritten inside free-text queries (ordinary words, or too short to be unambiguous)
+TEXT_STOPWORDS = {"etc", "its", "all", "any", "computer", "north", "east", "india"}
+TEXT_MIN_ALIAS_LENGTH = 3
+# Shortest word that is matched approximately (shorter words have too many neighbours)
+FUZZY_MIN_LENGTH = 5
+# Shortest word allowed two edits ("mangalore" and "bangalore" are nine letters and one edit apart)
+FUZZY_TWO_EDIT_LENGTH = 10
+# Fuzzy lookups of filter values are memoized; the memo is reset past this many values
+WORD_CACHE_SIZE = 50000
+
+
+def normalize_key(value: Any) -> str:
+    """Lookup key for a surface form: lowercase, dots dropped, other punctuation (except &) as spaces."""
+    text = str(value).lower().replace(".", "")
+    return re.sub(r"[^\w&]+", " ", text).strip()
+
+
+def group_of(field: str) -> Optional[str]:
+    """The vocabulary group of a metadata field (location_2 → "location"), or None."""
+    for prefix in GROUPED_PREFIXES:
+        if field == prefix or field.startswith(prefix + "_"):
+            return prefix
+    return None
+
+
+def max_distance(key: str) -> int:
+    """Edit distance tolerated for a key of this length."""
+    if not VOCABULARY_FUZZY or len(key) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(key) < FUZZY_TWO_EDIT_LENGTH else 2
+
+
+def count_values(metadatas: Iterable[Dict[str, Any]]) -> Dict[str, Counter]:
+    """Per-field value counts of the vocabulary fields, in the shape of CollectionStats.value_counts."""
+    counts: Dict[str, Counter] = {}
+    for meta in metadatas:
+        for field, value in (meta or {}).items():
+            if isinstance(value, str) and group_of(field):
+                counts.setdefault(field, Counter())[value] += 1
+    return counts
+
+
+class _TrieNode:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.value: Optional[str] = None
+
+
+class Trie:
+    """Character trie mapping keys to values, with bounded edit-distance search."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key: str, value: str):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.value = value
+
+    def search(self, word: str, distance: int, same_first: bool = False) -> List[Tuple[int, str]]:
+        """
+        All (distance, value) pairs within `distance` edits of word, closest first
+        (only keys starting with word's first letter when same_first).
+        Walks the trie with one Levenshtein row per node, pruning branches whose
+        row minimum already exceeds the bound.
+        """
+        results: List[Tuple[int, str]] = []
+        first = list(range(len(word) + 1))
+        children = self.root.children.items()
+        if same_first:
+            children = [(ch, child) for ch, child in children if ch == word[:1]]
+        stack = [(child, ch, first) for ch, child in children]
+        while stack:
+            node, ch, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i in range(1, len(word) + 1):
+                row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (word[i - 1] != ch)))
+            if node.value is not None and row[-1] <= distance:
+                results.append((row[-1], node.value))
+            if min(row) <= distance:
+                stack.extend((child, c, row) for c, child in node.children.items())
+        return sorted(results)
+
+
+class _Group:
+    """Lookup tables for one group (locations or branches)."""
+
+    def __init__(self):
+        self.canonical: Dict[str, str] = {}     # normalized key → canonical value
+        self.variants: Dict[str, set] = {}      # canonical value → stored spellings
+        self.trie = Trie()
+        self._fuzzy: Dict[str, Optional[str]] = {}  # memoized near-miss lookups (misses included)
+
+    def register(self, key: str, canonical: str):
+        if key and key not in self.canonical:
+            self.canonical[key] = canonical
+            self.trie.insert(key, canonical)
+            self._fuzzy.clear()
+
+    def resolve(self, value: str) -> Optional[str]:
+        key = normalize_key(value)
+        if key in self.canonical:
+            return self.canonical[key]
+        distance = max_distance(key)
+        if not distance:
+            return None
+        if key not in self._fuzzy:
+            if len(self._fuzzy) >= WORD_CACHE_SIZE:
+                self._fuzzy.clear()
+            self._fuzzy[key] = self._near_miss(key, distance)
+        return self._fuzzy[key]
+
+    def _near_miss(self, key: str, distance: int) -> Optional[str]:
+        """
+        The canonical value of a typo, or None when the match is not clear-cut:
+        - Only spellings with the same first letter count; a different first
+          letter is usually a different place ("mangalore", "bangalore")
+        - The closest spellings must all belong to one canonical value, with no
+          other value within one more edit
+        """
+        matches = self.trie.search(key, distance + 1, same_first=True)
+        if not matches or matches[0][0] > distance:
+            return None
+        best = matches[0][0]
+        rivals = {canonical for d, canonical in matches if d <= best + 1}
+        return matches[0][1] if len(rivals) == 1 else None
+
+
+class Vocabulary:
+    """
+    Canonical spellings for location and branch values.
+    - Built from the stored metadata values plus the alias table; spellings that
+      only differ in case/punctuation, or by a typo, resolve to one canonical value
+    - canonicalize() maps any spelling (exact, alias or unambiguous near miss) to its canonical value
+    - variants() lists every stored spelling of a value, so filters still match
+      records ingested before canonicalization
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.aliases = aliases or ALIASES
+        self.value_counts: Dict[str, Counter] = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+        # Until build() sees the stored values, only the alias table applies
+        self._groups: Dict[str, _Group] = self._build({})
+        self._text_aliases = self._build_text(self._groups)
+
+    # ---------------------
+    # Building
+    # ---------------------
+    def _build(self, value_counts: Dict[str, Counter]) -> Dict[str, _Group]:
+        groups = {prefix: _Group() for prefix in GROUPED_PREFIXES}
+        for prefix, table in self.aliases.items():
+            group = groups.setdefault(prefix, _Group())
+            for canonical, spellings in table.items():
+                group.register(normalize_key(canonical), canonical)
+                for spelling in spellings:
+                    group.register(normalize_key(spelling), canonical)
+
+        # Most frequent spellings first, so a rarer variant folds into the common one
+        combined: Dict[str, Counter] = {}
+        for field, counts in value_counts.items():
+            prefix = group_of(field)
+            if prefix:
+                combined.setdefault(prefix, Counter()).update(
+                    {v: c for v, c in counts.items() if isinstance(v, str) and c > 0}
+                )
+        for prefix, counts in combined.items():
+            group = groups[prefix]
+            for value, _ in counts.most_common():
+                canonical = group.resolve(value) or value
+                group.register(normalize_key(value), canonical)
+                group.variants.setdefault(canonical, set()).add(value)
+        return groups
+
+    def _build_text(self, groups: Dict[str, _Group]) -> Dict[Tuple[str, ...], str]:
+        """Phrase → canonical key table used to rewrite free-text queries."""
+        phrases: Dict[Tuple[str, ...], str] = {}
+        for group in groups.values():
+            for key, canonical in group.canonical.items():
+                if len(key) < TEXT_MIN_ALIAS_LENGTH or key in TEXT_STOPWORDS:
+                    continue
+                phrases[tuple(key.split())] = normalize_key(canonical)
+        return phrases
+
+    def build(self, value_counts: Dict[str, Counter]) -> "Vocabulary":
+        """Rebuild from per-field value counts (e.g. collection_stats.value_counts)."""
+        counts = {f: Counter(c) for f, c in value_counts.items() if group_of(f)}
+        groups = self._build(counts)
+        phrases = self._build_text(groups)
+        with self._lock:
+            self.value_counts = counts
+            self._groups = groups
+            self._text_aliases = phrases
+            self.loaded = True
+        return self
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]):
+        """Fold newly ingested records into the vocabulary."""
+        counts = {f: Counter(c) for f, c in self.value_counts.items()}
+        for field, added in count_values(metadatas).items():
+            counts.setdefault(field, Counter()).update(added)
+        self.build(counts)
+
+    # ---------------------
+    # Lookups
+    # ---------------------
+    def canonicalize(self, field: str, value: Any) -> Any:
+        """Canonical spelling of a location/branch value; other fields and unknown values are returned unchanged."""
+        prefix = group_of(field)
+        if not prefix or not isinstance(value, str):
+            return value
+        return self._groups[prefix].resolve(value) or value
+
+    def variants(self, field: str, value: Any) -> List[Any]:
+        """Canonical value first, then every other stored spelling of it."""
+        prefix = group_of(field)
+        if not prefix or not isinstance(value, str):
+            return [value]
+        canonical = self._groups[prefix].resolve(value) or value
+        stored = self._groups[prefix].variants.get(canonical, ())
+        return [canonical] + sorted(v for v in stored if v != canonical)
+
+    def canonicalize_metadata(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: self.canonicalize(field, value) for field, value in meta.items()}
+
+    def expand_condition(self, field: str, operator: str, value: Any) -> Tuple[str, Any]:
+        """
+        Rewrite one filter condition to match every stored spelling:
+        $eq/$ne become $in/$nin over the variants when there is more than one.
+        """
+        if not group_of(field):
+            return operator, value
+        if operator in ("$eq", "$ne") and isinstance(value, str):
+            values = self.variants(field, value)
+            if len(values) == 1:
+                return operator, values[0]
+            return ("$in" if operator == "$eq" else "$nin"), values
+        if operator in ("$in", "$nin") and isinstance(value, list):
+            expanded: List[Any] = []
+            for v in value:
+                expanded.extend(x for x in self.variants(field, v) if x not in expanded)
+            return operator, expanded
+        return operator, value
+
+    def _scan(self, text: str) -> Tuple[List[str], List[str]]:
+        """Words of an (already lowercased) query with mentions rewritten, and the mentions' canonical keys."""
+        phrases = self._text_aliases
+        words = text.split(" ")
+        keys = [normalize_key(w) for w in words]
+        out: List[str] = []
+        found: List[str] = []
+        i = 0
+        while i < len(words):
+            for n in (3, 2, 1):
+                phrase = tuple(k for k in keys[i:i + n] if k)
+                if len(phrase) == n and len(keys[i:i + n]) == n and phrase in phrases:
+                    out.append(phrases[phrase])
+                    found.append(phrases[phrase])
+                    i += n
+                    break
+            else:
+                out.append(words[i])
+                i += 1
+        return out, found
+
+    def canonicalize_text(self, text: str) -> str:
+        """
+        Replace location/branch mentions in an (already lowercased) query with
+        their canonical form, longest phrase first. Only exact spellings and
+        aliases are rewritten: the result is used for cache keys and search
+        terms, where a wrong guess would answer a different question.
+        """
+        return " ".join(self._scan(text)[0])
+
+    def entities(self, text: str) -> List[str]:
+        """Canonical keys of the locations/branches an (already lowercased) query mentions, sorted."""
+        return sorted(set(self._scan(text)[1]))
+
+    def summary(self) -> Dict[str, Any]:
+        groups = self._groups
+        return {
+            prefix: {
+                "canonical_values": len(group.variants),
+                "merged_spellings": sum(len(v) - 1 for v in group.variants.values() if len(v) > 1),
+            }
+            for prefix, group in groups.items()
+        }
+
+
+def load_alias_file(path: str = VOCABULARY_ALIASES_PATH) -> Dict[str, Dict[str, List[str]]]:
+    """
+    The built-in alias table merged with a JSON file of the same shape:
+    {"location": {"Bangalore": ["BLR", ...]}, "branch": {...}}
+    """
+    merged = {prefix: {c: list(s) for c, s in table.items()} for prefix, table in ALIASES.items()}
+    if not path or not os.path.exists(path):
+        return merged
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            extra = json.load(f)
+        for prefix, table in extra.items():
+            for canonical, spellings in table.items():
+                merged.setdefault(prefix, {}).setdefault(canonical, []).extend(spellings)
+    except Exception as e:
+        logger.error("Error loading vocabulary aliases from %s: %s", path, e)
+    return merged
+
+
+# Shared vocabulary; built from the collection statistics at startup and at ingest
+vocabulary = Vocabulary(load_alias_file())
@@ -0,0 +1,197 @@
+import argparse
+import itertools
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.config import CHROMA_DISTANCE, DEFAULT_BATCH, HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF
+from src.utils.scaling_benchmark import latency_summary
+
+
+def load_vectors(batch: str) -> np.ndarray:
+    """Stored embeddings of a partition."""
+    from src.retrieval.partitions import get_partition, get_all
+
+    embeddings = get_all(get_partition(batch), ["embeddings"])["embeddings"]
+    if not len(embeddings):
+        raise SystemExit(f"Batch {batch} has no records to benchmark")
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def synthesize(vectors: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    `count` vectors between random pairs of stored ones, plus a little relative
+    Gaussian noise; used to scale the data up and as queries. Mixing keeps the
+    data on the stored vectors' manifold, where noise alone would make every
+    copy of a vector almost equidistant from the others.
+    """
+    first = vectors[rng.integers(0, len(vectors), count)]
+    second = vectors[rng.integers(0, len(vectors), count)]
+    weight = rng.random((count, 1)).astype(np.float32)
+    mixed = weight * first + (1 - weight) * second
+    scale = noise * np.linalg.norm(mixed, axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    return (mixed + rng.standard_normal(mixed.shape).astype(np.float32) * scale).astype(np.float32)
+
+
+def brute_force(data: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Exact top-k indices per query under the collection's distance (float64, so near-ties are ranked right)."""
+    data, queries = data.astype(np.float64), queries.astype(np.float64)
+    if space == "cosine":
+        data = data / np.linalg.norm(data, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = -queries @ data.T
+    elif space == "ip":
+        scores = -queries @ data.T
+    else:
+        scores = (queries ** 2).sum(1, keepdims=True) - 2 * queries @ data.T + (data ** 2).sum(1)
+    top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def exact_latency(data: np.ndarray, queries: np.ndarray, k: int, space: str) -> Dict[str, float]:
+    """Per-query latency of a flat (exact) float32 scan, the alternative to an HNSW index."""
+    if space == "cosine":
+        data = data / np.linalg.norm(data, axis=1, keepdims=True)
+    norms = (data ** 2).sum(1) if space == "l2" else 0.0
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        scores = norms - 2 * (data @ q) if space == "l2" else -(data @ q)
+        np.argpartition(scores, k - 1)[:k]
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def run_grid(data: np.ndarray, queries: np.ndarray, ks: List[int], space: str, ms: List[int],
+             construction_efs: List[int], search_efs: List[int]) -> List[Dict[str, Any]]:
+    """
+    Build one collection per (M, construction ef) in a scratch directory and
+    measure recall@k against brute force plus per-query latency for every search ef.
+    """
+    import chromadb
+    from src.retrieval.partitions import index_configuration
+
+    k_max = max(ks)
+    truth = brute_force(data, queries, k_max, space)
+    ids = [str(i) for i in range(len(data))]
+    results = []
+    workdir = tempfile.mkdtemp(prefix="hnsw_")
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        step = client.get_max_batch_size()
+        for m, construction_ef in itertools.product(ms, construction_efs):
+            name = f"hnsw_m{m}_ef{construction_ef}"
+            collection = client.create_collection(
+                name=name, configuration=index_configuration(space, m, construction_ef, search_efs[0])
+            )
+            start = time.perf_counter()
+            for i in range(0, len(ids), step):
+                collection.add(ids=ids[i:i + step], embeddings=data[i:i + step])
+            build_s = time.perf_counter() - start
+
+            for search_ef in search_efs:
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                # A loaded index keeps the ef_search it was opened with: reopen so the new value is used
+                client.clear_system_cache()
+                client = chromadb.PersistentClient(path=workdir)
+                collection = client.get_collection(name)
+                collection.query(query_embeddings=[queries[0]], n_results=k_max, include=[])  # load the index
+                found, samples = [], []
+                for q in queries:
+                    start = time.perf_counter()
+                    hits = collection.query(query_embeddings=[q], n_results=k_max, include=["distances"])
+                    samples.append(time.perf_counter() - start)
+                    found.append([int(i) for i in hits["ids"][0]])
+                recall = {
+                    f"recall@{k}": round(float(np.mean([
+                        len(set(f[:k]) & set(t[:k].tolist())) / k for f, t in zip(found, truth)
+                    ])), 4)
+                    for k in ks
+                }
+                results.append({"m": m, "construction_ef": construction_ef, "search_ef": search_ef,
+                                "build_s": round(build_s, 2), **recall, "latency_ms": latency_summary(samples)})
+                print_row(results[-1], ks)
+            client.delete_collection(name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def recommend(results: List[Dict[str, Any]], k: int, target: float) -> Dict[str, Any]:
+    """Fastest setting (p50, then build time) that reaches the target recall@k; the most accurate one otherwise."""
+    key = f"recall@{k}"
+    good = [r for r in results if r[key] >= target]
+    if good:
+        return min(good, key=lambda r: (r["latency_ms"]["p50"], r["build_s"]))
+    return max(results, key=lambda r: (r[key], -r["latency_ms"]["p50"]))
+
+
+def print_header(ks: List[int]):
+    recalls = " ".join(f"{'recall@' + str(k):>10}" for k in ks)
+    print(f"{'M':>4} {'ef_con':>7} {'ef_search':>9} {'build s':>8} {recalls} {'p50 ms':>7} {'p95 ms':>7}")
+
+
+def print_row(r: Dict[str, Any], ks: List[int]):
+    recalls = " ".join(f"{r[f'recall@{k}']:>10}" for k in ks)
+    print(f"{r['m']:>4} {r['construction_ef']:>7} {r['search_ef']:>9} {r['build_s']:>8} {recalls} "
+          f"{r['latency_ms']['p50']:>7} {r['latency_ms']['p95']:>7}")
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k and latency of HNSW settings against exact search")
+    parser.add_argument("--batch", default=DEFAULT_BATCH, help="Partition whose embeddings are indexed")
+    parser.add_argument("--scale", type=int, default=0,
+                        help="Grow the data to this many vectors with synthetic ones (0 = stored vectors only)")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors (synthetic, like the scale-up)")
+    parser.add_argument("--noise", type=float, default=0.05, help="Relative noise of synthetic vectors")
+    parser.add_argument("--k", default="3,10", help="Comma-separated k values for recall@k")
+    parser.add_argument("--space", default=CHROMA_DISTANCE, choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", default=f"8,{HNSW_M},32", help="HNSW M (max neighbours) values")
+    parser.add_argument("--construction-ef", default=f"50,{HNSW_CONSTRUCTION_EF},200")
+    parser.add_argument("--search-ef", default=f"10,25,50,{HNSW_SEARCH_EF},200")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Recall@k (largest k) a recommendation must reach")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write all results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = load_vectors(args.batch)
+    if args.scale > len(data):
+        data = np.vstack([data, synthesize(data, args.scale - len(data), args.noise, rng)])
+    queries = synthesize(data, args.queries, args.noise, rng)
+    ks = _ints(args.k)
+    ms = sorted(set(_ints(args.m)))
+    construction_efs = sorted(set(_ints(args.construction_ef)))
+    search_efs = sorted(set(_ints(args.search_ef)))
+
+    print(f"{len(data)} vectors of dimension {data.shape[1]}, {len(queries)} queries, distance {args.space}")
+    print(f"Exact search (numpy brute force) p50/p95 ms: {exact_latency(data, queries, max(ks), args.space)}")
+    print_header(ks)
+    results = run_grid(data, queries, ks, args.space, ms, construction_efs, search_efs)
+
+    best = recommend(results, max(ks), args.target_recall)
+    print(f"\nRecommended for recall@{max(ks)} >= {args.target_recall}: "
+          f"HNSW_M={best['m']} HNSW_CONSTRUCTION_EF={best['construction_ef']} HNSW_SEARCH_EF={best['search_ef']} "
+          f"(recall {best[f'recall@{max(ks)}']}, p50 {best['latency_ms']['p50']} ms)")
+    print("HNSW_SEARCH_EF applies on the next start; the others need: "
+          "python -m src.embedding.chroma_manager --rebuild-index")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(data), "space": args.space, "results": results,
+                       "recommended": best}, f, indent=2)
+        print(f"Results written to {args.output}")
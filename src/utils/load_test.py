@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+LOCATIONS = ["pune", "mumbai", "bangalore", "hyderabad", "chennai", "delhi", "remote"]
+BRANCHES = ["computer", "it", "entc", "electrical", "mechanical", "civil"]
+TEMPLATES = [
+    "companies hiring {branch} students in {location}",
+    "which companies offer ctc above {ctc} lpa",
+    "{branch} internships in {location} with stipend",
+    "companies in {location} with cgpa cutoff below {cgpa}",
+    "top paying companies for {branch} with ctc above {ctc} lpa",
+]
+
+
+class QueryMix:
+    """
+    Query generator: with probability `repeat_ratio` a query is drawn from a
+    fixed pool of `pool_size` popular queries (cache hits after the first
+    request), otherwise a fresh combination that has not been asked before.
+    """
+
+    def __init__(self, repeat_ratio: float = 0.5, pool_size: int = 20, seed: int = 7):
+        self.repeat_ratio = repeat_ratio
+        self.rng = random.Random(seed)
+        self.pool = [self._fresh() for _ in range(pool_size)]
+        self._seen = set(self.pool)
+
+    def _fresh(self) -> str:
+        return self.rng.choice(TEMPLATES).format(
+            branch=self.rng.choice(BRANCHES),
+            location=self.rng.choice(LOCATIONS),
+            ctc=round(self.rng.uniform(3, 40), 1),
+            cgpa=round(self.rng.uniform(5, 9), 2),
+        )
+
+    def next(self):
+        """Return (query, kind) with kind 'repeat' or 'unique'."""
+        if self.pool and self.rng.random() < self.repeat_ratio:
+            return self.rng.choice(self.pool), "repeat"
+        query = self._fresh()
+        while query in self._seen:
+            query = self._fresh()
+        self._seen.add(query)
+        return query, "unique"
+
+
+async def http_post(host: str, port: int, path: str, payload: Dict[str, Any], timeout: float):
+    """Minimal HTTP/1.1 POST over a fresh connection; returns (status_code, parsed JSON body)."""
+    body = json.dumps(payload).encode("utf-8")
+
+    async def _request():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = raw.partition(b"\r\n\r\n")
+        status_code = int(head.split(b" ", 2)[1])
+        try:
+            return status_code, json.loads(content or b"{}")
+        except ValueError:
+            return status_code, {}
+
+    return await asyncio.wait_for(_request(), timeout=timeout)
+
+
+# Answers the API returns with HTTP 200 when the query actually failed (see process_query/finalretrieval)
+ERROR_MARKERS = ("please try rephrasing", "an error occurred", "service is currently busy",
+                 "unable to connect to database")
+TIMEOUT_MARKERS = ("timed out",)
+
+
+def classify(status_code: int, payload: Dict[str, Any]) -> str:
+    """Outcome of one /query response, decided by the body since failures also come back as HTTP 200."""
+    if status_code != 200:
+        return "error"
+    status = payload.get("status")
+    text = str(payload.get("result", "")).lower()
+    if status == "timeout" or any(m in text for m in TIMEOUT_MARKERS):
+        return "timeout"  # The app's own processing timeout
+    if status not in (None, "success") or any(m in text for m in ERROR_MARKERS):
+        return "error"
+    return "cached" if payload.get("cached") else "ok"
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_step(host: str, port: int, rate: float, duration: float, mix: QueryMix,
+                   timeout: float = 10.0) -> Dict[str, Any]:
+    """
+    Open-loop load: requests arrive as a Poisson process at `rate` per second
+    for `duration` seconds, independent of how fast the server answers.
+    """
+    results = []
+
+    async def one(query: str, kind: str):
+        start = time.perf_counter()
+        try:
+            status_code, payload = await http_post(host, port, "/query", {"query": query}, timeout)
+            outcome = classify(status_code, payload)
+        except asyncio.TimeoutError:
+            outcome = "client_timeout"
+        except OSError:
+            outcome = "error"
+        results.append((kind, outcome, time.perf_counter() - start))
+
+    tasks = []
+    started = time.perf_counter()
+    next_arrival = started
+    while next_arrival - started < duration:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        query, kind = mix.next()
+        tasks.append(asyncio.ensure_future(one(query, kind)))
+        next_arrival += random.expovariate(rate)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    completed = [r for r in results if r[1] in ("ok", "cached")]
+    latencies = [r[2] for r in completed]
+    summary = {
+        "offered_rps": rate,
+        "sent": len(results),
+        "arrival_rps": round(len(results) / duration, 2),
+        "throughput_rps": round(len(completed) / elapsed, 2),
+        "errors": sum(1 for r in results if r[1] == "error"),
+        "timeouts": sum(1 for r in results if r[1] in ("timeout", "client_timeout")),
+        "cached": sum(1 for r in results if r[1] == "cached"),
+    }
+    for name, q in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+        summary[name] = round(percentile(latencies, q) * 1000, 1)
+    for kind in ("repeat", "unique"):
+        kind_latencies = [r[2] for r in completed if r[0] == kind]
+        summary[f"{kind}_p95_ms"] = round(percentile(kind_latencies, 0.95) * 1000, 1)
+    return summary
+
+
+def is_saturated(step: Dict[str, Any], slo_ms: float, max_failure_rate: float = 0.01) -> bool:
+    """Saturated once p95 breaks the SLO, failures exceed 1%, or throughput falls behind the arrival rate."""
+    failures = (step["errors"] + step["timeouts"]) / max(1, step["sent"])
+    return (
+        step["p95_ms"] != step["p95_ms"]  # NaN: nothing completed
+        or step["p95_ms"] > slo_ms
+        or failures > max_failure_rate
+        or step["throughput_rps"] < 0.9 * step["arrival_rps"]
+    )
+
+
+def fetch_json(url: str, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def start_app(port: int, workers: int, stub_url: str, workdir: str) -> subprocess.Popen:
+    """
+    Start uvicorn with the app pointed at the Gemini stand-in. The query log
+    and hot answers live in `workdir` so load-test traffic never reaches the
+    real log and every run starts with a cold cache.
+    """
+    env = dict(
+        os.environ,
+        GEMINI_BACKEND="stub",
+        GEMINI_STUB_URL=stub_url,
+        GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "stub"),
+        QUERY_LOG_PATH=os.path.join(workdir, "queries.jsonl"),
+        HOT_ANSWERS_PATH=os.path.join(workdir, "hot_answers.json"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.api.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=str(PROJECT_ROOT), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        if fetch_json(f"http://127.0.0.1:{port}/"):
+            return process
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("App did not become ready within 120s")
+
+
+def stop_app(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_curve(host: str, port: int, rates: List[float], duration: float, repeat_ratio: float,
+              timeout: float, slo_ms: float, stop_at_saturation: bool = True) -> List[Dict[str, Any]]:
+    """Step through the arrival rates; each step keeps the same popular-query pool so repeats warm the cache."""
+    mix = QueryMix(repeat_ratio=repeat_ratio)
+    steps = []
+    for rate in rates:
+        step = asyncio.run(run_step(host, port, rate, duration, mix, timeout))
+        step["saturated"] = is_saturated(step, slo_ms)
+        server = fetch_json(f"http://{host}:{port}/metrics")
+        if server:
+            step["gemini"] = server.get("gemini")
+            step["open_breakers"] = [n for n, b in server.get("breakers", {}).items() if b.get("state") != "closed"]
+        steps.append(step)
+        print_step(step)
+        if step["saturated"] and stop_at_saturation:
+            break
+    return steps
+
+
+def print_header():
+    print(f"{'offered':>8}{'sent':>6}{'tput':>7}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'rep p95':>9}{'uniq p95':>9}{'cached':>7}{'err':>5}{'tmo':>5}  note")
+
+
+def print_step(step: Dict[str, Any]):
+    note = "SATURATED" if step["saturated"] else ""
+    if step.get("open_breakers"):
+        note += f" open breakers: {', '.join(step['open_breakers'])}"
+    print(f"{step['offered_rps']:>8.1f}{step['sent']:>6}{step['throughput_rps']:>7.1f}"
+          f"{step['p50_ms']:>8.0f}{step['p95_ms']:>8.0f}{step['p99_ms']:>8.0f}"
+          f"{step['repeat_p95_ms']:>9.0f}{step['unique_p95_ms']:>9.0f}"
+          f"{step['cached']:>7}{step['errors']:>5}{step['timeouts']:>5}  {note.strip()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open-loop HTTP load test for src.api.main:app with stubbed Gemini")
+    parser.add_argument("--rates", default="2,5,10,20,40", help="Comma-separated arrival rates (requests/s)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per rate step")
+    parser.add_argument("--workers", default="1", help="Comma-separated uvicorn worker counts to compare")
+    parser.add_argument("--repeat-ratio", type=float, default=0.5, help="Share of requests drawn from the popular-query pool")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Client-side request timeout (s)")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p95 latency objective used for the saturation point")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0, help="Simulated Gemini latency")
+    parser.add_argument("--stub-rpm", type=int, default=0, help="Simulated Gemini requests per minute (0 = unlimited)")
+    parser.add_argument("--target", help="host:port of an already running server (skips starting the app and stub)")
+    parser.add_argument("--all-steps", action="store_true", help="Keep stepping past the saturation point")
+    parser.add_argument("--output", help="Write all results as JSON to this file")
+    args = parser.parse_args()
+
+    rates = [float(r) for r in args.rates.split(",")]
+    report: Dict[str, Any] = {"rates": rates, "duration": args.duration, "repeat_ratio": args.repeat_ratio, "runs": []}
+
+    if args.target:
+        host, _, port = args.target.partition(":")
+        print(f"🎯 Target {args.target}")
+        print_header()
+        steps = run_curve(host, int(port), rates, args.duration, args.repeat_ratio,
+                          args.timeout, args.slo_ms, not args.all_steps)
+        report["runs"].append({"workers": None, "steps": steps})
+    else:
+        from src.llm.stub_server import serve
+
+        stub = serve(port=args.stub_port, rpm=args.stub_rpm, latency_ms=args.stub_latency_ms)
+        stub_url = f"http://127.0.0.1:{args.stub_port}"
+        print(f"🧪 Gemini stub on {stub_url} (latency {args.stub_latency_ms:.0f}ms)")
+        try:
+            for workers in [int(w) for w in args.workers.split(",")]:
+                with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+                    print(f"\n🚀 {workers} worker(s) on port {args.port}")
+                    app = start_app(args.port, workers, stub_url, workdir)
+                    try:
+                        print_header()
+                        steps = run_curve("127.0.0.1", args.port, rates, args.duration, args.repeat_ratio,
+                                          args.timeout, args.slo_ms, not args.all_steps)
+                    finally:
+                        stop_app(app)
+                report["runs"].append({"workers": workers, "steps": steps})
+        finally:
+            stub.shutdown()
+
+    print("\nSaturation point (first rate breaking the p95 SLO, 1% failures or 90% throughput):")
+    for run in report["runs"]:
+        saturated = next((s["offered_rps"] for s in run["steps"] if s["saturated"]), None)
+        sustained = max((s["throughput_rps"] for s in run["steps"] if not s["saturated"]), default=0.0)
+        run["saturation_rps"] = saturated
+        label = f"{run['workers']} worker(s)" if run["workers"] else args.target
+        print(f"   - {label}: " + (f"saturates at {saturated:g} req/s" if saturated else "not reached")
+              + f", best sustained throughput {sustained:.1f} req/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.output}")
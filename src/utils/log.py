@@ -0,0 +1,163 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from src.config import LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_QUEUE_SIZE
+from src.utils.profiler import run_attached
+
+ROOT_LOGGER = "campus_diary"
+
+# Correlation ID of the request being served; "-" outside a request
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in through `extra` and is a structured field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "sample_rate"}
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def bind_context(fn, *args, **kwargs):
+    """
+    Return a zero-argument callable running fn in a copy of the current context,
+    so work handed to executor threads keeps the request's correlation ID
+    (and is sampled when the request is profiled).
+    """
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(run_attached, fn, args, kwargs)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records for the background listener.
+    - The message is not formatted here, so the caller only pays for the enqueue
+    - When the queue is full the record is dropped and counted instead of blocking
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep DEBUG records with probability `debug_rate`. A call may override the
+    rate for a high-volume event with extra={"sample_rate": 0.01}.
+    """
+
+    def __init__(self, debug_rate: float = 1.0):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.debug_rate if record.levelno <= logging.DEBUG else 1.0
+        return rate >= 1.0 or random.random() < rate
+
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: JSON objects, or 'time level [request] logger: message key=value ...'."""
+
+    def __init__(self, fmt: str = "text"):
+        super().__init__()
+        self.json_output = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        message = record.getMessage()
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        error = self.formatException(record.exc_info) if record.exc_info else None
+
+        if self.json_output:
+            entry = {
+                "ts": timestamp,
+                "level": record.levelname,
+                "logger": record.name,
+                "request_id": getattr(record, "request_id", "-"),
+                "message": message,
+            }
+            entry.update(fields)
+            if error:
+                entry["exc"] = error
+            return json.dumps(entry, default=str, ensure_ascii=False)
+
+        line = f"{timestamp} {record.levelname:<7} [{getattr(record, 'request_id', '-')}] {record.name}: {message}"
+        if fields:
+            line += " " + " ".join(f"{k}={json.dumps(v, default=str, ensure_ascii=False)}" for k, v in fields.items())
+        if error:
+            line += "\n" + error
+        return line
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT,
+                  debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE, queue_size: int = LOG_QUEUE_SIZE):
+    """Attach the queue handler to the app's root logger and start the writer thread (idempotent)."""
+    global _handler, _listener
+    with _setup_lock:
+        if _handler is not None:
+            return
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(StructuredFormatter(fmt))
+
+        _handler = NonBlockingQueueHandler(log_queue)
+        _handler.addFilter(SamplingFilter(debug_sample_rate))
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, level, logging.INFO))
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the app's root, e.g. get_logger(__name__) → 'campus_diary.retrieval.retriever1'."""
+    setup_logging()
+    if name.startswith("src."):
+        name = name[len("src."):]
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def logging_stats() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT_LOGGER).level),
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
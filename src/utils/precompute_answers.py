@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.config import HOT_ANSWERS_PATH, QUERY_LOG_PATH, DEFAULT_BATCH
+from src.retrieval.partitions import active_collection
+from src.utils.query_log import read_query_log, normalize_query
+
+
+def rank_queries(records: Iterable[Dict], top_n: int = 50, min_count: int = 2) -> List[Tuple[str, int]]:
+    """Rank normalized queries by how often they were asked (default batch only)."""
+    counts = Counter(
+        normalize_query(r.get("query", ""))
+        for r in records
+        if r.get("query") and not r.get("batches")
+    )
+    return [(q, c) for q, c in counts.most_common(top_n) if c >= min_count]
+
+
+def is_servable(result) -> bool:
+    """Only keep answers the API would have cached itself."""
+    if not result or not isinstance(result, str):
+        return False
+    lowered = result.lower()
+    return not lowered.startswith(("an error occurred", "error", "no matching"))
+
+
+def precompute_answers(ranked: List[Tuple[str, int]]) -> List[Dict]:
+    """Run each hot query through the full pipeline and collect the answers."""
+    from src.retrieval.final_retrieval import finalretrieval
+
+    answers = []
+    for i, (query, count) in enumerate(ranked, 1):
+        trace: Dict = {}
+        start = time.perf_counter()
+        result = finalretrieval(query, trace)
+        elapsed = time.perf_counter() - start
+        if not is_servable(result) or trace.get("fallback"):
+            print(f"[{i}/{len(ranked)}] Skipped '{query}' (no usable answer)")
+            continue
+        if trace.get("plan") == "aggregate":
+            print(f"[{i}/{len(ranked)}] Skipped '{query}' (aggregate, answered live)")
+            continue
+        answers.append({
+            "query": query,
+            "count": count,
+            "result": result,
+            "result_ids": trace.get("result_ids", []),
+        })
+        print(f"[{i}/{len(ranked)}] '{query}' x{count} precomputed in {elapsed:.2f}s")
+    return answers
+
+
+def write_hot_answers(answers: List[Dict], path: str = HOT_ANSWERS_PATH):
+    """
+    Write answers atomically so a running server never reads a partial file.
+    The generation they were computed from is recorded: their result_ids only exist there.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.time(), "collection": active_collection(DEFAULT_BATCH),
+                   "answers": answers}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute answers for the most frequent queries")
+    parser.add_argument("--log", default=QUERY_LOG_PATH, help="Query log path")
+    parser.add_argument("--output", default=HOT_ANSWERS_PATH, help="Where to write the answers")
+    parser.add_argument("--top", type=int, default=50, help="Number of queries to precompute")
+    parser.add_argument("--min-count", type=int, default=2, help="Minimum times a query was asked")
+    args = parser.parse_args()
+
+    ranked = rank_queries(read_query_log(args.log), top_n=args.top, min_count=args.min_count)
+    if not ranked:
+        print("No frequent queries found in the query log.")
+        sys.exit(0)
+
+    answers = precompute_answers(ranked)
+    write_hot_answers(answers, args.output)
+    print(f"Saved {len(answers)} precomputed answers to {args.output}")
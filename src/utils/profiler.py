@@ -0,0 +1,208 @@
+import collections
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from src.config import PROFILE_SAMPLE_INTERVAL_MS, PROFILE_BUFFER_SIZE
+
+# Profile of the request being served; copied into worker threads by log.bind_context
+profile_var: contextvars.ContextVar = contextvars.ContextVar("profile", default=None)
+
+# Deepest stack kept per sample (outermost frames are dropped beyond this)
+MAX_STACK_DEPTH = 64
+
+
+def _thread_role(name: str) -> str:
+    """Pool threads share a flamegraph root: "ThreadPoolExecutor-3_1" → "ThreadPoolExecutor"."""
+    return re.sub(r"[-_]\d+", "", name) or "thread"
+
+
+class RequestProfile:
+    """
+    Stack samples of the threads working for one request.
+    Threads join while they run work handed off with bind_context, so the
+    samples follow the request across executor and pool hops.
+    """
+
+    def __init__(self, request_id: str, method: str, path: str, reason: str, interval_ms: float):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.interval_ms = interval_ms
+        self.started = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.annotations: Dict[str, Any] = {}
+        self.stacks: collections.Counter = collections.Counter()
+        self.samples = 0
+        self._threads: Dict[int, List[Any]] = {}  # thread id → [role, nesting depth]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attach(self):
+        """Sample the current thread until the block exits."""
+        tid = threading.get_ident()
+        with self._lock:
+            entry = self._threads.setdefault(tid, [_thread_role(threading.current_thread().name), 0])
+            entry[1] += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self._threads.pop(tid, None)
+
+    def sample(self, frames: Dict[int, Any], labels: Dict[Any, str]):
+        with self._lock:
+            threads = [(tid, entry[0]) for tid, entry in self._threads.items()]
+        if not threads:
+            return
+        for tid, role in threads:
+            frame = frames.get(tid)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                    label = labels[code] = f"{module}:{code.co_name}"
+                names.append(label)
+                frame = frame.f_back
+            names.append(role)
+            self.stacks[";".join(reversed(names))] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """Collapsed stacks ("root;caller;callee count" per line) for flamegraph.pl or speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            "interval_ms": self.interval_ms,
+            **self.annotations,
+        }
+
+    def to_dict(self, top: int = 50) -> Dict[str, Any]:
+        return dict(self.summary(), stacks=[
+            {"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)
+        ])
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for individual requests.
+    - A background thread reads sys._current_frames() every interval while any
+      profile is active, and records the stacks of that profile's threads only
+    - Finished profiles worth keeping go into a ring buffer of the last `buffer_size`
+    """
+
+    def __init__(self, interval_ms: float = 5.0, buffer_size: int = 20):
+        self.interval_ms = interval_ms
+        self.profiles: collections.deque = collections.deque(maxlen=buffer_size)
+        self.sampler_seconds = 0.0
+        self.ticks = 0
+        self.discarded = 0
+        self._active: List[RequestProfile] = []
+        self._labels: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, request_id: str, method: str, path: str, reason: str) -> RequestProfile:
+        profile = RequestProfile(request_id, method, path, reason, self.interval_ms)
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def finish(self, profile: RequestProfile, status: Optional[int], keep: bool):
+        profile.duration_ms = round((time.time() - profile.started) * 1000, 2)
+        profile.status = status
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+            if keep:
+                self.profiles.append(profile)
+            else:
+                self.discarded += 1
+
+    def _run(self):
+        interval = self.interval_ms / 1000.0
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wake.clear()
+                    continue
+            tick_start = time.perf_counter()
+            frames = sys._current_frames()
+            for profile in active:
+                profile.sample(frames, self._labels)
+            del frames
+            elapsed = time.perf_counter() - tick_start
+            self.sampler_seconds += elapsed
+            self.ticks += 1
+            time.sleep(max(0.0, interval - elapsed))
+
+    def get(self, request_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in reversed(self.profiles):
+                if profile.request_id == request_id:
+                    return profile
+        return None
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self.profiles)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active, kept = len(self._active), len(self.profiles)
+        return {
+            "active": active,
+            "kept": kept,
+            "discarded": self.discarded,
+            "ticks": self.ticks,
+            "sampler_ms": round(self.sampler_seconds * 1000, 2),
+        }
+
+
+def annotate(**fields):
+    """Attach details (stage timings, plan, ...) to the current request's profile, if it is profiled."""
+    profile = profile_var.get()
+    if profile is not None:
+        profile.annotations.update(fields)
+
+
+def run_attached(fn, args, kwargs):
+    """Run fn with the current thread sampled by the active profile (used by bind_context)."""
+    profile = profile_var.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    with profile.attach():
+        return fn(*args, **kwargs)
+
+
+# Shared profiler used by the API
+profiler = SamplingProfiler(interval_ms=PROFILE_SAMPLE_INTERVAL_MS, buffer_size=PROFILE_BUFFER_SIZE)
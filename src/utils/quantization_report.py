@@ -0,0 +1,89 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.embedding.quantize import CompressedVectorIndex, normalize_rows
+
+# (label, int8, truncate_dim)
+CONFIGS = [
+    ("float32 (exact)", False, None),
+    ("int8", True, None),
+    ("truncate 256", False, 256),
+    ("truncate 128", False, 128),
+    ("int8 + truncate 256", True, 256),
+    ("int8 + truncate 128", True, 128),
+]
+
+
+def load_embeddings():
+    """Read ids and embeddings from the default batch's partition."""
+    from src.retrieval.partitions import get_partition, get_all
+
+    collection = get_partition(create=True)
+    data = get_all(collection, ["embeddings"])
+    return list(data["ids"]), np.asarray(data["embeddings"], dtype=np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, k: int) -> np.ndarray:
+    """Leave-one-out ground truth: every stored vector is used as a query."""
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def evaluate(ids, vectors, quantize, truncate_dim, rescore_factor, k, truth):
+    index = CompressedVectorIndex(quantize=quantize, truncate_dim=truncate_dim,
+                                  rescore_factor=rescore_factor, keep_full=True)
+    index.build(ids, vectors)
+    full_bytes = index.full.nbytes
+    id_pos = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    recall_raw, recall_rescored, latencies = [], [], []
+    for qi in range(len(ids)):
+        expected = set(truth[qi])
+        for rescore, bucket in ((False, recall_raw), (True, recall_rescored)):
+            start = time.perf_counter()
+            hits = index.search(vectors[qi], k=k + 1, rescore=rescore)
+            if rescore:
+                latencies.append(time.perf_counter() - start)
+            found = [id_pos[doc_id] for doc_id, _ in hits if id_pos[doc_id] != qi][:k]
+            bucket.append(len(expected.intersection(found)) / k)
+
+    scan_bytes = index.memory_bytes() - full_bytes
+    return {
+        "bytes_per_vector": scan_bytes / len(ids),
+        "recall_first_pass": float(np.mean(recall_raw)),
+        "recall_rescored": float(np.mean(recall_rescored)),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs memory for compressed embedding storage")
+    parser.add_argument("--k", type=int, default=3, help="Neighbours per query (matches TOP_K)")
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Candidates per result slot to rescore")
+    parser.add_argument("--project", type=int, default=100000, help="Project memory for this many vectors")
+    args = parser.parse_args()
+
+    ids, vectors = load_embeddings()
+    if len(ids) <= args.k:
+        print("Not enough embeddings in the collection for a report.")
+        sys.exit(1)
+    vectors = normalize_rows(vectors)
+    truth = exact_neighbours(vectors, args.k)
+
+    print(f"{len(ids)} vectors x {vectors.shape[1]} dims, recall@{args.k}, rescore factor {args.rescore_factor}\n")
+    header = f"{'representation':<22}{'bytes/vec':>10}{'MiB @ ' + str(args.project):>16}{'recall 1st pass':>17}{'recall rescored':>17}{'p50 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for label, quantize, truncate_dim in CONFIGS:
+        r = evaluate(ids, vectors, quantize, truncate_dim, args.rescore_factor, args.k, truth)
+        projected = r["bytes_per_vector"] * args.project / (1024 * 1024)
+        print(f"{label:<22}{r['bytes_per_vector']:>10.0f}{projected:>16.1f}"
+              f"{r['recall_first_pass']:>17.3f}{r['recall_rescored']:>17.3f}{r['p50_ms']:>9.3f}")
@@ -0,0 +1,158 @@
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.utils.log import get_logger, request_id_var
+from src.retrieval.vocabulary import vocabulary
+from src.config import (
+    QUERY_LOG_PATH,
+    QUERY_LOG_SAMPLE_RATE,
+    QUERY_LOG_MAX_BYTES,
+    QUERY_LOG_BACKUP_COUNT,
+)
+
+logger = get_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a user query for cache keys and log aggregation; location and
+    branch spellings are canonicalized ("blr" and "bengaluru" → "bangalore").
+    """
+    return vocabulary.canonicalize_text(re.sub(r"\s+", " ", (query or "").strip().lower()))
+
+
+class QueryLogWriter:
+    """
+    Append query records to a rotating JSONL file from a background thread.
+    - log() only enqueues, so the request path never touches the disk
+    - Records are dropped (and counted) when the queue is full
+    - The file is rotated to .1, .2, ... once it grows past max_bytes
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 max_queue: int = 10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Flush pending records and stop the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def log(self, record: Dict[str, Any]) -> bool:
+        """Enqueue a record if it is sampled. Never blocks."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                try:
+                    f.write(json.dumps(record, default=str) + "\n")
+                    self.written += 1
+                    # Flush when idle so the file stays current without a write per record
+                    if self._queue.empty():
+                        f.flush()
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                except Exception as e:
+                    logger.warning("Query log write error: %s", e)
+        finally:
+            f.close()
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def read_query_log(path: str = QUERY_LOG_PATH, backup_count: int = QUERY_LOG_BACKUP_COUNT) -> Iterator[Dict[str, Any]]:
+    """Yield records from the log and its rotated backups, oldest first."""
+    files: List[str] = [f"{path}.{i}" for i in range(backup_count, 0, -1)] + [path]
+    for file_path in files:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line from a crash
+
+
+def build_record(query: str, status: str, cache: str, started: float,
+                 trace: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build a query log record from a request trace."""
+    trace = trace or {}
+    return {
+        "ts": time.time(),
+        "request_id": request_id_var.get(),
+        "query": normalize_query(query),
+        "status": status,
+        "cache": cache,
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        "plan": trace.get("plan"),
+        "batches": trace.get("batches"),
+        "timings": trace.get("timings", {}),
+        "prompt_tokens": trace.get("prompt_tokens"),
+        "speculation": trace.get("speculation"),
+        "result_ids": trace.get("result_ids", []),
+    }
+
+
+# Shared writer used by the API
+query_logger = QueryLogWriter(
+    QUERY_LOG_PATH,
+    sample_rate=QUERY_LOG_SAMPLE_RATE,
+    max_bytes=QUERY_LOG_MAX_BYTES,
+    backup_count=QUERY_LOG_BACKUP_COUNT,
+)
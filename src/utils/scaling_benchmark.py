@@ -0,0 +1,217 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.utils.load_test import QueryMix, percentile
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Filters as the extraction step would return them, run through the same normalization
+FILTERS = [
+    {"location_1": {"$eq": "Pune"}},
+    {"branch_1": {"$eq": "CSE"}},
+    {"ctc": {"$gt": "10"}},
+    {"$and": [{"location_1": {"$eq": "Bengaluru"}}, {"ctc": {"$gte": "6"}}]},
+]
+
+
+def _mb(value: float) -> float:
+    return round(value / (1024 * 1024), 1)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (Linux reports KB)."""
+    import resource
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in samples]
+    return {q: round(percentile(ms, p), 2) for q, p in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_scale(count: int, workdir: Path, queries: int, seed: int, trace_memory: bool) -> Dict[str, Any]:
+    """
+    One scale step, run in its own process (see main) so peak RSS is per step.
+    The environment points Chroma and the statistics at `workdir` and selects
+    the in-process Gemini stand-in, so the real ingest and retrieval code runs.
+    """
+    from src.utils.synthetic_data import generate, write_chunks
+
+    result: Dict[str, Any] = {"records": count}
+    companies, seconds = timed(generate, count, seed)
+    json_dir = workdir / "json"
+    write_chunks(companies, json_dir)
+    del companies
+    result["generate_s"] = round(seconds, 2)
+
+    if trace_memory:
+        tracemalloc.start()
+
+    # Ingest through chroma_manager: dedup, local embeddings, collection.add, statistics, vocabulary
+    from src.embedding import chroma_manager
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, seconds = timed(chroma_manager.process_all_json, json_dir)
+    collection = chroma_manager.collection
+    stored = collection.count()
+    result.update({
+        "stored": stored,
+        "collapsed": count - stored,
+        "ingest_s": round(seconds, 2),
+        "ingest_per_s": round(count / seconds, 1),
+        "ingest_peak_mb": _mb(tracemalloc.get_traced_memory()[1]) if trace_memory else None,
+        "disk_mb": _mb(dir_size(workdir / "chroma")),
+    })
+
+    # Serving state built at API startup: statistics, column store, vocabulary
+    from src.retrieval.stats import collection_stats
+    from src.retrieval.facets import column_store
+    from src.retrieval.vocabulary import vocabulary
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+    _, stats_s = timed(collection_stats.rebuild, collection)
+    _, columns_s = timed(column_store.load, collection)
+    _, vocab_s = timed(vocabulary.build, collection_stats.value_counts)
+    result.update({
+        "startup_s": round(stats_s + columns_s + vocab_s, 2),
+        "serving_mb": _mb(tracemalloc.get_traced_memory()[0] - before) if trace_memory else None,
+    })
+
+    # Query latency: raw Chroma vector and filtered searches, then the full retrieval path
+    from src.retrieval.clean_clause import normalize_where_clause
+    from src.retrieval.retriever2 import embed_query
+    from src.retrieval.final_retrieval import finalretrieval
+
+    mix = QueryMix(repeat_ratio=0.0, seed=seed)
+    texts = [mix.next()[0] for _ in range(queries)]
+    vectors = [embed_query(q) for q in texts]
+    wheres = [normalize_where_clause(f) for f in FILTERS]
+
+    vector_lat, filtered_lat, full_lat = [], [], []
+    for i, vector in enumerate(vectors):
+        _, seconds = timed(collection.query, query_embeddings=[vector], n_results=3)
+        vector_lat.append(seconds)
+        _, seconds = timed(collection.query, query_embeddings=[vector], n_results=3, where=wheres[i % len(wheres)])
+        filtered_lat.append(seconds)
+    for query in texts:
+        _, seconds = timed(finalretrieval, query)
+        full_lat.append(seconds)
+
+    result.update({
+        "vector_ms": latency_summary(vector_lat),
+        "filtered_ms": latency_summary(filtered_lat),
+        "end_to_end_ms": latency_summary(full_lat),
+        "python_peak_mb": _mb(tracemalloc.get_traced_memory()[1]) if trace_memory else None,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return result
+
+
+def worker_env(workdir: Path) -> Dict[str, str]:
+    return dict(
+        os.environ,
+        GEMINI_BACKEND="local",
+        GEMINI_EMBEDDING_RPM="100000000",
+        GEMINI_GENERATION_RPM="100000000",
+        CHROMA_DB_PERSIST_DIRECTORY=str(workdir / "chroma"),
+        COLLECTION_STATS_PATH=str(workdir / "collection_stats.json"),
+        LOG_LEVEL="WARNING",
+        PYTHONPATH=str(PROJECT_ROOT),
+    )
+
+
+def run_step(count: int, args) -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix=f"scale_{count}_", dir=args.workdir))
+    try:
+        command = [
+            sys.executable, "-m", "src.utils.scaling_benchmark", "--worker",
+            "--scales", str(count), "--queries", str(args.queries), "--seed", str(args.seed),
+            "--workdir", str(workdir),
+        ]
+        if args.no_tracemalloc:
+            command.append("--no-tracemalloc")
+        completed = subprocess.run(command, cwd=str(PROJECT_ROOT), env=worker_env(workdir),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Scale {count} failed:\n{completed.stderr[-2000:]}")
+        with open(workdir / "result.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_header():
+    print(f"{'records':>8} {'ingest/s':>9} {'ingest s':>9} {'disk MB':>8} {'py peak':>8} {'rss MB':>7} "
+          f"{'serving':>8} {'vector p50/p95':>15} {'filtered p50/p95':>17} {'e2e p50/p95/p99':>20}")
+
+
+def print_row(r: Dict[str, Any]):
+    def pair(d):
+        return f"{d['p50']}/{d['p95']}"
+
+    peak = r["python_peak_mb"] if r["python_peak_mb"] is not None else "-"
+    serving = r["serving_mb"] if r["serving_mb"] is not None else "-"
+    e2e = r["end_to_end_ms"]
+    e2e = f"{e2e['p50']}/{e2e['p95']}/{e2e['p99']}"
+    print(f"{r['records']:>8} {r['ingest_per_s']:>9} {r['ingest_s']:>9} {r['disk_mb']:>8} {peak:>8} "
+          f"{r['peak_rss_mb']:>7} {serving:>8} {pair(r['vector_ms']):>15} {pair(r['filtered_ms']):>17} {e2e:>20}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest and serving benchmark on synthetic companies at increasing scale")
+    parser.add_argument("--scales", default="1000,10000,100000", help="Comma-separated record counts")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per scale")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="Where each scale's collection is built (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="Keep each scale's collection and JSON files")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="Skip Python heap tracing (it slows allocation-heavy ingest down)")
+    parser.add_argument("--output", help="Write all results as JSON to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        step = run_scale(int(args.scales), Path(args.workdir), args.queries, args.seed, not args.no_tracemalloc)
+        with open(Path(args.workdir) / "result.json", "w", encoding="utf-8") as f:
+            json.dump(step, f)
+        sys.exit(0)
+
+    print("Latencies in ms, memory in MB (py peak = tracemalloc, rss = peak resident set)")
+    print_header()
+    results = []
+    for scale in [int(s) for s in args.scales.split(",") if s.strip()]:
+        results.append(run_step(scale, args))
+        print_row(results[-1])
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
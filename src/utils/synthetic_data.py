@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# parent directory
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+SOURCE_PATH = PROJECT_ROOT / "data" / "raw" / "companies.json"
+
+# Keys whose values are jittered instead of copied, so numeric ranges stay continuous
+NUMERIC_JITTER = {"ctc": 0.15, "ctc_min": 0.15, "ctc_max": 0.15, "stipend": 0.2,
+                  "stipend_min": 0.2, "stipend_max": 0.2, "cgpa": 0.05, "percent": 0.05}
+NAME_SUFFIXES = ["Technologies", "Systems", "Solutions", "Labs", "Industries", "Software",
+                 "Engineering", "Analytics", "Consulting", "Networks", "Infotech", "Global"]
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+class CompanyDistribution:
+    """
+    Empirical distributions of the real companies, sampled to make synthetic ones.
+    - Which keys a record has is copied from a random real record (keeps
+      co-occurrence, e.g. location_2 only with location_1)
+    - Each value is drawn from that key's observed values (so frequencies match);
+      numeric values get a small relative jitter
+    - Descriptions are stitched from sentences of different real descriptions
+      and end with the record's own CTC and location, like the real postings
+    """
+
+    def __init__(self, companies: List[Dict[str, Any]]):
+        if not companies:
+            raise ValueError("No companies to learn distributions from")
+        self.key_sets = [[item["key"] for item in c.get("Keys", [])] for c in companies]
+        self.values: Dict[str, List[Any]] = {}
+        for company in companies:
+            for item in company.get("Keys", []):
+                self.values.setdefault(item["key"], []).append(item["value"])
+        self.sentences: List[str] = []
+        self.sentence_counts: List[int] = []
+        for company in companies:
+            parts = [s.strip() for s in _SENTENCE_SPLIT.split(company.get("description", "")) if s.strip()]
+            self.sentences.extend(parts)
+            self.sentence_counts.append(max(1, len(parts)))
+        words = [re.findall(r"[A-Za-z]+", c["Name"]) for c in companies]
+        self.name_words = sorted({w[0].capitalize() for w in words if w and len(w[0]) > 2})
+
+    @classmethod
+    def from_file(cls, path: Path = SOURCE_PATH) -> "CompanyDistribution":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _value(self, key: str, rng: random.Random):
+        value = rng.choice(self.values[key])
+        jitter = NUMERIC_JITTER.get(key)
+        if jitter and isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = round(value * rng.uniform(1 - jitter, 1 + jitter), 2)
+        return value
+
+    def sample(self, rng: random.Random, name: str) -> Dict[str, Any]:
+        keys = [{"key": k, "value": self._value(k, rng)} for k in rng.choice(self.key_sets)]
+        values = {item["key"]: item["value"] for item in keys}
+        count = min(rng.choice(self.sentence_counts), len(self.sentences))
+        description = " ".join(rng.sample(self.sentences, count))
+        if "ctc" in values:
+            description += f" CTC: {values['ctc']} LPA."
+        if "location_1" in values:
+            description += f" Work Location: {values['location_1']}"
+        return {"Name": name, "description": description, "Keys": keys}
+
+
+def company_names(rng: random.Random, words: List[str]):
+    """Unique company names: two words from the real names plus a suffix, numbered once those run out."""
+    seen = set()
+    while True:
+        base = name = f"{rng.choice(words)}{rng.choice(words).lower()} {rng.choice(NAME_SUFFIXES)}"
+        number = 1
+        while name in seen:
+            number += 1
+            name = f"{base} {number}"
+        seen.add(name)
+        yield name
+
+
+def generate(count: int, seed: int = 7, distribution: Optional[CompanyDistribution] = None) -> List[Dict[str, Any]]:
+    """`count` synthetic companies in the ingest JSON schema (Name / description / Keys)."""
+    distribution = distribution or CompanyDistribution.from_file()
+    rng = random.Random(seed)
+    names = company_names(rng, distribution.name_words)
+    return [distribution.sample(rng, next(names)) for _ in range(count)]
+
+
+def write_chunks(companies: List[Dict[str, Any]], folder: Path, chunk_size: int = 1000) -> List[Path]:
+    """Write companies_chunk_<n>.json files like data/chunked_json, for chroma_manager --json-dir."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for start in range(0, len(companies), chunk_size):
+        path = folder / f"companies_chunk_{start // chunk_size + 1}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(companies[start:start + chunk_size], f, ensure_ascii=False)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic companies following the real schema and value distributions")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--source", default=str(SOURCE_PATH), help="Real companies to learn distributions from")
+    parser.add_argument("--output", default=str(PROJECT_ROOT / "data" / "synthetic"), help="Folder for the chunk files")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    dist = CompanyDistribution.from_file(Path(args.source))
+    files = write_chunks(generate(args.count, args.seed, dist), Path(args.output), args.chunk_size)
+    print(f"Wrote {args.count} synthetic companies to {len(files)} files in {args.output}")
+    print(f"Ingest with: python -m src.embedding.chroma_manager --batch synthetic --json-dir {args.output}")
@@ -0,0 +1,63 @@
+from collections import Counter
+
+import pytest
+
+from src.retrieval.facets import ColumnStore, answer_aggregation, detect_aggregation
+from src.retrieval.vocabulary import count_values, vocabulary
+
+COMPANIES = [
+    {"name": "Google", "role": "Software Engineer", "ctc": 24, "cgpa": 8, "location_1": "Bangalore", "branch_1": "CSE"},
+    {"name": "Amazon", "role": "SDE", "ctc": 18, "cgpa": 7, "location_1": "Bengaluru", "branch_1": "ECE"},
+    {"name": "JTP", "role": "Data Scientist", "ctc": 12, "cgpa": 80, "location_1": "Pune", "branch_1": "CSE"},
+    {"name": "Amadeus", "role": "Analyst", "ctc": 6, "location_1": "Hyderabad", "branch_1": "Mechanical"},
+]
+
+
+@pytest.fixture
+def store():
+    previous = {field: Counter(counts) for field, counts in vocabulary.value_counts.items()}
+    vocabulary.build(count_values(COMPANIES))
+    store = ColumnStore()
+    store.add([f"id{i}" for i in range(len(COMPANIES))], COMPANIES)
+    yield store
+    vocabulary.build(previous)
+
+
+@pytest.mark.parametrize("query", [
+    "how many companies offer data science roles",
+    "how many rounds are there in the Amazon interview",
+    "what is the max ctc offered by Google",
+    "which company is most suitable for a student with 8 cgpa",
+])
+def test_unrepresentable_questions_go_to_retrieval(store, query):
+    assert detect_aggregation(query, store) is None
+
+
+def test_location_alias_is_resolved(store):
+    answer, result = answer_aggregation("number of companies in blr", store)
+    assert result["matched"] == 2
+    assert answer == "2 companies match your query."
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("how many companies hire ECE", "1 companies match your query."),
+    ("average ctc for companies in pune", "Average CTC: 12.0 LPA across 1 companies."),
+    ("highest ctc", "Highest CTC: 24 LPA (Google)."),
+    ("how many companies offer above 10 lpa", "3 companies match your query."),
+])
+def test_aggregations_still_answered(store, query, expected):
+    answer, _ = answer_aggregation(query, store)
+    assert answer == expected
+
+
+def test_highest_ctc_ranks_ranges_by_upper_bound():
+    store = ColumnStore()
+    store.add(["fixed", "range"], [
+        {"name": "Fixed Co", "ctc": 12},
+        {"name": "Range Co", "ctc_min": 10, "ctc_max": 40},
+    ])
+    answer, result = answer_aggregation("highest ctc", store)
+    assert result["results"][0]["max_ctc_companies"] == ["Range Co"]
+    assert answer == "Highest CTC: 40 LPA (Range Co). CTC ranges count at their upper end."
+    lowest, _ = answer_aggregation("lowest ctc", store)
+    assert lowest == "Lowest CTC: 10 LPA (Range Co)."
@@ -0,0 +1,27 @@
+from src.retrieval.clean_clause import has_negation, matches_where
+from src.retrieval.facets import ColumnStore
+from src.retrieval.search import LexicalIndex, search
+
+
+def test_missing_field_never_matches():
+    assert not matches_where({"ctc": 10}, {"location_1": {"$ne": "Pune"}})
+    assert not matches_where({"ctc": 10}, {"location_1": {"$nin": ["Pune"]}})
+    assert matches_where({"location_1": "Mumbai"}, {"location_1": {"$ne": "Pune"}})
+    assert not matches_where({}, {"ctc": {"$lt": 5}})
+
+
+def test_has_negation():
+    assert has_negation({"$and": [{"ctc": {"$gt": 5}}, {"location_1": {"$nin": ["Pune"]}}]})
+    assert not has_negation({"$or": [{"ctc": {"$gt": 5}}, {"location_1": {"$in": ["Pune"]}}]})
+
+
+def test_search_negated_location_allows_missing_numbered_fields():
+    store = ColumnStore()
+    store.add(["a", "b", "c", "d"], [
+        {"name": "A", "location_1": "Mumbai"},
+        {"name": "B", "location_1": "Mumbai", "location_2": "Pune"},
+        {"name": "C", "location_1": "Pune"},
+        {"name": "D"},
+    ])
+    result = search(where={"location": {"$ne": "Pune"}}, store=store, index=LexicalIndex())
+    assert [r["id"] for r in result["results"]] == ["a"]
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pytest
+
+from src.llm import circuit_breaker
+from src.llm.circuit_breaker import CircuitBreaker, QueueTimeoutError, guarded_call
+from src.llm.gemini_client import (
+    GeminiClient, GeminiResponse, LimiterTimeoutError, QuotaExceededError, is_quota_error
+)
+
+
+class SlowBackend:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.timeouts = []
+
+    def generate(self, model, contents, timeout=None):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+        return GeminiResponse("ok")
+
+
+def test_deadline_reaches_the_backend():
+    backend = SlowBackend(0.0)
+    client = GeminiClient(backend=backend, rpm={"m": 6000})
+    guarded_call(CircuitBreaker("t"), client.generate_content, "q", model="m", timeout=1.0)
+    assert 0 < backend.timeouts[0] <= 1.0
+
+
+def test_abandoned_call_gives_up_waiting_for_capacity():
+    backend = SlowBackend(0.5)
+    client = GeminiClient(backend=backend, rpm={"m": 6000}, max_concurrency=1)
+    breaker = CircuitBreaker("t", failure_threshold=100)
+    with pytest.raises(FutureTimeout):
+        guarded_call(breaker, client.generate_content, "first", model="m", timeout=0.1)
+    # The first call holds the only slot; the second gives up at its deadline instead of queueing on
+    with pytest.raises((FutureTimeout, LimiterTimeoutError)):
+        guarded_call(breaker, client.generate_content, "second", model="m", timeout=0.1)
+    time.sleep(0.6)
+    assert backend.calls == 1
+    assert client.stats()["m"]["in_flight"] == 0 and client.stats()["m"]["queued"] == 0
+
+
+def _sleep(seconds, timeout=None):
+    time.sleep(seconds)
+    return seconds
+
+
+def test_queue_wait_is_not_counted_against_the_timeout(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "GUARD_POOL_WORKERS", 1)
+    breaker = CircuitBreaker("queue-wait")
+    with ThreadPoolExecutor(max_workers=1) as callers:
+        first = callers.submit(guarded_call, breaker, _sleep, 0.2, timeout=1.0)
+        time.sleep(0.05)
+        # Waits ~0.15s for the only worker, then runs 0.2s: within 0.3s of starting
+        assert guarded_call(breaker, _sleep, 0.2, timeout=0.3) == 0.2
+        first.result()
+    assert breaker.snapshot()["failure"] == 0
+
+
+def test_call_that_never_started_is_not_a_breaker_failure(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "GUARD_POOL_WORKERS", 1)
+    breaker = CircuitBreaker("never-started", failure_threshold=1)
+    with ThreadPoolExecutor(max_workers=1) as callers:
+        first = callers.submit(guarded_call, breaker, _sleep, 0.3, timeout=1.0)
+        time.sleep(0.05)
+        with pytest.raises(QueueTimeoutError):
+            guarded_call(breaker, _sleep, 0.0, timeout=0.05)
+        first.result()
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == "closed" and snapshot["failure"] == 0 and snapshot["not_started"] == 1
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_quota_errors_are_judged_by_code_and_type_not_message():
+    assert is_quota_error(QuotaExceededError("quota"))
+    assert is_quota_error(ResourceExhausted("slow down"))
+    http_error = RuntimeError("rate limited")
+    http_error.code = 429
+    assert is_quota_error(http_error)
+    assert not is_quota_error(ValueError("prompt is 4290 tokens, over the limit"))
+    assert not is_quota_error(ConnectionError("connection refused on port 8429"))
+
+
+def test_counters_are_exact_under_concurrency():
+    client = GeminiClient(backend=SlowBackend(0.0), rpm={"m": 600000}, max_concurrency=64)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: client.generate_content("q", model="m"), range(400)))
+    assert client.stats()["m"]["calls"] == 400
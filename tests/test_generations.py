@@ -0,0 +1,135 @@
+import json
+
+import chromadb
+import pytest
+from chromadb.config import Settings
+
+from src import config
+from src.embedding import generations
+from src.retrieval import partitions
+from src.retrieval.partitions import GenerationPointer, active_collection, build_in_progress, get_partition
+
+BATCH = "gentest"
+
+
+@pytest.fixture
+def chroma(tmp_path, monkeypatch):
+    """Ephemeral Chroma and a pointer file in a temp dir, in place of the configured ones."""
+    client = chromadb.EphemeralClient(settings=Settings(allow_reset=True, anonymized_telemetry=False))
+    client.reset()
+    pointer = GenerationPointer(str(tmp_path / "generations.json"))
+    monkeypatch.setattr(config, "_chroma_client", client)
+    monkeypatch.setattr(partitions, "generation_pointer", pointer)
+    monkeypatch.setattr(generations, "generation_pointer", pointer)
+    monkeypatch.setattr(partitions, "_partitions", {})
+    monkeypatch.setattr(partitions, "_partition_counts", {})
+    monkeypatch.setattr(generations, "INDEX_BUILD_NICE", 0)
+    yield pointer
+    client.reset()
+
+
+def fill_records(collection, count=10, start=0):
+    ids = [f"c{i}" for i in range(start, start + count)]
+    collection.add(ids=ids, embeddings=[[float(i + 1), 1.0, 0.5] for i in range(start, start + count)],
+                   documents=[f"doc {i}" for i in ids], metadatas=[{"name": i} for i in ids])
+
+
+def live():
+    collection = get_partition(BATCH, create=True)
+    if not collection.count():
+        fill_records(collection)
+    return collection
+
+
+def copy_live(target):
+    generations.copy_records(live(), target)
+
+
+def test_promotion_rewrites_the_pointer_file_and_switches_the_partition(chroma):
+    original = live().name
+    result = generations.build_and_promote(BATCH, copy_live)
+    assert result["previous"] == original
+    assert active_collection(BATCH) == result["active"] != original
+    assert get_partition(BATCH).name == result["active"]
+    with open(chroma.path, encoding="utf-8") as f:
+        entry = json.load(f)[original]
+    assert entry["active"] == result["active"] and entry["history"] == [original]
+    assert "building" not in entry
+
+
+def test_rollback_switches_back_and_forth(chroma):
+    original = live().name
+    promoted = generations.build_and_promote(BATCH, copy_live)["active"]
+    assert generations.rollback(BATCH) == {"active": original, "previous": promoted}
+    assert get_partition(BATCH).name == original
+    assert generations.rollback(BATCH)["active"] == promoted
+
+
+def test_rollback_without_history_fails(chroma):
+    live()
+    with pytest.raises(ValueError):
+        generations.rollback(BATCH)
+
+
+def test_failed_validation_keeps_the_active_generation(chroma):
+    original = live().name
+    with pytest.raises(generations.ValidationError, match="no records"):
+        generations.build_and_promote(BATCH, lambda target: None)
+    assert active_collection(BATCH) == original
+    assert build_in_progress(BATCH) is None
+
+
+def test_shrinking_build_fails_validation(chroma):
+    live()
+
+    def half(target):
+        fill_records(target, count=5)
+
+    with pytest.raises(generations.ValidationError, match="fewer"):
+        generations.build_and_promote(BATCH, half)
+
+
+def test_build_marker_is_set_while_filling_and_cleared_after(chroma):
+    live()
+    seen = []
+
+    def fill(target):
+        seen.append(build_in_progress(BATCH))
+        copy_live(target)
+
+    result = generations.build_and_promote(BATCH, fill)
+    assert seen == [result["collection"]]
+    assert build_in_progress(BATCH) is None
+
+
+def test_promotion_is_refused_when_the_source_changed_after_the_build(chroma):
+    live()
+    result = generations.build_and_promote(BATCH, copy_live, promote_after=False)
+    live().delete(ids=["c3"])  # An admin write after the build started
+    with pytest.raises(generations.ValidationError, match="changed after the build started"):
+        generations.promote(BATCH, result["collection"], result["validation"])
+    assert generations.promote(BATCH, result["collection"], result["validation"], force=True)["active"] \
+        == result["collection"]
+
+
+def test_unchanged_source_can_be_promoted_later(chroma):
+    live()
+    result = generations.build_and_promote(BATCH, copy_live, promote_after=False)
+    assert active_collection(BATCH) != result["collection"]
+    assert generations.promote(BATCH, result["collection"], result["validation"])["active"] == result["collection"]
+
+
+def test_checksum_follows_content_not_index_settings(chroma):
+    source = live()
+    copy = generations.create_generation(BATCH, m=32)
+    generations.copy_records(source, copy)
+    assert generations.checksum(copy)["checksum"] == generations.checksum(source)["checksum"]
+    copy.update(ids=["c1"], metadatas=[{"name": "renamed"}])
+    assert generations.checksum(copy)["checksum"] != generations.checksum(source)["checksum"]
+
+
+def test_checksum_reports_zero_embeddings(chroma):
+    collection = live()
+    collection.add(ids=["zero"], embeddings=[[0.0, 0.0, 0.0]], documents=["z"], metadatas=[{"name": "z"}])
+    report = generations.checksum(collection)
+    assert report["problem_count"] == 1 and "zero" in report["problems"][0]
@@ -0,0 +1,31 @@
+from src.embedding.live_update import UpdateJournal
+
+
+def test_journal_returns_each_complete_line_once(tmp_path):
+    path = tmp_path / "live_updates.jsonl"
+    writer, reader = UpdateJournal(str(path)), UpdateJournal(str(path))
+    assert reader.read_new() == []
+    writer.append({"added_ids": ["a"]})
+    writer.append({"removed_ids": ["b"]})
+    assert reader.read_new() == [{"added_ids": ["a"]}, {"removed_ids": ["b"]}]
+    assert reader.read_new() == []
+
+
+def test_journal_leaves_a_partial_line_for_the_next_read(tmp_path):
+    path = tmp_path / "live_updates.jsonl"
+    reader = UpdateJournal(str(path))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"added_ids": ["a"]}\n{"added_')
+    assert reader.read_new() == [{"added_ids": ["a"]}]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('ids": ["b"]}\n')
+    assert reader.read_new() == [{"added_ids": ["b"]}]
+
+
+def test_skip_to_end_ignores_earlier_changes(tmp_path):
+    path = tmp_path / "live_updates.jsonl"
+    writer, reader = UpdateJournal(str(path)), UpdateJournal(str(path))
+    writer.append({"added_ids": ["old"]})
+    reader.skip_to_end()
+    writer.append({"added_ids": ["new"]})
+    assert reader.read_new() == [{"added_ids": ["new"]}]
@@ -0,0 +1,111 @@
+import pytest
+
+from src.retrieval.facets import ColumnStore
+from src.retrieval.search import LexicalIndex, decode_cursor, encode_cursor, expand_groups, search
+
+COMPANIES = [
+    ("a", "Acme builds payment software", {"name": "Acme", "role": "Backend", "ctc": 12, "location_1": "Pune"}),
+    ("b", "Bolt makes data pipelines", {"name": "Bolt", "role": "Data", "ctc": 18, "location_1": "Mumbai",
+                                        "location_2": "Pune"}),
+    ("c", "Cask ships payment gateways", {"name": "Cask", "role": "Backend", "ctc": 12, "location_1": "Delhi"}),
+    ("d", "Dune writes data tooling", {"name": "Dune", "role": "Data", "ctc": 25, "location_1": "Chennai"}),
+    ("e", "Edge runs payment risk models", {"name": "Edge", "role": "ML", "ctc": 9}),
+]
+
+
+@pytest.fixture
+def store():
+    store = ColumnStore()
+    store.add([c[0] for c in COMPANIES], [c[2] for c in COMPANIES])
+    return store
+
+
+@pytest.fixture
+def index():
+    index = LexicalIndex()
+    index.add([c[0] for c in COMPANIES], [c[1] for c in COMPANIES], [c[2] for c in COMPANIES])
+    return index
+
+
+def pages(store, index, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page = search(store=store, index=index, cursor=cursor, **kwargs)
+        ids.append([r["id"] for r in page["results"]])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("ctc", [["e", "a"], ["c", "b"], ["d"]]),
+    ("-ctc", [["d", "b"], ["a", "c"], ["e"]]),
+    ("name", [["a", "b"], ["c", "d"], ["e"]]),
+    ("-name", [["e", "d"], ["c", "b"], ["a"]]),
+])
+def test_field_sort_pages_cover_every_record_once(store, index, sort, expected):
+    assert pages(store, index, sort=sort, limit=2) == expected
+
+
+def test_relevance_pages_cover_every_match_once(store, index):
+    result = pages(store, index, text="payment", limit=2)
+    assert sorted(sum(result, [])) == ["a", "c", "e"]
+    assert [len(page) for page in result] == [2, 1]
+
+
+def test_field_sort_is_stable_across_updates_between_pages(store, index):
+    first = search(sort="ctc", limit=2, store=store, index=index)
+    assert [r["id"] for r in first["results"]] == ["e", "a"]
+    store.add(["f"], [{"name": "Fern", "ctc": 5}])      # sorts before the cursor
+    store.remove(["e"])                                  # already returned
+    rest = search(sort="ctc", limit=10, cursor=first["next_cursor"], store=store, index=index)
+    assert [r["id"] for r in rest["results"]] == ["c", "b", "d"]
+
+
+def test_cursor_from_another_search_is_rejected(store, index):
+    cursor = search(sort="ctc", limit=1, store=store, index=index)["next_cursor"]
+    with pytest.raises(ValueError, match="different search"):
+        search(sort="-ctc", limit=1, cursor=cursor, store=store, index=index)
+    with pytest.raises(ValueError, match="different search"):
+        search(sort="ctc", where={"ctc": {"$gt": 10}}, limit=1, cursor=cursor, store=store, index=index)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "!", "eyJ4IjoxfQ", encode_cursor("q", 1, "a")[:-3]])
+def test_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "q")
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("q", 12.5, "a"), "q") == (12.5, "a")
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"location": "Pune"},
+     {"$or": [{"location_1": {"$eq": "Pune"}}, {"location_2": {"$eq": "Pune"}}]}),
+    ({"location": {"$ne": "Pune"}},
+     {"$and": [{"location_1": {"$ne": "Pune"}},
+               {"$or": [{"location_2": {"$ne": "Pune"}}, {"location_2": {"$exists": False}}]}]}),
+    ({"location": {"$nin": ["Pune"]}, "ctc": {"$gt": 10}},
+     {"$and": [{"ctc": {"$gt": 10}},
+               {"$and": [{"location_1": {"$nin": ["Pune"]}},
+                         {"$or": [{"location_2": {"$nin": ["Pune"]}}, {"location_2": {"$exists": False}}]}]}]}),
+    ({"branch": {"$ne": "CSE"}}, {"branch_1": {"$ne": "CSE"}}),
+    ({"$or": [{"ctc": 9}, {"location": "Delhi"}]},
+     {"$or": [{"ctc": {"$eq": 9}},
+              {"$or": [{"location_1": {"$eq": "Delhi"}}, {"location_2": {"$eq": "Delhi"}}]}]}),
+])
+def test_expand_groups(store, where, expected):
+    assert expand_groups(where, store) == expected
+
+
+def test_not_in_city_keeps_records_without_a_second_location(store, index):
+    result = search(where={"location": {"$ne": "Pune"}}, sort="name", store=store, index=index)
+    assert [r["id"] for r in result["results"]] == ["c", "d"]
+
+
+def test_unknown_field_is_rejected(store, index):
+    with pytest.raises(ValueError, match="salary"):
+        search(fields=["name", "salary"], store=store, index=index)
+    result = search(fields=["name", "location"], sort="name", limit=2, store=store, index=index)
+    assert result["results"][1] == {"id": "b", "name": "Bolt", "location": ["Mumbai", "Pune"]}
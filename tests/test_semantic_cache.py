@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.api.semantic_cache import SemanticCache, query_signature
+
+
+def test_signature_tells_numbers_and_entities_apart():
+    assert query_signature("ctc above 10") != query_signature("ctc above 20")
+    assert query_signature("how many hire ECE") != query_signature("how many hire CSE")
+    assert query_signature("ctc above 10.0 in BLR") == query_signature("CTC above 10 in bengaluru")
+
+
+def test_signature_tells_negated_queries_apart():
+    assert query_signature("companies in pune") != query_signature("companies not in pune")
+    assert query_signature("roles outside bangalore") != query_signature("roles in bangalore")
+    assert query_signature("companies except pune") == query_signature("companies excluding pune")
+
+
+def test_lookup_requires_same_signature():
+    cache = SemanticCache(threshold=0.95, dim=4)
+    vector = np.array([1.0, 0.0, 0.0, 0.0])
+    cache.add("ctc above 10", vector, "answer 10", ["a"], signature=query_signature("ctc above 10"))
+    assert cache.lookup(vector, query_signature("ctc above 20")) is None
+    assert cache.lookup(vector, query_signature("salary above 10"))["result"] == "answer 10"
+
+
+def test_negated_query_misses_cached_positive_answer():
+    cache = SemanticCache(threshold=0.95, dim=4)
+    cache.add("companies in pune", np.array([1.0, 0.0, 0.0, 0.0]), "pune answer", ["a"],
+              signature=query_signature("companies in pune"))
+    near = np.array([0.99, 0.05, 0.0, 0.0])
+    assert cache.lookup(near, query_signature("companies not in pune")) is None
+    assert cache.lookup(near, query_signature("companies in pune"))["result"] == "pune answer"
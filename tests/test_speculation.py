@@ -0,0 +1,152 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm.circuit_breaker import CircuitBreaker
+from src.retrieval import final_retrieval
+from src.retrieval.planner import FILTER_FIRST, VECTOR_FIRST
+from src.retrieval.speculation import Speculation, SpeculationStats
+
+UNFILTERED = {
+    "ids": [["a", "b", "c"]],
+    "documents": [["doc a", "doc b", "doc c"]],
+    "metadatas": [[{"name": "A"}, {"name": "B"}, {"name": "C"}]],
+}
+FILTERED = {"ids": ["d"], "documents": ["doc d"], "metadatas": [{"name": "D", "location_1": "Pune"}]}
+
+
+class FakeGemini:
+    def __init__(self, delay=0.02, fail=False, text="generated answer"):
+        self.delay = delay
+        self.fail = fail
+        self.text = text
+        self.prompts = []
+
+    def generate_content(self, prompt, priority=None, timeout=None):
+        self.prompts.append(prompt)
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("generation failed")
+        return SimpleNamespace(text=self.text)
+
+
+@pytest.fixture
+def retrieval(monkeypatch):
+    """finalretrieval over a fake retriever: the embedding is given, filter extraction is slow."""
+    stats = SpeculationStats()
+    state = SimpleNamespace(where={}, gemini=FakeGemini(), stats=stats)
+
+    def extract(query):
+        time.sleep(0.1)  # Loses the race, so generation starts speculatively
+        return state.where
+
+    def plan(where):
+        if where:
+            return {"strategy": FILTER_FIRST, "where": where, "estimated": 1}
+        return {"strategy": VECTOR_FIRST, "where": None, "estimated": 0}
+
+    monkeypatch.setattr(final_retrieval, "collection_stats", SimpleNamespace(loaded=True))
+    monkeypatch.setattr(final_retrieval, "column_store", SimpleNamespace(loaded=True))
+    monkeypatch.setattr(final_retrieval, "answer_aggregation", lambda query: None)
+    monkeypatch.setattr(final_retrieval, "extract_where_clause", extract)
+    monkeypatch.setattr(final_retrieval, "vector_search", lambda vector, n_results=3: UNFILTERED)
+    monkeypatch.setattr(final_retrieval, "plan_query", plan)
+    monkeypatch.setattr(final_retrieval, "execute_plan", lambda plan, vector: FILTERED)
+    monkeypatch.setattr(final_retrieval, "generation_breaker", CircuitBreaker("test.generation"))
+    monkeypatch.setattr(final_retrieval, "speculation_stats", stats)
+    monkeypatch.setattr(final_retrieval, "SPECULATIVE_GENERATION", True)
+    monkeypatch.setattr(final_retrieval, "gemini", state.gemini)
+    return state
+
+
+def run(query="software roles"):
+    trace = {}
+    answer = final_retrieval.finalretrieval(query, trace, query_vector=[1.0, 0.0])
+    return answer, trace
+
+
+def test_same_evidence_is_a_hit_with_one_generation_call(retrieval):
+    answer, trace = run()
+    assert answer == "generated answer"
+    assert trace["speculation"] == "hit"
+    assert trace["timings"]["speculation_saved"] > 0
+    assert len(retrieval.gemini.prompts) == 1
+    stats = retrieval.stats.stats()
+    assert (stats["hits"], stats["misses"], stats["failed"], stats["hit_rate"]) == (1, 0, 0, 1.0)
+
+
+def test_different_evidence_is_a_miss_and_generates_again(retrieval):
+    retrieval.where = {"location_1": {"$eq": "Pune"}}
+    answer, trace = run("software roles in pune")
+    assert answer == "generated answer"
+    assert trace["speculation"] == "miss"
+    assert "speculation_saved" not in trace["timings"]
+    assert len(retrieval.gemini.prompts) == 2 and "D" in retrieval.gemini.prompts[-1]
+    stats = retrieval.stats.stats()
+    # The speculative call had started before the filters arrived, so it was wasted
+    assert (stats["hits"], stats["misses"], stats["wasted_calls"]) == (0, 1, 1)
+
+
+def test_failed_speculation_is_not_a_hit(retrieval):
+    retrieval.gemini.fail = True
+    answer, trace = run()
+    assert trace["speculation"] == "failed" and trace["fallback"]
+    assert answer.startswith("- A | Role:")
+    stats = retrieval.stats.stats()
+    assert (stats["hits"], stats["failed"], stats["hit_rate"], stats["saved_ms_total"]) == (0, 1, 0.0, 0.0)
+
+
+def test_empty_speculative_answer_is_a_failure(retrieval):
+    retrieval.gemini.text = ""
+    _, trace = run()
+    assert trace["speculation"] == "failed"
+    assert retrieval.stats.stats()["failed"] == 1
+
+
+def test_no_speculation_when_filters_are_ready_first(retrieval, monkeypatch):
+    monkeypatch.setattr(final_retrieval, "extract_where_clause", lambda query: {})
+    monkeypatch.setattr(final_retrieval, "embed_query", lambda query: (time.sleep(0.1), [1.0, 0.0])[1])
+    trace = {}
+    assert final_retrieval.finalretrieval("software roles", trace) == "generated answer"
+    assert trace["speculation"] == "skipped"
+    assert retrieval.stats.stats()["skipped"] == 1
+
+
+def test_matches_ignores_order():
+    speculation = Speculation(["a", "b"], {}, lambda: None)
+    speculation.result()
+    assert speculation.matches(["b", "a"])
+    assert not speculation.matches(["a"])
+
+
+def test_cancel_after_start_reports_a_wasted_call():
+    release = threading.Event()
+    speculation = Speculation(["a"], {}, release.wait)
+    while speculation.call_started is None:
+        time.sleep(0.001)
+    assert speculation.cancel() is True
+    release.set()
+    assert speculation.result() is True  # Runs to completion, unused
+
+
+def test_cancel_before_start_never_calls():
+    calls = []
+    speculation = Speculation(["a"], {}, calls.append, "x")
+    speculation.result()
+    speculation.cancel()
+    # A worker that picks up a cancelled speculation returns without calling
+    assert speculation._run(calls.append, "y") is None
+    assert calls == ["x"]
+
+
+def test_stats_hit_rate_counts_failures():
+    stats = SpeculationStats()
+    stats.hit(100.0)
+    stats.miss(wasted=True)
+    stats.failure()
+    stats.skip()
+    snapshot = stats.stats()
+    assert snapshot["hit_rate"] == round(1 / 3, 4)
+    assert snapshot["saved_ms_avg"] == 100.0 and snapshot["wasted_calls"] == 1 and snapshot["skipped"] == 1
@@ -0,0 +1,99 @@
+from collections import Counter
+
+import pytest
+
+from src.retrieval import vocabulary as vocabulary_module
+from src.retrieval.vocabulary import ALIASES, Trie, Vocabulary
+
+STORED = {
+    "location_1": Counter({"Bangalore": 5, "Bengaluru": 2, "Hyderabad": 3, "Pune": 2, "Noida": 2, "Nadia": 1,
+                           "Thiruvananthapuram": 1}),
+    "location_2": Counter({"Mangalore": 1}),
+    "branch_1": Counter({"CSE": 4, "Computer Science": 2, "ECE": 1}),
+}
+
+
+@pytest.fixture(autouse=True)
+def fuzzy(monkeypatch):
+    monkeypatch.setattr(vocabulary_module, "VOCABULARY_FUZZY", True)
+
+
+@pytest.fixture
+def vocab():
+    return Vocabulary(ALIASES).build(STORED)
+
+
+@pytest.mark.parametrize("field, value, expected", [
+    ("location_1", "Bengaluru", "Bangalore"),        # alias
+    ("location_1", "BLR", "Bangalore"),              # alias, any case
+    ("location_3", "bangalore", "Bangalore"),        # case, any numbered field
+    ("location_1", "Hyderbad", "Hyderabad"),         # one edit
+    ("location_1", "Bangalor", "Bangalore"),         # one edit, all rivals are the same value
+    ("location_1", "Mangalore", "Mangalore"),        # stored value, never read as Bangalore
+    ("location_1", "Mangalor", "Mangalore"),         # near miss keeps its first letter
+    ("location_1", "Naida", "Naida"),                # Noida and Nadia are both close: ambiguous
+    ("location_1", "Pume", "Pume"),                  # too short for approximate matching
+    ("location_1", "Tiruvanantapuram", "Thiruvananthapuram"),  # long words get two edits
+    ("branch_1", "cs", "Computer Science"),
+    ("branch_1", "E.C.E", "Electronics & Communication"),
+    ("ctc", "Bengaluru", "Bengaluru"),               # not a vocabulary field
+])
+def test_canonicalize(vocab, field, value, expected):
+    assert vocab.canonicalize(field, value) == expected
+
+
+def test_different_first_letter_is_never_a_near_miss():
+    vocab = Vocabulary(ALIASES).build({"location_1": Counter({"Bangalore": 3})})
+    assert vocab.canonicalize("location_1", "Mangalore") == "Mangalore"
+
+
+def test_fuzzy_matching_can_be_turned_off(vocab, monkeypatch):
+    monkeypatch.setattr(vocabulary_module, "VOCABULARY_FUZZY", False)
+    fresh = Vocabulary(ALIASES).build(STORED)
+    assert fresh.canonicalize("location_1", "Hyderbad") == "Hyderbad"
+    assert fresh.canonicalize("location_1", "Bengaluru") == "Bangalore"
+
+
+@pytest.mark.parametrize("field, operator, value, expected", [
+    ("location_1", "$eq", "Bengaluru", ("$in", ["Bangalore", "Bengaluru"])),
+    ("location_1", "$ne", "BLR", ("$nin", ["Bangalore", "Bengaluru"])),
+    ("location_1", "$eq", "Pune", ("$eq", "Pune")),
+    ("location_1", "$ne", "Pune", ("$ne", "Pune")),
+    ("location_1", "$in", ["Pune", "Bengaluru"], ("$in", ["Pune", "Bangalore", "Bengaluru"])),
+    ("location_1", "$nin", ["blr", "Bangalore"], ("$nin", ["Bangalore", "Bengaluru"])),
+    ("branch_1", "$eq", "cs", ("$in", ["Computer Science", "CSE"])),
+    ("location_1", "$gt", "Bengaluru", ("$gt", "Bengaluru")),
+    ("ctc", "$eq", "Bengaluru", ("$eq", "Bengaluru")),
+    ("location_1", "$eq", 5, ("$eq", 5)),
+])
+def test_expand_condition(vocab, field, operator, value, expected):
+    assert vocab.expand_condition(field, operator, value) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("jobs in blr", "jobs in bangalore"),
+    ("cse roles in bengaluru", "computer science roles in bangalore"),
+    ("roles in new delhi", "roles in delhi"),
+    ("roles in hyderbad", "roles in hyderbad"),      # typos are never rewritten in free text
+    ("all roles", "all roles"),                      # stopword aliases stay
+])
+def test_canonicalize_text_is_exact_only(vocab, text, expected):
+    assert vocab.canonicalize_text(text) == expected
+
+
+def test_entities(vocab):
+    assert vocab.entities("cse jobs in blr or bengaluru") == ["bangalore", "computer science"]
+
+
+@pytest.mark.parametrize("word, distance, same_first, expected", [
+    ("bangalore", 0, False, [(0, "B")]),
+    ("bangalor", 1, False, [(1, "B")]),
+    ("mangalore", 1, False, [(0, "M"), (1, "B")]),
+    ("mangalore", 1, True, [(0, "M")]),
+    ("xyz", 1, False, []),
+])
+def test_trie_search(word, distance, same_first, expected):
+    trie = Trie()
+    trie.insert("bangalore", "B")
+    trie.insert("mangalore", "M")
+    assert trie.search(word, distance, same_first) == expected